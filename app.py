@@ -8,12 +8,15 @@ visualização em dispositivos móveis e desktop, trocando automaticamente
 entre diferentes URLs do Power BI baseado no tamanho da viewport.
 """
 
+import secrets
+import time
+from urllib.parse import urlsplit
+
 import streamlit as st
 
-# URL de incorporação (embed) do painel do Power BI
-# Usamos a MESMA URL para ambos - o Power BI detecta automaticamente o tamanho do iframe
-# e renderiza em mobile quando a largura do iframe é <= 768px
-POWER_BI_EMBED_URL = "https://app.powerbi.com/view?r=eyJrIjoiYWRjMWQyM2MtNzc5My00NmVhLTllMzEtY2Q4MmU3MGE2YzBmIiwidCI6IjA0ZTc0MTIzLTRlZGUtNGE4NC04OWVmLWI3YzZkZmUyOWRmOCJ9"
+from embed import device, filters, metrics, render, telemetry, tokens
+from embed.registry import RegistryError, load_registry
+from embed.settings import get_settings
 
 # Configuração da página Streamlit
 st.set_page_config(
@@ -23,525 +26,257 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# CSS customizado para responsividade e indicador de dispositivo
-st.markdown("""
-    <style>
-        /*
-        * Estilos CSS para garantir a responsividade e o layout.
-        * O objetivo é que o iframe do Power BI ocupe a maior parte da tela.
-        */
+# Configurações lidas das variáveis de ambiente (POWERBI_*)
+settings = get_settings()
 
-        /* Remove margens padrão do Streamlit */
-        .main .block-container {
-            padding-top: 1rem;
-            padding-bottom: 1rem;
-        }
+# Coletor de telemetria (sidecar HTTP iniciado uma única vez por processo)
+if settings.telemetry:
+    telemetry.start_collector(settings.sidecar_host, settings.sidecar_port)
 
-        /* Oculta elementos padrão do Streamlit para layout limpo */
-        #MainMenu {visibility: hidden;}
-        footer {visibility: hidden;}
-        header {visibility: hidden;}
-        
-        /* Reduz espaçamento do título */
-        h1 {
-            margin-bottom: 0.5rem !important;
-            padding-bottom: 0 !important;
-        }
+# Métricas de reruns e sessões (GET /metrics no sidecar); desativadas não custam nada.
+# Com o launcher cada worker tem a própria porta (POWERBI_METRICS_PORT)
+if settings.metrics:
+    metrics.start_endpoint(settings.sidecar_host, settings.metrics_port or settings.sidecar_port)
 
-        /* Container para o wrapper do Power BI */
-        .powerbi-container {
-            width: 100%;
-            display: flex;
-            flex-direction: column;
-            align-items: center;
-            padding: 5px 10px;
-            margin-top: 0;
-        }
+# Pré-conexão com os domínios do Power BI, emitida antes de qualquer outro conteúdo
+st.markdown(render.resource_hints(), unsafe_allow_html=True)
 
-        .powerbi-embed-wrapper {
-            /* Define a largura máxima para o wrapper */
-            width: 100%;
-            /* Define a altura máxima para o wrapper */
-            max-height: 90vh;
-            /* Adiciona um aspecto de proporção para o iframe.
-            * O Power BI geralmente tem uma proporção de 16:9 ou 4:3.
-            * Usaremos um truque de padding-bottom para manter a proporção.
-            * 56.25% = 9/16 * 100 (para 16:9)
-            * 75% = 3/4 * 100 (para 4:3)
-            * Vamos usar 75% para um aspecto mais quadrado, comum em relatórios.
-            */
-            padding-bottom: 75%; /* Proporção 4:3 */
-            position: relative;
-            /* Adiciona uma sombra para destacar o painel */
-            box-shadow: 0 4px 8px rgba(0, 0, 0, 0.1);
-            /* Garante que o wrapper não ultrapasse a largura da tela */
-            max-width: 1200px;
-        }
+# CSS customizado para responsividade e indicador de dispositivo (montado uma vez por processo)
+st.markdown(render.page_css(settings.asset_mode, settings.build), unsafe_allow_html=True)
 
-        .powerbi-embed-wrapper iframe {
-            /* O iframe deve ocupar 100% do espaço do wrapper */
-            position: absolute;
-            top: 0;
-            left: 0;
-            width: 100%;
-            height: 100%;
-            /* Remove a borda padrão do iframe */
-            border: none;
-        }
-        
-        /* Força largura máxima do wrapper e iframe em mobile */
-        @media (max-width: 768px) {
-            .powerbi-embed-wrapper {
-                max-width: 767px !important;
-                width: 100% !important;
-            }
-            
-            .powerbi-embed-wrapper iframe {
-                max-width: 767px !important;
-            }
-        }
 
-        /*
-        * Media Query para dispositivos móveis (largura máxima de 768px).
-        * Em dispositivos móveis, o painel deve ocupar a largura total
-        * e ter uma altura mais flexível para melhor visualização.
-        */
-        @media (max-width: 768px) {
-            .powerbi-container {
-                padding: 5px 10px;
-                margin-top: 0;
-            }
+def render_admin():
+    """
+    Página de administração: percentis da telemetria de carregamento.
+    """
+    st.title("📈 Telemetria de Carregamento")
+    if not settings.telemetry:
+        st.info("Telemetria desativada. Defina POWERBI_TELEMETRY=1 para coletar os tempos.")
+        return
+    
+    st.caption("Beacons recebidos: {} · amostras das últimas {} medições por métrica e dispositivo".format(
+        telemetry.STORE.beacons, telemetry.MAX_SAMPLES))
+    rows = telemetry.STORE.summary()
+    if rows:
+        st.table(rows)
+    else:
+        st.info("Nenhum beacon recebido ainda.")
+    
+    with st.expander("Descrição das métricas"):
+        for name, description in telemetry.METRICS.items():
+            st.markdown("- `{}`: {}".format(name, description))
 
-            .powerbi-embed-wrapper {
-                /* Em mobile, mantém a proporção 4:3 */
-                padding-bottom: 75%;
-                /* Garante que ocupe a largura total da tela */
-                width: 100%;
-                max-width: none;
-            }
 
-            /* Adiciona uma mensagem para indicar que é a visualização mobile (padrão) */
-            .device-indicator::before {
-                content: "Visualização Mobile (Layout Inicial)";
-                display: block;
-                text-align: center;
-                padding: 10px;
-                background-color: #ffeb3b; /* Amarelo claro */
-                color: #333;
-                font-weight: bold;
-                margin-bottom: 5px;
-                border-radius: 5px;
-            }
-        }
+def render_wall(wall):
+    """
+    Modo mural (?wall=<id>): vários relatórios em grade, carregados por uma fila.
+    """
+    st.title(wall.title)
+    
+    # Em celulares a grade já nasce com uma coluna, e a altura do componente acompanha
+    layout = device.classify_headers(st.context.headers) if settings.device_detection else "auto"
+    columns = 1 if layout == "mobile" else wall.columns
+    
+    with metrics.stage("render"):
+        wall_html = render.wall_html(
+            wall,
+            columns=columns,
+            concurrency=settings.wall_concurrency,
+            asset_mode=settings.asset_mode,
+            build=settings.build,
+            idle_unload=settings.idle_unload,
+            refresh_interval=settings.refresh_interval,
+            refresh_jitter=settings.refresh_jitter,
+        )
+    height = render.wall_height(len(wall.reports), columns, wall.tile_height)
+    with metrics.stage("component"):
+        st.components.v1.html(wall_html, height=height, scrolling=True)
+    metrics.component_sent("wall", wall_html, st.session_state)
+
 
-        /*
-        * Media Query para dispositivos desktop (largura mínima de 769px).
-        */
-        @media (min-width: 769px) {
-            /* Adiciona uma mensagem para indicar que é a visualização desktop (ao dar zoom > 768px) */
-            .device-indicator::before {
-                content: "Visualização Desktop - Layout Web (Zoom > 768px)";
-                display: block;
-                text-align: center;
-                padding: 10px;
-                background-color: #4caf50; /* Verde */
-                color: white;
-                font-weight: bold;
-                margin-bottom: 5px;
-                border-radius: 5px;
-            }
-        }
+@st.fragment
+def render_help():
+    """
+    Painéis de ajuda, enviados só quando abertos.
 
-        /* Estilo para o cabeçalho/indicador */
-        .device-indicator {
-            width: 100%;
-            max-width: 1200px; /* Mesma largura máxima do wrapper */
-            margin: 0 auto;
-            padding: 5px 10px;
-            margin-bottom: 0;
-        }
-        
-        /* Remove margens e paddings do componente Streamlit */
-        iframe[data-testid="stIFrame"] {
-            margin: 0 !important;
-            padding: 0 !important;
-        }
-        
-        /* Remove espaçamento do componente HTML do Streamlit */
-        .stApp > div > div > div > div > div {
-            margin-top: 0 !important;
-        }
-        
-        /* Ajusta o espaçamento após o indicador */
-        div[data-testid="stVerticalBlock"] {
-            gap: 0 !important;
-        }
-    </style>
-""", unsafe_allow_html=True)
+    O ``st.expander`` envia o conteúdo mesmo fechado; com um toggle dentro de um
+    fragmento, o texto só é montado quando o usuário liga o painel, e ligar ou
+    desligar reexecuta apenas este fragmento (não o relatório).
+    """
+    if st.toggle("⚠️ Problema de carregamento?", key="help_loading"):
+        st.markdown(render.help_markdown("carregamento"), unsafe_allow_html=True)
+    if st.toggle("ℹ️ Sobre esta aplicação", key="help_about"):
+        st.markdown(render.help_markdown("sobre"))
+
+
+def renew_ticket(report, identity):
+    """
+    Ticket de renovação do token desta sessão, válido só para a origem da página.
+
+    Fica no session_state e só é trocado na metade da validade: um ticket novo a
+    cada rerun mudaria o HTML do componente e recarregaria o relatório.
+    """
+    parts = urlsplit(st.context.url or "")
+    if not (parts.scheme and parts.netloc):
+        return None
+    origin = "{}://{}".format(parts.scheme, parts.netloc)
+    key = (report.id, identity, origin)
+    cached = st.session_state.get("_powerbi_renew_ticket")
+    if cached and cached[0] == key and time.time() - cached[2] < tokens.TICKET_LIFETIME / 2:
+        return cached[1]
+    session_id = st.session_state.setdefault("_powerbi_renew_session", secrets.token_urlsafe(12))
+    ticket = tokens.issue_ticket(settings, report, identity, origin, session_id)
+    st.session_state["_powerbi_renew_ticket"] = (key, ticket, time.time())
+    return ticket
+
+
+def render_token_embed(report, link):
+    """
+    Modo de token (POWERBI_TOKEN_PROVIDER): o relatório abre com um token gerado no servidor.
+    """
+    # Relatórios com roles (segurança em nível de linha) levam o e-mail do usuário logado
+    identity = None
+    if report.roles:
+        identity = st.user.get("email") if st.user.get("is_logged_in") else None
+        if not identity:
+            st.error("⚠️ Este relatório exige login para gerar o token de incorporação.")
+            st.stop()
+    try:
+        with metrics.stage("token"):
+            service = tokens.get_service(settings)
+            token = service.get(report, identity)
+    except tokens.TokenError as exc:
+        st.error("⚠️ Não foi possível obter o token de incorporação: {}".format(exc))
+        st.stop()
+    metrics.add_collector("tokens", service.metric_families)
+    
+    with metrics.stage("render"):
+        powerbi_html = render.token_embed_html(
+            report,
+            token,
+            height=report.height,
+            asset_mode=settings.asset_mode,
+            build=settings.build,
+            renew_port=settings.sidecar_port,
+            idle_unload=settings.idle_unload,
+            refresh_interval=settings.refresh_interval,
+            refresh_jitter=settings.refresh_jitter,
+            deep_link=link,
+            renew_ahead=service.renew_window,
+            renew_url=settings.token_renew_url or None,
+        )
+    powerbi_html = tokens.with_renew_ticket(powerbi_html, renew_ticket(report, identity))
+    
+    with metrics.stage("component"):
+        st.components.v1.html(powerbi_html, height=report.height, scrolling=False)
+    metrics.component_sent("token", powerbi_html, st.session_state)
 
 
 def main():
     """
     Função principal da aplicação Streamlit.
     """
+    # Página de administração (?admin=<POWERBI_ADMIN_TOKEN>)
+    if settings.admin_token and st.query_params.get("admin") == settings.admin_token:
+        render_admin()
+        return
+    
+    # Relatório escolhido na URL (?report=<id>); sem parâmetro usa o padrão do registro.
+    # Com ?wall=<id>, exibe o mural com vários relatórios
+    wall_id = st.query_params.get("wall")
+    try:
+        with metrics.stage("registry"):
+            registry = load_registry(settings.registry_path)
+            if wall_id:
+                wall = registry.get_wall(wall_id)
+            else:
+                report = registry.get(st.query_params.get("report"))
+    except RegistryError as exc:
+        st.error("⚠️ {}".format(exc))
+        st.stop()
+    
+    if wall_id:
+        render_wall(wall)
+        return
+    
     # Título da aplicação
-    st.title("📊 Power BI Embed Responsivo")
+    st.title(report.title)
     
     # Indicador de dispositivo (Desktop/Mobile) usando HTML
     st.markdown('<div class="device-indicator"></div>', unsafe_allow_html=True)
     
-    # HTML completo com container, wrapper e iframe - usando iframe simples que funciona melhor com autoAuth
-    powerbi_html = f"""
-    <div class="powerbi-container">
-        <div class="powerbi-embed-wrapper">
-            <iframe 
-                id="powerbi-iframe" 
-                title="Power BI Report"
-                width="100%" 
-                height="100%" 
-                src="{POWER_BI_EMBED_URL}"
-                frameborder="0" 
-                allowFullScreen="true"
-                allow="fullscreen; clipboard-read; clipboard-write; autoplay; camera; microphone; payment"
-                style="position: absolute; top: 0; left: 0; border: none;"
-                onload="console.log('[Power BI] Iframe carregado');"
-                onerror="console.error('[Power BI] Erro ao carregar iframe');"
-            ></iframe>
-        </div>
-    </div>
+    # Filtros, página e indicador do registro e da URL (?filter=...&page=...&bookmark=...),
+    # aplicados já na abertura do relatório
+    try:
+        with metrics.stage("deep_link"):
+            link = filters.resolve(
+                report.deep_link,
+                tuple(st.query_params.get_all("filter")),
+                st.query_params.get("page"),
+                st.query_params.get("bookmark"),
+            )
+    except filters.FilterError as exc:
+        st.error("⚠️ {}".format(exc))
+        st.stop()
     
-    <script>
-        // URL do Power BI
-        const powerBIUrl = "{POWER_BI_EMBED_URL}";
-        
-        console.log('[Power BI] URL:', powerBIUrl);
-        console.log('[Power BI] Verificando se iframe está carregando...');
-        
-        // Monitora o carregamento do iframe
-        window.addEventListener('load', function() {{
-            const iframe = document.getElementById('powerbi-iframe');
-            if (iframe) {{
-                console.log('[Power BI] Iframe encontrado no DOM');
-                
-                // Verifica se o iframe carregou após 5 segundos
-                setTimeout(function() {{
-                    try {{
-                        // Tenta acessar o conteúdo do iframe (pode falhar por CORS)
-                        const iframeDoc = iframe.contentDocument || iframe.contentWindow.document;
-                        console.log('[Power BI] Conseguiu acessar conteúdo do iframe');
-                    }} catch(e) {{
-                        console.log('[Power BI] Não conseguiu acessar conteúdo do iframe (normal por CORS):', e.message);
-                    }}
-                    
-                    // Verifica se há erros visíveis
-                    const iframeSrc = iframe.src;
-                    console.log('[Power BI] URL atual do iframe:', iframeSrc);
-                    console.log('[Power BI] Iframe width:', iframe.offsetWidth, 'px');
-                    console.log('[Power BI] Iframe height:', iframe.offsetHeight, 'px');
-                }}, 5000);
-            }} else {{
-                console.error('[Power BI] Iframe não encontrado no DOM!');
-            }}
-        }});
-        
-        // Função para obter largura da viewport (funciona mesmo em iframe)
-        function getViewportWidth() {{
-            // Tenta acessar window.parent se estiver em iframe
-            try {{
-                if (window.parent && window.parent !== window) {{
-                    return window.parent.innerWidth || window.parent.document.documentElement.clientWidth || window.parent.document.body.clientWidth;
-                }}
-            }} catch(e) {{
-                // Se não conseguir acessar parent (CORS), usa o window atual
-            }}
-            // Fallback para window atual
-            return window.innerWidth || document.documentElement.clientWidth || document.body.clientWidth || screen.width;
-        }}
-        
-        // Função para verificar se deve usar versão mobile (baseado na largura da viewport)
-        // INVERSO: Começa mobile, vira desktop quando > 768px
-        function isMobileView() {{
-            const width = getViewportWidth();
-            // INVERTIDO: <= 768px = desktop (pois queremos começar mobile e trocar para web ao dar zoom)
-            // Agora: > 768px = mobile, <= 768px = desktop (invertido)
-            const isDesktop = width > 768;
-            const isMobile = !isDesktop; // Invertido: mobile é o padrão, desktop quando > 768px
-            console.log('[Power BI] Largura detectada:', width, 'px | É desktop?', isDesktop, '| Troca para web quando > 768px');
-            return isMobile; // Retorna true quando queremos manter mobile (width <= 768px)
-        }}
-        
-        // Função para atualizar o tamanho do iframe (Power BI detecta automaticamente o layout)
-        function updatePowerBISize() {{
-            const iframe = document.getElementById('powerbi-iframe');
-            if (!iframe) {{
-                console.log('[Power BI] Iframe não encontrado! Aguardando...');
-                setTimeout(updatePowerBISize, 200);
-                return;
-            }}
-            
-            const isMobile = isMobileView();
-            const viewportWidth = getViewportWidth();
-            
-            console.log('[Power BI] Estado atual:', {{
-                largura: viewportWidth,
-                isMobile: isMobile,
-                larguraAtualIframe: iframe.offsetWidth
-            }});
-            
-            // Atualiza o tamanho do iframe - o Power BI detecta automaticamente e renderiza em mobile
-            const currentIframeWidth = iframe.offsetWidth;
-            
-            // INVERTIDO: isMobile agora significa <= 768px (manter mobile/pequeno)
-            // Quando > 768px, trocar para desktop (web)
-            if (isMobile) {{
-                // Mantém mobile: largura 767px (pequeno)
-                const mobileWidth = 767;
-                
-                // Verifica se precisa recriar o iframe (se está maior que 767px)
-                const needsReload = currentIframeWidth > 767;
-                
-                // Força também o wrapper e container para garantir que tudo seja <= 767px
-                const wrapper = iframe.parentElement;
-                const container = wrapper ? wrapper.parentElement : null;
-                
-                // Sempre ajusta tamanho quando em mobile
-                console.log('[Power BI] ⚠️ MOBILE detectado - Ajustando largura:', mobileWidth + 'px');
-                console.log('[Power BI] Largura atual iframe:', currentIframeWidth, 'px | Precisa recarregar?', needsReload);
-                
-                // Força largura no wrapper primeiro
-                if (wrapper) {{
-                    wrapper.style.width = mobileWidth + 'px';
-                    wrapper.style.maxWidth = mobileWidth + 'px';
-                    wrapper.style.minWidth = mobileWidth + 'px';
-                }}
-                
-                // Força largura no container
-                if (container) {{
-                    container.style.width = mobileWidth + 'px';
-                    container.style.maxWidth = mobileWidth + 'px';
-                }}
-                
-                // Força largura no iframe
-                iframe.style.width = mobileWidth + 'px';
-                iframe.style.maxWidth = mobileWidth + 'px';
-                iframe.style.minWidth = mobileWidth + 'px';
-                iframe.setAttribute('width', mobileWidth);
-                
-                // Se o iframe está maior que 767px, recria para forçar Power BI a detectar mobile
-                if (needsReload) {{
-                    console.log('[Power BI] Recriando iframe para forçar detecção mobile...');
-                    
-                    const iframeParent = iframe.parentNode;
-                    const iframeId = iframe.id;
-                    const iframeTitle = iframe.title;
-                    const iframeAllow = iframe.getAttribute('allow');
-                    
-                    iframe.remove();
-                    
-                    setTimeout(function() {{
-                        const newIframe = document.createElement('iframe');
-                        newIframe.id = iframeId;
-                        newIframe.title = iframeTitle;
-                        newIframe.width = mobileWidth + 'px';
-                        newIframe.height = '100%';
-                        // Adiciona timestamp para evitar cache
-                        const cacheBuster = '&t=' + new Date().getTime();
-                        newIframe.src = powerBIUrl + (powerBIUrl.includes('?') ? '&' : '?') + cacheBuster.replace('&t=', 't=');
-                        newIframe.frameBorder = '0';
-                        newIframe.allowFullScreen = true;
-                        newIframe.setAttribute('allow', iframeAllow || 'fullscreen; clipboard-read; clipboard-write; autoplay; camera; microphone; payment');
-                        
-                        // Força largura absoluta com !important
-                        newIframe.setAttribute('style', 'position: absolute; top: 0; left: 0; border: none; width: ' + mobileWidth + 'px !important; max-width: ' + mobileWidth + 'px !important; min-width: ' + mobileWidth + 'px !important;');
-                        
-                        iframeParent.appendChild(newIframe);
-                        
-                        console.log('[Power BI] ✅ Iframe MOBILE recriado com largura:', mobileWidth + 'px');
-                        
-                        // Verifica após carregar
-                        newIframe.onload = function() {{
-                            const actualWidth = newIframe.offsetWidth;
-                            console.log('[Power BI] Iframe carregado. Largura verificada:', actualWidth, 'px (deve ser <= 767px)');
-                            if (actualWidth > 767) {{
-                                console.log('[Power BI] ⚠️ ATENÇÃO: Iframe ainda > 767px! Forçando novamente...');
-                                newIframe.style.width = mobileWidth + 'px';
-                                newIframe.style.maxWidth = mobileWidth + 'px';
-                                newIframe.setAttribute('width', mobileWidth);
-                            }} else {{
-                                console.log('[Power BI] ✅ Largura correta! Power BI deve detectar mobile.');
-                            }}
-                        }};
-                    }}, 100);
-                    return;
-                }} else {{
-                    console.log('[Power BI] ✓ Iframe já está com largura correta para mobile:', currentIframeWidth + 'px');
-                }}
-            }} else {{
-                // DESKTOP (quando viewport > 768px): largura 100% para ver layout web
-                console.log('[Power BI] ⚠️ DESKTOP detectado (viewport > 768px) - Trocando para layout WEB');
-                
-                // Desktop: largura 100%
-                iframe.style.width = '100%';
-                iframe.style.maxWidth = 'none';
-                iframe.style.minWidth = 'none';
-                
-                // Limpa tamanhos fixos do wrapper
-                const wrapper = iframe.parentElement;
-                if (wrapper) {{
-                    wrapper.style.width = '100%';
-                    wrapper.style.maxWidth = 'none';
-                    wrapper.style.minWidth = 'none';
-                }}
-                
-                const container = wrapper ? wrapper.parentElement : null;
-                if (container) {{
-                    container.style.width = '100%';
-                    container.style.maxWidth = 'none';
-                }}
-                
-                console.log('[Power BI] ✓ Iframe configurado para DESKTOP (100%)');
-            }}
-        }}
-        
-        // Executa quando o DOM estiver pronto
-        function initPowerBI() {{
-            console.log('[Power BI] Inicializando detecção mobile/desktop...');
-            // Aguarda um pouco para garantir que o iframe foi renderizado
-            setTimeout(function() {{
-                updatePowerBISize();
-            }}, 200);
-            
-            // Tenta novamente após mais tempo (caso o iframe demore mais)
-            setTimeout(function() {{
-                updatePowerBISize();
-            }}, 1000);
-        }}
-        
-        // Executa quando a página carrega
-        if (document.readyState === 'loading') {{
-            document.addEventListener('DOMContentLoaded', initPowerBI);
-        }} else {{
-            initPowerBI();
-        }}
-        
-        // Atualiza quando a janela é redimensionada (inclui zoom)
-        let resizeTimeout;
-        window.addEventListener('resize', function() {{
-            clearTimeout(resizeTimeout);
-            resizeTimeout = setTimeout(function() {{
-                console.log('[Power BI] Janela redimensionada, verificando...');
-                updatePowerBISize();
-            }}, 200);
-        }});
-        
-        // Atualiza quando a orientação do dispositivo muda
-        window.addEventListener('orientationchange', function() {{
-            console.log('[Power BI] Orientação mudou, verificando...');
-            setTimeout(updatePowerBISize, 300);
-        }});
-        
-        // Monitora mudanças no tamanho usando ResizeObserver
-        if (window.ResizeObserver) {{
-            try {{
-                const resizeObserver = new ResizeObserver(function(entries) {{
-                    for (let entry of entries) {{
-                        const width = entry.contentRect.width;
-                        console.log('[Power BI] ResizeObserver detectou largura:', width);
-                        updatePowerBISize();
-                    }}
-                }});
-                
-                // Observa o container
-                const container = document.querySelector('.powerbi-container');
-                if (container) {{
-                    resizeObserver.observe(container);
-                    console.log('[Power BI] ResizeObserver configurado no container');
-                }}
-                
-                // Também observa o body/document
-                resizeObserver.observe(document.body);
-            }} catch(e) {{
-                console.log('[Power BI] ResizeObserver não disponível ou erro:', e);
-            }}
-        }}
-        
-        // Polling adicional como fallback (verifica a cada 2 segundos se o tamanho mudou)
-        let lastWidth = getViewportWidth();
-        let lastWasMobile = null;
-        setInterval(function() {{
-            const currentWidth = getViewportWidth();
-            // INVERTIDO: mobile quando <= 768px (padrão), desktop quando > 768px
-            const currentIsMobile = currentWidth <= 768;
-            
-            // Verifica se mudou significativamente (mais de 10px) OU se mudou de modo
-            if (Math.abs(currentWidth - lastWidth) > 10 || (lastWasMobile !== null && lastWasMobile !== currentIsMobile)) {{
-                if (lastWasMobile !== null && lastWasMobile !== currentIsMobile) {{
-                    console.log('[Power BI] Polling detectou mudança de modo:', lastWasMobile ? 'MOBILE (<=768px - padrão)' : 'DESKTOP (>768px - zoom)', '→', currentIsMobile ? 'MOBILE (<=768px - padrão)' : 'DESKTOP (>768px - zoom)');
-                }} else {{
-                    console.log('[Power BI] Polling detectou mudança de largura:', lastWidth, '→', currentWidth);
-                }}
-                lastWidth = currentWidth;
-                lastWasMobile = currentIsMobile;
-                updatePowerBISize();
-            }}
-        }}, 2000);
-        
-        console.log('[Power BI] Script de detecção mobile/desktop carregado!');
-    </script>
-    """
+    if settings.token_provider != "off":
+        render_token_embed(report, link)
+        if st.query_params.get("stats") == "1":
+            st.json({"render": render.render_stats(), "tokens": tokens.get_service(settings).cache_stats()})
+        render_help()
+        return
+    
+    # Layout inicial detectado pelos cabeçalhos da requisição (User-Agent / Client Hints),
+    # para o iframe já nascer com a largura e a URL certas
+    with metrics.stage("device"):
+        layout = device.classify_headers(st.context.headers) if settings.device_detection else "auto"
+    url = filters.apply_to_url(report.url, link)
+    mobile_url = filters.apply_to_url(report.mobile_url, link)
+    desktop_url = filters.apply_to_url(report.desktop_url, link)
+    if layout == "mobile":
+        initial_url = mobile_url or url
+    elif layout == "desktop":
+        initial_url = desktop_url or url
+    else:
+        initial_url = url
+    
+    # HTML completo com container, wrapper e iframe (em cache por combinação de parâmetros)
+    with metrics.stage("render"):
+        powerbi_html = render.embed_html(
+            url,
+            layout=layout,
+            height=report.height,
+            asset_mode=settings.asset_mode,
+            reload_policy=settings.reload_policy,
+            cache_buster=settings.cache_buster,
+            loading=settings.loading,
+            mobile_url=mobile_url,
+            desktop_url=desktop_url,
+            aspect_ratio=report.aspect_ratio,
+            telemetry_url=settings.telemetry_url if settings.telemetry else None,
+            telemetry_port=settings.sidecar_port if settings.telemetry else None,
+            build=settings.build,
+            idle_unload=settings.idle_unload,
+            refresh_interval=settings.refresh_interval,
+            refresh_jitter=settings.refresh_jitter,
+            initial_url=initial_url,
+        )
     
     # Incorpora o HTML completo usando st.components.v1.html()
     # A altura será controlada pelo CSS padding-bottom do wrapper
-    st.components.v1.html(powerbi_html, height=650, scrolling=False)
+    with metrics.stage("component"):
+        st.components.v1.html(powerbi_html, height=report.height, scrolling=False)
+    metrics.component_sent("embed", powerbi_html, st.session_state)
     
-    # Nota informativa e ajuda com autenticação
-    # Mensagem de ajuda se o Power BI não carregar
-    st.markdown("""
-    <div style="background-color: #fff3cd; border-left: 4px solid #ffc107; padding: 10px; margin: 10px 0;">
-        <strong>⚠️ Problema de Carregamento?</strong><br>
-        Se você vê apenas o ícone do Power BI mas o relatório não carrega:
-        <ol>
-            <li><strong>Abra o Console do Navegador</strong> (F12 → Console) e verifique se há erros</li>
-            <li><strong>Verifique se está autenticado:</strong> Abra uma nova aba e acesse <a href="https://app.fabric.microsoft.com" target="_blank">https://app.fabric.microsoft.com</a></li>
-            <li><strong>Permita cookies de terceiros</strong> nas configurações do navegador</li>
-            <li><strong>Recarregue a página</strong> (F5) após fazer login no Microsoft Fabric</li>
-        </ol>
-    </div>
-    """, unsafe_allow_html=True)
+    # Contadores do cache de renderização (acesse com ?stats=1)
+    if st.query_params.get("stats") == "1":
+        st.json({"render": render.render_stats(), "device": device.cache_stats()})
     
-    with st.expander("ℹ️ Sobre esta aplicação"):
-        st.markdown("""
-        **Nota didática:**
-        - A responsividade é alcançada através de JavaScript que monitora o tamanho da viewport.
-        - O sistema detecta automaticamente quando a largura da tela é <= 768px (incluindo zoom).
-        - Quando detecta visualização mobile, troca automaticamente para a URL do Power BI mobile.
-        - Funciona tanto em dispositivos reais quanto ao dar zoom na página.
-        - As '@media queries' CSS ajustam o layout e exibem o indicador de dispositivo.
-        
-        **⚠️ Problemas de Autenticação - SOLUÇÃO:**
-        
-        **Passo 1 - Permitir Cookies de Terceiros:**
-        - No Chrome: Configurações → Privacidade e segurança → Cookies → Permitir cookies de terceiros
-        - No Edge: Configurações → Cookies e permissões de site → Permitir cookies de terceiros
-        - No Firefox: Configurações → Privacidade → Não rastrear → Desativar (temporariamente para testar)
-        
-        **Passo 2 - Autenticar no Power BI:**
-        1. Abra uma nova aba no mesmo navegador
-        2. Acesse: https://app.powerbi.com
-        3. Faça login na sua conta Microsoft/Office 365
-        4. Verifique se consegue ver o relatório diretamente no Power BI
-        5. Volte para esta aplicação e recarregue a página (F5)
-        
-        **Passo 3 - Testar URL Diretamente:**
-        - Abra em nova aba: [URL Mobile](https://app.powerbi.com/reportEmbed?reportId=a02c9e61-ca48-4fee-87fb-732616424882&autoAuth=true&ctid=04e74123-4ede-4a84-89ef-b7c6dfe29df8&actionBarEnabled=true)
-        - Se abrir diretamente mas não no iframe, o problema pode ser bloqueio de cookies de terceiros
-        
-        **Passo 4 - Verificar Console (F12):**
-        - Pressione F12 → Console
-        - Procure por erros relacionados a "cookie", "authentication" ou "CORS"
-        - Compartilhe os erros se persistir
-        """)
+    # Ajuda e solução de problemas: só enviadas ao navegador quando o usuário abre
+    render_help()
 
 
 if __name__ == '__main__':
-    main()
+    # Mede o rerun inteiro e conta a sessão (só com POWERBI_METRICS=1)
+    with metrics.rerun(st.session_state):
+        main()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark do lado do servidor: custo de uma sessão do ``app.py``.
+
+Usa o ``AppTest`` do Streamlit (sem navegador e sem rede) para simular N
+sessões abertas ao mesmo tempo e mede:
+
+- tempo de parede da primeira execução e dos reruns de cada sessão (p50/p95);
+- memória retida por sessão (``tracemalloc``);
+- tamanho em bytes de cada bloco enviado ao navegador (CSS, HTML do painel,
+  ajuda, expander...), somando o ``ByteSize()`` dos protos dos elementos.
+
+Uso (a partir da raiz do repositório)::
+
+    python benchmarks/bench_app.py                    # mede e imprime o JSON
+    python benchmarks/bench_app.py --check            # compara com baseline.json
+    python benchmarks/bench_app.py --update-baseline  # grava novo baseline.json
+
+Com ``--check`` o processo termina com código 1 se alguma métrica piorar além
+da tolerância (veja ``TOLERANCES``). As variáveis ``POWERBI_*`` valem aqui
+como no app, então é possível comparar, por exemplo, ``POWERBI_BUILD=production``.
+Tempos dependem da máquina: gere o baseline no mesmo ambiente em que ``--check``
+vai rodar.
+
+O ``AppTest`` não é thread-safe (ele troca o runtime global do Streamlit durante
+cada execução), então as sessões simultâneas são simuladas mantendo todas vivas
+e intercalando os reruns entre elas em uma única thread.
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+import warnings
+from pathlib import Path
+
+from streamlit import logger as streamlit_logger
+from streamlit.testing.v1 import AppTest
+
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / "app.py"
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline.json"
+
+# Tolerância de piora por sufixo do nome da métrica: (relativa, absoluta)
+TOLERANCES = {
+    "_ms": (0.50, 2.0),
+    "_kb": (0.25, 16.0),
+    "_bytes": (0.05, 16),
+}
+
+
+def _label(node):
+    """
+    Nome do bloco da página a que um elemento pertence.
+    """
+    if node.type == "markdown":
+        body = node.proto.body
+        if "<style" in body or 'rel="stylesheet"' in body:
+            return "page_css"
+        if "preconnect" in body:
+            return "resource_hints"
+        if "device-indicator" in body:
+            return "device_indicator"
+        if "Problema de Carregamento" in body:
+            return "help_banner"
+    if node.type == "iframe":
+        return "embed_html"
+    if node.type == "expander":
+        return "help_expander"
+    if node.type == "flex_container" and any(child.type == "toggle" for child in node.children.values()):
+        # Fragmento dos painéis de ajuda (só os toggles, com os painéis fechados)
+        return "help_panels"
+    return node.type
+
+
+def _node_bytes(node):
+    """
+    Bytes do proto do nó somados aos de todos os filhos.
+    """
+    proto = getattr(node, "proto", None)
+    total = proto.ByteSize() if proto is not None else 0
+    children = getattr(node, "children", None)
+    if isinstance(children, dict):
+        total += sum(_node_bytes(child) for child in children.values())
+    return total
+
+
+def payload_sizes(app_test):
+    """
+    Bytes por bloco da página principal de uma sessão já executada.
+    """
+    sizes = {}
+    for node in app_test.main.children.values():
+        label = _label(node)
+        sizes[label] = sizes.get(label, 0) + _node_bytes(node)
+    return sizes
+
+
+def _new_session(timeout):
+    session = AppTest.from_file(str(APP_PATH), default_timeout=timeout)
+    started = time.perf_counter()
+    session.run()
+    elapsed = (time.perf_counter() - started) * 1000
+    if session.exception:
+        raise RuntimeError("Erro ao executar o app: {}".format(session.exception[0].message))
+    return session, elapsed
+
+
+def _rerun(session):
+    started = time.perf_counter()
+    session.run()
+    return (time.perf_counter() - started) * 1000
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    rank = max(1, -(-pct * len(ordered) // 100))
+    return ordered[int(rank) - 1]
+
+
+def run_benchmark(sessions=20, reruns=5, timeout=30):
+    """
+    Executa o benchmark e retorna o dicionário de métricas.
+    """
+    # Aquecimento: popula caches de processo (CSS/HTML, registro) fora das medições
+    warmup, _ = _new_session(timeout)
+    payload = payload_sizes(warmup)
+    del warmup
+
+    # Memória retida: sessões abertas em sequência e mantidas vivas até o fim
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    alive = []
+    first_runs = []
+    for _ in range(sessions):
+        session, elapsed = _new_session(timeout)
+        alive.append(session)
+        first_runs.append(elapsed)
+    retained = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    # Reruns intercalados entre todas as sessões abertas (como interações de
+    # usuários diferentes chegando ao mesmo processo)
+    rerun_times = []
+    for _ in range(reruns):
+        for session in alive:
+            rerun_times.append(_rerun(session))
+            if session.exception:
+                raise RuntimeError("Erro ao executar o app: {}".format(session.exception[0].message))
+    del alive
+
+    metrics = {
+        "first_run_ms_p50": round(statistics.median(first_runs), 2),
+        "first_run_ms_p95": round(_percentile(first_runs, 95), 2),
+        "rerun_ms_p50": round(statistics.median(rerun_times), 2),
+        "rerun_ms_p95": round(_percentile(rerun_times, 95), 2),
+        "session_memory_kb": round(retained / sessions / 1024, 1),
+        "payload_total_bytes": sum(payload.values()),
+    }
+    for label, size in sorted(payload.items()):
+        metrics["payload_{}_bytes".format(label)] = size
+    return metrics
+
+
+def compare(metrics, baseline):
+    """
+    Retorna a lista de regressões (métrica, baseline, atual, limite).
+    """
+    regressions = []
+    for name, reference in sorted(baseline.items()):
+        current = metrics.get(name)
+        if current is None:
+            continue
+        for suffix, (relative, absolute) in TOLERANCES.items():
+            if name.endswith(suffix):
+                limit = reference * (1 + relative) + absolute
+                if current > limit:
+                    regressions.append((name, reference, current, round(limit, 2)))
+                break
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20, help="sessões abertas ao mesmo tempo (padrão: 20)")
+    parser.add_argument("--reruns", type=int, default=5, help="reruns por sessão (padrão: 5)")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="arquivo de baseline")
+    parser.add_argument("--output", type=Path, help="grava o resultado neste arquivo JSON")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--check", action="store_true", help="falha se houver regressão em relação ao baseline")
+    group.add_argument("--update-baseline", action="store_true", help="grava o resultado como novo baseline")
+    args = parser.parse_args(argv)
+
+    # O AppTest avisa sobre APIs e contexto a cada sessão; não interessa aqui
+    warnings.simplefilter("ignore")
+    streamlit_logger.set_log_level(logging.ERROR)
+
+    metrics = run_benchmark(args.sessions, args.reruns)
+    result = {
+        "config": {
+            "sessions": args.sessions,
+            "reruns": args.reruns,
+            "env": {key: value for key, value in sorted(os.environ.items()) if key.startswith("POWERBI_")},
+        },
+        "metrics": metrics,
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False) + "\n"
+    print(text, end="")
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+
+    if args.update_baseline:
+        args.baseline.write_text(text, encoding="utf-8")
+        print("Baseline gravado em {}".format(args.baseline), file=sys.stderr)
+    elif args.check:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["metrics"]
+        regressions = compare(metrics, baseline)
+        for name, reference, current, limit in regressions:
+            print("REGRESSÃO {}: {} -> {} (limite {})".format(name, reference, current, limit), file=sys.stderr)
+        if regressions:
+            return 1
+        print("Sem regressões em relação a {}".format(args.baseline), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
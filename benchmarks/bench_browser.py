@@ -0,0 +1,422 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark no navegador: custo do script de redimensionamento (embed.js).
+
+Abre um Chromium headless (Playwright) em uma página local que imita a do
+Streamlit: o HTML do componente gerado por ``embed.render.embed_html`` roda em
+um iframe ``srcdoc`` e o relatório aponta para uma página stub servida
+localmente no lugar de ``app.powerbi.com`` (sem rede e sem login). Cada
+cenário reproduz uma sequência de redimensionamentos, zoom ou rotação e mede:
+
+- gatilhos e execuções do script (``window.__powerbiStats``: events, frames,
+  updates, recreations);
+- layouts e recálculos de estilo do documento (métricas ``LayoutCount`` e
+  ``RecalcStyleCount`` do Chrome DevTools Protocol) e o tempo gasto neles;
+- long tasks (> 50 ms) observadas na página;
+- iframes do Power BI recriados ou renavegados (``MutationObserver``) e
+  carregamentos da página stub registrados pelo servidor.
+
+Uso (a partir da raiz do repositório)::
+
+    pip install playwright && playwright install chromium
+    python benchmarks/bench_browser.py                    # mede e imprime o JSON
+    python benchmarks/bench_browser.py --check            # compara com browser_baseline.json
+    python benchmarks/bench_browser.py --update-baseline  # grava novo browser_baseline.json
+
+O Playwright não é dependência da aplicação; só este script precisa dele. As
+variáveis ``POWERBI_*`` (build, política de recarga, carregamento...) valem aqui
+como no app. Cada cenário roda ``--repeat`` vezes em uma página nova e o
+resultado é a mediana.
+"""
+
+import argparse
+import html
+import json
+import statistics
+import sys
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embed import render, sidecar, static_assets  # noqa: E402
+from embed.settings import get_settings  # noqa: E402
+
+BASELINE_PATH = Path(__file__).resolve().parent / "browser_baseline.json"
+
+# Janela inicial (desktop) e altura do componente
+VIEWPORT = {"width": 1280, "height": 800}
+HEIGHT = 650
+
+# Espera após cada cenário para o script terminar (a recriação do iframe usa setTimeout de 100 ms)
+SETTLE_MS = 500
+
+# Tolerância de piora por métrica: (relativa, absoluta)
+TOLERANCES = {
+    "events": (0.10, 2),
+    "frames": (0.10, 2),
+    "updates": (0.0, 0),
+    "recreations": (0.0, 0),
+    "iframe_recreations": (0.0, 0),
+    "iframe_navigations": (0.0, 0),
+    "stub_loads": (0.0, 0),
+    "layouts": (0.25, 5),
+    "style_recalcs": (0.25, 5),
+    "layout_ms": (0.50, 5.0),
+    "style_ms": (0.50, 5.0),
+    "script_ms": (0.50, 10.0),
+    "long_tasks": (0.0, 1),
+}
+
+# Página do Streamlit simulada: o componente em um iframe srcdoc (mesma origem),
+# com observadores de long tasks e de mutações do iframe do Power BI
+_HARNESS_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<script>
+window.__bench = {{ longTasks: 0, longTaskMs: 0, iframeRecreations: 0, iframeNavigations: 0 }};
+if (window.PerformanceObserver) {{
+    try {{
+        new PerformanceObserver(function(list) {{
+            list.getEntries().forEach(function(entry) {{
+                window.__bench.longTasks++;
+                window.__bench.longTaskMs += entry.duration;
+            }});
+        }}).observe({{ type: 'longtask', buffered: true }});
+    }} catch(e) {{}}
+}}
+function observeComponent(frame) {{
+    const doc = frame.contentDocument;
+    new MutationObserver(function(mutations) {{
+        mutations.forEach(function(mutation) {{
+            if (mutation.type === 'attributes' && mutation.target.id === 'powerbi-iframe') {{
+                window.__bench.iframeNavigations++;
+            }}
+            mutation.removedNodes.forEach(function(node) {{
+                if (node.id === 'powerbi-iframe') {{
+                    window.__bench.iframeRecreations++;
+                }}
+            }});
+        }});
+    }}).observe(doc, {{ subtree: true, childList: true, attributes: true, attributeFilter: ['src'] }});
+    window.__bench.ready = true;
+}}
+</script>
+<style>
+body {{ margin: 0; font-family: sans-serif; }}
+.block-container {{ padding: 1rem 1rem; }}
+#component {{ width: 100%; height: {height}px; border: 0; display: block; }}
+</style>
+</head>
+<body>
+<div class="block-container">
+<h1>Benchmark</h1>
+<iframe id="component" onload="observeComponent(this)" srcdoc="{srcdoc}"></iframe>
+</div>
+</body>
+</html>
+"""
+
+# Página que substitui o relatório do Power BI
+_STUB_PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>stub</title>
+<style>body { margin: 0; background: #f3f2f1; font: 14px sans-serif; }</style>
+</head><body><p id="size"></p>
+<script>
+function show() { document.getElementById('size').textContent = innerWidth + 'x' + innerHeight; }
+addEventListener('resize', show);
+show();
+</script></body></html>
+"""
+
+
+def _storm_widths(steps):
+    # Alterna entre larguras dos dois lados do breakpoint (768px)
+    widths = (1280, 700, 1024, 390, 900, 600, 1440, 767, 769)
+    return [widths[i % len(widths)] for i in range(steps)]
+
+
+def _drag_widths():
+    # Borda da janela arrastada de 1280px até 320px e de volta, 8px por evento
+    down = list(range(1280, 319, -8))
+    return down + down[::-1]
+
+
+# Níveis de zoom do navegador (a largura CSS é a física dividida pelo zoom)
+ZOOM_LEVELS = (1.0, 1.1, 1.25, 1.5, 1.75, 2.0, 2.5, 3.0, 2.5, 2.0, 1.75, 1.5, 1.25, 1.1, 1.0)
+
+# Tamanho de um celular em retrato (largura, altura)
+PHONE = (390, 844)
+
+
+class Harness:
+    """
+    Servidor local com a página simulada e o stub do Power BI.
+    """
+
+    def __init__(self, settings, variants=False):
+        self.settings = settings
+        self.variants = variants
+        self.stub_loads = 0
+        self._lock = threading.Lock()
+        self.server = sidecar.start("127.0.0.1", 0)
+        if self.server is None:
+            raise RuntimeError("Não foi possível iniciar o servidor local")
+        self.origin = "http://127.0.0.1:{}".format(self.server.server_address[1])
+
+        stub_url = self.origin + "/powerbi/view?r=benchmark"
+        page = self._page(stub_url)
+        sidecar.route("GET", "/", lambda request: (200, "text/html; charset=utf-8", page))
+        sidecar.route("GET", "/powerbi/view", self._stub)
+        # Assets publicados em static/ (POWERBI_ASSET_MODE=static), como o Streamlit serve
+        if static_assets.STATIC_DIR.is_dir():
+            for path in static_assets.STATIC_DIR.iterdir():
+                self._route_static(path)
+
+    def _page(self, stub_url):
+        settings = self.settings
+        component = render.embed_html(
+            stub_url,
+            height=HEIGHT,
+            asset_mode=settings.asset_mode,
+            reload_policy=settings.reload_policy,
+            cache_buster=settings.cache_buster,
+            loading=settings.loading,
+            mobile_url=stub_url + "&variant=mobile" if self.variants else None,
+            build=settings.build,
+        )
+        document = _HARNESS_TEMPLATE.format(height=HEIGHT, srcdoc=html.escape(component, quote=True))
+        return document.encode("utf-8")
+
+    def _route_static(self, path):
+        content_type = "application/javascript" if path.suffix == ".js" else "text/css"
+        body = path.read_bytes()
+        sidecar.route("GET", "/" + static_assets.STATIC_URL_PREFIX + path.name,
+                      lambda request: (200, content_type, body))
+
+    def _stub(self, request):
+        with self._lock:
+            self.stub_loads += 1
+        return 200, "text/html; charset=utf-8", _STUB_PAGE
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def _component_frame(page):
+    for frame in page.frames:
+        if frame.parent_frame is page.main_frame:
+            try:
+                if frame.evaluate("!!window.__powerbiStats"):
+                    return frame
+            except Exception:
+                continue
+    raise RuntimeError("Componente do painel não encontrado na página")
+
+
+def _snapshot(page, frame, cdp, harness):
+    metrics = {item["name"]: item["value"] for item in cdp.send("Performance.getMetrics")["metrics"]}
+    stats = frame.evaluate("Object.assign({}, window.__powerbiStats)")
+    bench = page.evaluate("Object.assign({}, window.__bench)")
+    return {
+        "events": stats["events"],
+        "frames": stats["frames"],
+        "updates": stats["updates"],
+        "recreations": stats["recreations"],
+        "iframe_recreations": bench["iframeRecreations"],
+        "iframe_navigations": bench["iframeNavigations"],
+        "stub_loads": harness.stub_loads,
+        "layouts": metrics.get("LayoutCount", 0),
+        "style_recalcs": metrics.get("RecalcStyleCount", 0),
+        "layout_ms": metrics.get("LayoutDuration", 0) * 1000,
+        "style_ms": metrics.get("RecalcStyleDuration", 0) * 1000,
+        "script_ms": metrics.get("ScriptDuration", 0) * 1000,
+        "long_tasks": bench["longTasks"],
+        "long_task_ms": bench["longTaskMs"],
+    }
+
+
+def _resize(page, cdp, widths):
+    for width in widths:
+        page.set_viewport_size({"width": width, "height": VIEWPORT["height"]})
+
+
+def _zoom(page, cdp, levels):
+    # Zoom do navegador: mesma janela física, largura CSS menor e densidade de pixels maior
+    for level in levels:
+        cdp.send("Emulation.setDeviceMetricsOverride", {
+            "width": round(VIEWPORT["width"] / level),
+            "height": round(VIEWPORT["height"] / level),
+            "deviceScaleFactor": level,
+            "mobile": False,
+        })
+
+
+def _rotate(page, cdp, turns):
+    # Celular girando entre retrato e paisagem (dispara resize e orientationchange)
+    width, height = PHONE
+    for turn in range(turns):
+        landscape = turn % 2 == 0
+        cdp.send("Emulation.setDeviceMetricsOverride", {
+            "width": height if landscape else width,
+            "height": width if landscape else height,
+            "deviceScaleFactor": 3,
+            "mobile": True,
+            "screenOrientation": {
+                "type": "landscapePrimary" if landscape else "portraitPrimary",
+                "angle": 90 if landscape else 0,
+            },
+        })
+
+
+def _idle(page, cdp, duration_ms):
+    # Nada muda: mede o custo de fundo do script (timers, polling)
+    page.wait_for_timeout(duration_ms)
+
+
+# Cenários: nome -> (função, argumento)
+SCENARIOS = {
+    "idle": (_idle, 3000),
+    "resize_storm": (_resize, _storm_widths(60)),
+    "drag": (_resize, _drag_widths()),
+    "zoom": (_zoom, ZOOM_LEVELS),
+    "orientation": (_rotate, 12),
+}
+
+
+def run_scenario(browser, harness, name):
+    """
+    Executa um cenário em uma página nova e retorna as métricas (diferença
+    entre o estado antes e depois da sequência de eventos).
+    """
+    action, argument = SCENARIOS[name]
+    context = browser.new_context(viewport=VIEWPORT)
+    page = context.new_page()
+    try:
+        cdp = context.new_cdp_session(page)
+        cdp.send("Performance.enable")
+        page.goto(harness.origin + "/", wait_until="load")
+        page.wait_for_function("window.__bench && window.__bench.ready")
+        frame = _component_frame(page)
+        # Deixa o script aplicar o layout inicial antes de medir
+        page.wait_for_timeout(SETTLE_MS)
+
+        before = _snapshot(page, frame, cdp, harness)
+        started = time.perf_counter()
+        action(page, cdp, argument)
+        elapsed = (time.perf_counter() - started) * 1000
+        page.wait_for_timeout(SETTLE_MS)
+        after = _snapshot(page, frame, cdp, harness)
+    finally:
+        context.close()
+
+    result = {key: after[key] - before[key] for key in after}
+    result["wall_ms"] = elapsed
+    return result
+
+
+def run_benchmark(scenarios, repeat=3, headed=False, variants=False):
+    """
+    Executa os cenários e retorna ``{cenário: {métrica: mediana}}``.
+    """
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        raise SystemExit("Playwright não instalado. Use: pip install playwright && playwright install chromium")
+
+    harness = Harness(get_settings(), variants)
+    results = {}
+    try:
+        with sync_playwright() as playwright:
+            browser = playwright.chromium.launch(headless=not headed)
+            try:
+                for name in scenarios:
+                    runs = [run_scenario(browser, harness, name) for _ in range(repeat)]
+                    results[name] = {
+                        key: round(statistics.median(run[key] for run in runs), 2)
+                        for key in runs[0]
+                    }
+            finally:
+                browser.close()
+    finally:
+        harness.close()
+    return results
+
+
+def compare(results, baseline):
+    """
+    Retorna a lista de regressões (cenário, métrica, baseline, atual, limite).
+    """
+    regressions = []
+    for scenario, metrics in sorted(baseline.items()):
+        current = results.get(scenario)
+        if current is None:
+            continue
+        for name, reference in sorted(metrics.items()):
+            if name not in TOLERANCES or name not in current:
+                continue
+            relative, absolute = TOLERANCES[name]
+            limit = reference * (1 + relative) + absolute
+            if current[name] > limit:
+                regressions.append((scenario, name, reference, current[name], round(limit, 2)))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="cenário a executar (repita para vários; padrão: todos)")
+    parser.add_argument("--repeat", type=int, default=3, help="execuções por cenário (padrão: 3)")
+    parser.add_argument("--variants", action="store_true",
+                        help="usa uma URL mobile própria (troca de URL ao cruzar o breakpoint)")
+    parser.add_argument("--headed", action="store_true", help="mostra a janela do navegador")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="arquivo de baseline")
+    parser.add_argument("--output", type=Path, help="grava o resultado neste arquivo JSON")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--check", action="store_true", help="falha se houver regressão em relação ao baseline")
+    group.add_argument("--update-baseline", action="store_true", help="grava o resultado como novo baseline")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    scenarios = args.scenario or list(SCENARIOS)
+    results = run_benchmark(scenarios, args.repeat, args.headed, args.variants)
+    result = {
+        "config": {
+            "repeat": args.repeat,
+            "asset_mode": settings.asset_mode,
+            "reload_policy": settings.reload_policy,
+            "loading": settings.loading,
+            "build": settings.build,
+            "variants": args.variants,
+        },
+        "scenarios": results,
+    }
+    text = json.dumps(result, indent=2, ensure_ascii=False) + "\n"
+    print(text, end="")
+    if args.output:
+        args.output.write_text(text, encoding="utf-8")
+
+    if args.update_baseline:
+        args.baseline.write_text(text, encoding="utf-8")
+        print("Baseline gravado em {}".format(args.baseline), file=sys.stderr)
+    elif args.check:
+        if not args.baseline.exists():
+            print("Baseline {} não existe; gere com --update-baseline".format(args.baseline), file=sys.stderr)
+            return 2
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))["scenarios"]
+        regressions = compare(results, baseline)
+        for scenario, name, reference, current, limit in regressions:
+            print("REGRESSÃO {}.{}: {} -> {} (limite {})".format(scenario, name, reference, current, limit),
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print("Sem regressões em relação a {}".format(args.baseline), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,7 @@
+# -*- coding: utf-8 -*-
+"""
+Módulos de apoio da aplicação de incorporação do Power BI.
+
+Ficam fora do ``app.py`` porque o Streamlit reexecuta o script principal a cada
+interação; módulos importados são carregados uma única vez por processo.
+"""
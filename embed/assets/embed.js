@@ -0,0 +1,457 @@
+// Logs de diagnóstico: no build de produção (POWERBI_BUILD=production) as linhas
+// console.log(...) e os blocos entre "#if DEBUG" e "#endif" são removidos
+// (veja embed/build.py). Use console.log só em linhas com uma única instrução.
+
+// Configuração injetada pelo app (window.POWERBI_EMBED)
+const config = window.POWERBI_EMBED || {};
+
+// URL base do Power BI (usada no modo que não tem variante própria)
+const powerBIUrl = config.url;
+
+// Política ao cruzar o breakpoint (veja embed/settings.py):
+// - 'recreate': recria o iframe quando ele está largo demais para o layout mobile
+// - 'in-place': mantém o iframe vivo e só redimensiona via CSS
+const reloadPolicy = config.reloadPolicy || 'recreate';
+
+// Contadores do script (inspecione window.__powerbiStats no console):
+// - events: gatilhos recebidos (resize, orientação, ResizeObserver, init)
+// - frames: callbacks de requestAnimationFrame executados
+// - updates: execuções de updatePowerBISize (só quando o breakpoint muda)
+// - recreations: vezes que o iframe foi recriado
+// - refreshes / unloads: recargas agendadas e descargas por inatividade (visibility.js)
+const powerBIStats = window.__powerbiStats = { events: 0, frames: 0, updates: 0, recreations: 0, refreshes: 0, unloads: 0 };
+
+// Telemetria de carregamento (ativa quando o app informa telemetryUrl ou telemetryPort).
+// As métricas vão para uma fila e são enviadas em lotes com navigator.sendBeacon.
+const TELEMETRY_BATCH_SIZE = 10;
+const telemetryQueue = [];
+let telemetryTotalsSent = false;
+let navigationTimingSent = false;
+// Instante (performance.now) em que o iframe começou a carregar a URL atual;
+// no carregamento imediato o iframe começa junto com o documento (0)
+let iframeLoadStart = 0;
+
+function telemetryEndpoint() {
+    if (config.telemetryUrl) {
+        return config.telemetryUrl;
+    }
+    if (!config.telemetryPort) {
+        return null;
+    }
+    try {
+        const location = window.parent.location;
+        return location.protocol + '//' + location.hostname + ':' + config.telemetryPort + '/beacon';
+    } catch(e) {
+        return null;
+    }
+}
+
+const telemetryUrl = telemetryEndpoint();
+
+function queueMetric(metric, value) {
+    if (!telemetryUrl || typeof value !== 'number' || !isFinite(value) || value < 0) {
+        return;
+    }
+    telemetryQueue.push({ metric: metric, value: Math.round(value) });
+    if (telemetryQueue.length >= TELEMETRY_BATCH_SIZE) {
+        flushTelemetry();
+    }
+}
+
+// Tempos de navegação da página do Streamlit (documento pai), enviados uma vez
+function queueNavigationTiming() {
+    if (navigationTimingSent) {
+        return;
+    }
+    try {
+        const entry = window.parent.performance.getEntriesByType('navigation')[0];
+        if (entry) {
+            navigationTimingSent = true;
+            queueMetric('ttfb_ms', entry.responseStart);
+            queueMetric('dom_content_loaded_ms', entry.domContentLoadedEventEnd);
+            if (entry.loadEventEnd > 0) {
+                queueMetric('page_load_ms', entry.loadEventEnd);
+            }
+        }
+    } catch(e) {
+        // Sem acesso ao documento pai: ignora os tempos de navegação
+    }
+}
+
+function flushTelemetry() {
+    if (!telemetryUrl || telemetryQueue.length === 0 || !navigator.sendBeacon) {
+        return;
+    }
+    const events = telemetryQueue.splice(0, telemetryQueue.length);
+    navigator.sendBeacon(telemetryUrl, JSON.stringify({ events: events }));
+}
+
+// Ao sair/ocultar a página: envia os totais da visita e o que restou na fila
+function flushTelemetryOnExit() {
+    if (!telemetryTotalsSent) {
+        telemetryTotalsSent = true;
+        queueNavigationTiming();
+        queueMetric('iframe_recreations', powerBIStats.recreations);
+        queueMetric('resize_events', powerBIStats.events);
+    }
+    flushTelemetry();
+}
+
+if (telemetryUrl) {
+    // 'load' não borbulha, mas passa pela fase de captura: pega também iframes recriados
+    document.addEventListener('load', function(event) {
+        const src = event.target && event.target.id === 'powerbi-iframe' && event.target.getAttribute('src');
+        if (src && src !== 'about:blank') {
+            queueMetric('iframe_load_ms', performance.now() - iframeLoadStart);
+            queueNavigationTiming();
+            flushTelemetry();
+        }
+    }, true);
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flushTelemetryOnExit();
+        }
+    });
+    window.addEventListener('pagehide', flushTelemetryOnExit);
+}
+
+// URL atualmente carregada no iframe (sem o cache-buster); começa pela do src
+// inicial, que o servidor pode ter escolhido pelo dispositivo (config.initialUrl)
+let currentUrl = config.initialUrl || powerBIUrl;
+
+// URL do Power BI para cada modo (variantes opcionais mobileUrl/desktopUrl)
+function urlForMode(isMobile) {
+    return (isMobile ? config.mobileUrl : config.desktopUrl) || powerBIUrl;
+}
+
+// Adiciona timestamp para evitar cache (opcional: config.cacheBuster)
+function withCacheBuster(url) {
+    if (!config.cacheBuster) {
+        return url;
+    }
+    return url + (url.includes('?') ? '&' : '?') + 't=' + new Date().getTime();
+}
+
+console.log('[Power BI] URL:', powerBIUrl);
+console.log('[Power BI] Verificando se iframe está carregando...');
+
+// Estratégia de carregamento (veja embed/settings.py): 'eager', 'lazy', 'visible' ou 'interaction'.
+// Nas estratégias adiadas o iframe nasce sem src (só data-src) e com um placeholder.
+const loadingStrategy = config.loading || 'eager';
+
+// O iframe ainda não recebeu src (carregamento adiado)
+function isDeferred(iframe) {
+    return !iframe.getAttribute('src');
+}
+
+// Atribui o src adiado ao iframe (uma única vez) e remove o placeholder ao carregar
+function loadDeferredIframe() {
+    const iframe = document.getElementById('powerbi-iframe');
+    if (!iframe || !isDeferred(iframe)) {
+        return;
+    }
+    const placeholder = document.querySelector('.powerbi-placeholder');
+    if (placeholder) {
+        placeholder.textContent = 'Carregando relatório...';
+        iframe.addEventListener('load', function() {
+            placeholder.remove();
+        }, { once: true });
+    }
+    console.log('[Power BI] Carregamento adiado liberado (' + loadingStrategy + ')');
+    iframe.removeAttribute('data-src');
+    iframeLoadStart = performance.now();
+    iframe.src = currentUrl;
+}
+
+// Configura o gatilho do carregamento adiado
+function setupDeferredLoading() {
+    if (loadingStrategy === 'visible' && window.IntersectionObserver) {
+        // Carrega quando o painel entra na área visível da página
+        const observer = new IntersectionObserver(function(entries) {
+            if (entries.some(function(entry) { return entry.isIntersecting; })) {
+                observer.disconnect();
+                loadDeferredIframe();
+            }
+        });
+        observer.observe(document.querySelector('.powerbi-container'));
+    } else if (loadingStrategy === 'interaction') {
+        // Carrega na primeira interação do usuário com o painel
+        const events = ['pointerdown', 'keydown', 'touchstart', 'wheel'];
+        const onFirstInteraction = function() {
+            events.forEach(function(name) {
+                document.removeEventListener(name, onFirstInteraction, true);
+            });
+            loadDeferredIframe();
+        };
+        events.forEach(function(name) {
+            document.addEventListener(name, onFirstInteraction, { capture: true, passive: true });
+        });
+    } else {
+        // 'visible' sem IntersectionObserver: carrega imediatamente
+        loadDeferredIframe();
+    }
+}
+
+// #if DEBUG
+// Monitora o carregamento do iframe
+window.addEventListener('load', function() {
+    const iframe = document.getElementById('powerbi-iframe');
+    if (iframe) {
+        console.log('[Power BI] Iframe encontrado no DOM');
+
+        // Verifica se o iframe carregou após 5 segundos
+        setTimeout(function() {
+            try {
+                // Tenta acessar o conteúdo do iframe (pode falhar por CORS)
+                const iframeDoc = iframe.contentDocument || iframe.contentWindow.document;
+                console.log('[Power BI] Conseguiu acessar conteúdo do iframe');
+            } catch(e) {
+                console.log('[Power BI] Não conseguiu acessar conteúdo do iframe (normal por CORS):', e.message);
+            }
+
+            // Verifica se há erros visíveis
+            const iframeSrc = iframe.src;
+            console.log('[Power BI] URL atual do iframe:', iframeSrc);
+            console.log('[Power BI] Iframe width:', iframe.offsetWidth, 'px');
+            console.log('[Power BI] Iframe height:', iframe.offsetHeight, 'px');
+        }, 5000);
+    } else {
+        console.error('[Power BI] Iframe não encontrado no DOM!');
+    }
+});
+// #endif
+
+// Função para obter largura da viewport (funciona mesmo em iframe)
+function getViewportWidth() {
+    // Tenta acessar window.parent se estiver em iframe
+    try {
+        if (window.parent && window.parent !== window) {
+            return window.parent.innerWidth || window.parent.document.documentElement.clientWidth || window.parent.document.body.clientWidth;
+        }
+    } catch(e) {
+        // Se não conseguir acessar parent (CORS), usa o window atual
+    }
+    // Fallback para window atual
+    return window.innerWidth || document.documentElement.clientWidth || document.body.clientWidth || screen.width;
+}
+
+// Função para verificar se deve usar versão mobile (baseado na largura da viewport)
+// INVERSO: Começa mobile, vira desktop quando > 768px
+function isMobileView() {
+    const width = getViewportWidth();
+    // INVERTIDO: <= 768px = desktop (pois queremos começar mobile e trocar para web ao dar zoom)
+    // Agora: > 768px = mobile, <= 768px = desktop (invertido)
+    const isDesktop = width > 768;
+    const isMobile = !isDesktop; // Invertido: mobile é o padrão, desktop quando > 768px
+    console.log('[Power BI] Largura detectada:', width, 'px | É desktop?', isDesktop, '| Troca para web quando > 768px');
+    return isMobile; // Retorna true quando queremos manter mobile (width <= 768px)
+}
+
+// Largura usada para forçar o layout mobile do Power BI (<= 768px)
+const MOBILE_WIDTH = 767;
+
+// Função para atualizar o tamanho do iframe (Power BI detecta automaticamente o layout)
+// Dividida em fase de leitura e fase de escrita: uma única leitura de layout
+// (offsetWidth) antes de qualquer alteração, e as larguras são aplicadas por
+// classes CSS no container (embed.css), custando um único recálculo de estilo.
+function updatePowerBISize(isMobile) {
+    const iframe = document.getElementById('powerbi-iframe');
+    const container = document.querySelector('.powerbi-container');
+    if (!iframe || !container) {
+        console.log('[Power BI] Iframe não encontrado! Aguardando...');
+        setTimeout(function() {
+            updatePowerBISize(isMobile);
+        }, 200);
+        return;
+    }
+
+    // --- Fase de leitura ---
+    const currentIframeWidth = iframe.offsetWidth;
+    const targetUrl = urlForMode(isMobile);
+    // Recarregar só é realmente necessário quando a URL do modo é outra (variantes
+    // mobile/desktop) ou, na política 'recreate', quando o iframe está maior que
+    // 767px em mobile (para forçar o Power BI a detectar o layout mobile)
+    // Iframe ainda sem src (carregamento adiado) não precisa recarregar: basta trocar a URL pendente
+    const deferred = isDeferred(iframe);
+    const urlChanged = targetUrl !== currentUrl;
+    const needsReload = !deferred && (urlChanged || (reloadPolicy === 'recreate' && isMobile && currentIframeWidth > MOBILE_WIDTH));
+
+    // #if DEBUG
+    console.log('[Power BI] Estado atual:', {
+        isMobile: isMobile,
+        larguraAtualIframe: currentIframeWidth,
+        politica: reloadPolicy,
+        precisaRecarregar: needsReload
+    });
+    // #endif
+
+    // --- Fase de escrita ---
+    // INVERTIDO: isMobile significa <= 768px (manter mobile/pequeno: 767px no container,
+    // wrapper e iframe); quando > 768px, desktop (web) com 100% da largura
+    container.classList.toggle('pbi-mobile', isMobile);
+    container.classList.toggle('pbi-desktop', !isMobile);
+
+    if (deferred) {
+        currentUrl = targetUrl;
+    } else if (needsReload && reloadPolicy === 'in-place') {
+        // Mantém o mesmo elemento e apenas navega para a URL do novo modo
+        console.log('[Power BI] Trocando URL do iframe para o modo', isMobile ? 'MOBILE' : 'DESKTOP');
+        currentUrl = targetUrl;
+        iframeLoadStart = performance.now();
+        iframe.src = withCacheBuster(targetUrl);
+    } else if (needsReload) {
+        console.log('[Power BI] Recriando iframe para forçar detecção mobile...');
+
+        const iframeParent = iframe.parentNode;
+        const newIframe = iframe.cloneNode(false);
+        currentUrl = targetUrl;
+        newIframe.src = withCacheBuster(targetUrl);
+        iframe.remove();
+
+        setTimeout(function() {
+            powerBIStats.recreations++;
+            iframeLoadStart = performance.now();
+            iframeParent.appendChild(newIframe);
+            console.log('[Power BI] ✅ Iframe recriado para o modo', isMobile ? 'MOBILE (' + MOBILE_WIDTH + 'px)' : 'DESKTOP (100%)');
+        }, 100);
+    } else {
+        console.log('[Power BI] ✓ Iframe configurado para', isMobile ? 'MOBILE (' + MOBILE_WIDTH + 'px)' : 'DESKTOP (100%)');
+    }
+}
+
+// Último modo aplicado (null = ainda não aplicado). Quando o servidor já detectou
+// o dispositivo (config.layout 'mobile'/'desktop'), o HTML inicial já vem com a
+// largura certa e o script só reage a mudanças posteriores.
+let lastIsMobile = config.layout === 'mobile' ? true : (config.layout === 'desktop' ? false : null);
+let frameRequested = false;
+
+// Executado no máximo uma vez por frame, independentemente de quantos eventos chegaram
+function runScheduledUpdate() {
+    frameRequested = false;
+    powerBIStats.frames++;
+
+    const isMobile = isMobileView();
+    if (isMobile === lastIsMobile) {
+        return;
+    }
+
+    console.log('[Power BI] Mudança de modo:', lastIsMobile === null ? 'inicial' : (lastIsMobile ? 'MOBILE' : 'DESKTOP'), '→', isMobile ? 'MOBILE (<=768px - padrão)' : 'DESKTOP (>768px - zoom)');
+    lastIsMobile = isMobile;
+    powerBIStats.updates++;
+    updatePowerBISize(isMobile);
+}
+
+// Agendador único: todos os gatilhos passam por aqui e são agrupados no próximo frame
+function scheduleUpdate() {
+    powerBIStats.events++;
+    if (frameRequested) {
+        return;
+    }
+    frameRequested = true;
+    window.requestAnimationFrame(runScheduledUpdate);
+}
+
+// Executa quando o DOM estiver pronto
+function initPowerBI() {
+    console.log('[Power BI] Inicializando detecção mobile/desktop...');
+    scheduleUpdate();
+    if (loadingStrategy === 'visible' || loadingStrategy === 'interaction') {
+        setupDeferredLoading();
+    }
+}
+
+// Executa quando a página carrega
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initPowerBI);
+} else {
+    initPowerBI();
+}
+
+// Atualiza quando a janela é redimensionada (inclui zoom) ou a orientação muda
+window.addEventListener('resize', scheduleUpdate);
+window.addEventListener('orientationchange', scheduleUpdate);
+
+// Monitora mudanças no tamanho do container (ex.: layout do Streamlit mudou sem resize da janela)
+let containerObserver = null;
+if (window.ResizeObserver) {
+    try {
+        const container = document.querySelector('.powerbi-container');
+        if (container) {
+            containerObserver = new ResizeObserver(scheduleUpdate);
+            containerObserver.observe(container);
+            console.log('[Power BI] ResizeObserver configurado no container');
+        }
+    } catch(e) {
+        console.log('[Power BI] ResizeObserver não disponível ou erro:', e);
+    }
+}
+
+// Aba oculta: solta os listeners e o observer (nenhum trabalho em segundo plano)
+function pauseUpdates() {
+    window.removeEventListener('resize', scheduleUpdate);
+    window.removeEventListener('orientationchange', scheduleUpdate);
+    if (containerObserver) {
+        containerObserver.disconnect();
+    }
+}
+
+// Aba visível de novo: religa tudo e confere o tamanho (a janela pode ter mudado)
+function resumeUpdates() {
+    window.addEventListener('resize', scheduleUpdate);
+    window.addEventListener('orientationchange', scheduleUpdate);
+    const container = document.querySelector('.powerbi-container');
+    if (containerObserver && container) {
+        containerObserver.observe(container);
+    }
+    scheduleUpdate();
+}
+
+// Recarrega só o iframe com a URL do modo atual (a página continua como está)
+function reloadIframe() {
+    const iframe = document.getElementById('powerbi-iframe');
+    if (!iframe || isDeferred(iframe)) {
+        return;
+    }
+    iframeLoadStart = performance.now();
+    iframe.src = withCacheBuster(currentUrl);
+}
+
+let iframeUnloaded = false;
+
+// Aba oculta há muito tempo: troca o relatório por uma página vazia
+function unloadIframe() {
+    const iframe = document.getElementById('powerbi-iframe');
+    if (!iframe || isDeferred(iframe)) {
+        return;
+    }
+    iframeUnloaded = true;
+    powerBIStats.unloads++;
+    iframe.src = 'about:blank';
+}
+
+function restoreIframe() {
+    if (iframeUnloaded) {
+        iframeUnloaded = false;
+        reloadIframe();
+    }
+}
+
+function refreshIframe() {
+    if (!iframeUnloaded) {
+        powerBIStats.refreshes++;
+        reloadIframe();
+    }
+}
+
+// Pausa com a aba oculta, descarga por inatividade e recarga agendada (visibility.js)
+if (window.powerBIVisibility) {
+    window.powerBIVisibility(config, {
+        pause: pauseUpdates,
+        resume: resumeUpdates,
+        unload: unloadIframe,
+        restore: restoreIframe,
+        refresh: refreshIframe
+    });
+}
+
+console.log('[Power BI] Script de detecção mobile/desktop carregado!');
@@ -0,0 +1,92 @@
+// Service worker do modo PWA da exportação estática (python -m embed.export --pwa).
+// A configuração (self.POWERBI_SW) é gravada pelo export no início deste arquivo:
+// - version: hash do conteúdo do site; muda a cada exportação com alterações
+// - precache: URLs (relativas ao escopo) do shell: páginas, assets, manifest e ícone
+//
+// Estratégias:
+// - assets versionados (assets/*.<hash>.*): cache primeiro (o conteúdo nunca muda)
+// - demais arquivos do shell e páginas: stale-while-revalidate (responde do cache
+//   e atualiza em segundo plano para a próxima visita)
+// - outras origens (o iframe do Power BI): não interceptadas, vão direto à rede
+
+const swConfig = self.POWERBI_SW || { version: 'dev', precache: [] };
+const CACHE_PREFIX = 'powerbi-shell-';
+const CACHE_NAME = CACHE_PREFIX + swConfig.version;
+const ASSETS_PATH = 'assets/';
+
+function scopedUrl(path) {
+    return new URL(path, self.registration.scope).href;
+}
+
+self.addEventListener('install', function(event) {
+    event.waitUntil(
+        caches.open(CACHE_NAME).then(function(cache) {
+            return cache.addAll(swConfig.precache.map(scopedUrl));
+        }).then(function() {
+            return self.skipWaiting();
+        })
+    );
+});
+
+// Remove os caches de versões anteriores do shell
+self.addEventListener('activate', function(event) {
+    event.waitUntil(
+        caches.keys().then(function(names) {
+            return Promise.all(names.filter(function(name) {
+                return name.startsWith(CACHE_PREFIX) && name !== CACHE_NAME;
+            }).map(function(name) {
+                return caches.delete(name);
+            }));
+        }).then(function() {
+            return self.clients.claim();
+        })
+    );
+});
+
+// Busca na rede e guarda a resposta (só respostas completas e bem-sucedidas)
+function fetchAndCache(cache, request) {
+    return fetch(request).then(function(response) {
+        if (response.ok && response.type === 'basic') {
+            cache.put(request, response.clone());
+        }
+        return response;
+    });
+}
+
+function cacheFirst(event) {
+    return caches.open(CACHE_NAME).then(function(cache) {
+        return cache.match(event.request).then(function(cached) {
+            return cached || fetchAndCache(cache, event.request);
+        });
+    });
+}
+
+function staleWhileRevalidate(event) {
+    return caches.open(CACHE_NAME).then(function(cache) {
+        return cache.match(event.request, { ignoreSearch: event.request.mode === 'navigate' }).then(function(cached) {
+            const update = fetchAndCache(cache, event.request);
+            if (cached) {
+                // Atualiza em segundo plano; falhas de rede não afetam a resposta do cache
+                event.waitUntil(update.catch(function() {}));
+                return cached;
+            }
+            return update;
+        });
+    });
+}
+
+self.addEventListener('fetch', function(event) {
+    const request = event.request;
+    if (request.method !== 'GET') {
+        return;
+    }
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin || !request.url.startsWith(self.registration.scope)) {
+        return;
+    }
+    if (request.url.startsWith(scopedUrl(ASSETS_PATH))) {
+        event.respondWith(cacheFirst(event));
+    } else {
+        event.respondWith(staleWhileRevalidate(event));
+    }
+});
@@ -0,0 +1,238 @@
+// Script do modo de token de incorporação (POWERBI_TOKEN_PROVIDER): o relatório é
+// aberto pela biblioteca powerbi-client com um token gerado no servidor (veja
+// embed/tokens.py), sem a cadeia de redirecionamentos de login do autoAuth.
+// - Layout: o agendador por frame troca entre MobilePortrait e Master pela largura
+//   (report.updateSettings), sem recarregar o relatório.
+// - Renovação: antes de o token expirar, busca um novo no sidecar (POST /embed-token,
+//   com o ticket da sessão; renewUrl ou a porta renewPort no host da página) e aplica
+//   com report.setAccessToken.
+// As mesmas regras de build do embed.js valem aqui (veja embed/build.py).
+
+// Configuração injetada pelo app (window.POWERBI_TOKEN)
+const tokenConfig = window.POWERBI_TOKEN || {};
+
+// Largura (px) até a qual o relatório usa o layout mobile
+const MOBILE_BREAKPOINT = 768;
+
+// Renova o token este tempo antes de expirar (ms): a janela de renovação do servidor
+// (POWERBI_TOKEN_REFRESH_AHEAD), em que o sidecar já entrega um token novo
+const RENEW_AHEAD = tokenConfig.renewAhead || 5 * 60 * 1000;
+// Espera após uma falha, ou quando o sidecar devolveu o mesmo token (ms)
+const RENEW_RETRY = 30 * 1000;
+
+// Contadores do script (inspecione window.__powerbiStats no console):
+// - events / frames / updates: como no embed.js (updates = trocas de layout)
+// - embeds: relatórios incorporados; renewals: tokens renovados no navegador
+// - refreshes / unloads: recargas agendadas e descargas por inatividade (visibility.js)
+const powerBIStats = window.__powerbiStats = { events: 0, frames: 0, updates: 0, embeds: 0, renewals: 0, refreshes: 0, unloads: 0 };
+
+const reportElement = document.getElementById('powerbi-report');
+let accessToken = tokenConfig.accessToken;
+let expiration = tokenConfig.expiration || 0;
+let embeddedReport = null;
+let isMobile = null;
+let renewTimer = null;
+// Instante (relógio do navegador) da próxima renovação agendada
+let renewDue = 0;
+
+function sdk() {
+    return window.powerbi && window['powerbi-client'] ? window['powerbi-client'] : null;
+}
+
+function layoutFor(mobile) {
+    const models = sdk().models;
+    return mobile ? models.LayoutType.MobilePortrait : models.LayoutType.Master;
+}
+
+function embedReport() {
+    const client = sdk();
+    if (!client) {
+        console.error('[Power BI] Biblioteca powerbi-client não carregou');
+        reportElement.textContent = 'Não foi possível carregar o relatório.';
+        return;
+    }
+    isMobile = reportElement.offsetWidth <= MOBILE_BREAKPOINT;
+    console.log('[Power BI] Incorporando com token, layout', isMobile ? 'MOBILE' : 'DESKTOP');
+    const embedConfig = {
+        type: 'report',
+        id: tokenConfig.reportId,
+        embedUrl: tokenConfig.embedUrl,
+        accessToken: accessToken,
+        tokenType: client.models.TokenType.Embed,
+        settings: {
+            layoutType: layoutFor(isMobile),
+            panes: { filters: { visible: false } }
+        }
+    };
+    // Filtros, página e indicador entram na configuração inicial: a primeira
+    // consulta do relatório já é a filtrada (veja embed/filters.py)
+    if (tokenConfig.filters) {
+        embedConfig.filters = tokenConfig.filters;
+    }
+    if (tokenConfig.pageName) {
+        embedConfig.pageName = tokenConfig.pageName;
+    }
+    if (tokenConfig.bookmark) {
+        embedConfig.bookmark = { name: tokenConfig.bookmark };
+    }
+    embeddedReport = window.powerbi.embed(reportElement, embedConfig);
+    powerBIStats.embeds++;
+    embeddedReport.on('error', function(event) {
+        console.error('[Power BI] Erro no relatório:', event.detail);
+    });
+}
+
+// Endereço de renovação: a URL pública (POWERBI_TOKEN_RENEW_URL) ou o sidecar no
+// mesmo host da página do Streamlit
+function renewEndpoint() {
+    if (!tokenConfig.renewTicket) {
+        return null;
+    }
+    if (tokenConfig.renewUrl) {
+        return tokenConfig.renewUrl;
+    }
+    if (!tokenConfig.renewPort) {
+        return null;
+    }
+    try {
+        const location = window.parent.location;
+        if (location.protocol === 'https:') {
+            // O sidecar fala HTTP: o navegador bloquearia a chamada (conteúdo misto)
+            console.error('[Power BI] Página em HTTPS: defina POWERBI_TOKEN_RENEW_URL para renovar o token');
+            return null;
+        }
+        return location.protocol + '//' + location.hostname + ':' + tokenConfig.renewPort + '/embed-token';
+    } catch(e) {
+        return null;
+    }
+}
+
+function scheduleRenewal(delay) {
+    delay = Math.max(0, delay);
+    clearTimeout(renewTimer);
+    renewDue = Date.now() + delay;
+    renewTimer = setTimeout(renewToken, delay);
+}
+
+function renewToken() {
+    renewTimer = null;
+    const endpoint = renewEndpoint();
+    if (!endpoint) {
+        return;
+    }
+    // Corpo text/plain: requisição simples (sem preflight CORS)
+    fetch(endpoint, { method: 'POST', body: tokenConfig.renewTicket }).then(function(response) {
+        if (!response.ok) {
+            throw new Error('HTTP ' + response.status);
+        }
+        return response.json();
+    }).then(function(data) {
+        // Validade pelo relógio do servidor, quando disponível
+        const remaining = typeof data.expiresIn === 'number' ? data.expiresIn : data.expiration - Date.now();
+        // Nunca antes de RENEW_RETRY: se o sidecar devolveu o mesmo token, a busca
+        // não se repete em laço até o servidor renovar
+        scheduleRenewal(Math.max(remaining - RENEW_AHEAD, RENEW_RETRY));
+        if (data.expiration <= expiration) {
+            return;
+        }
+        accessToken = data.token;
+        expiration = data.expiration;
+        powerBIStats.renewals++;
+        console.log('[Power BI] Token renovado');
+        if (embeddedReport) {
+            return embeddedReport.setAccessToken(accessToken);
+        }
+    }).catch(function(error) {
+        console.error('[Power BI] Falha ao renovar o token:', error);
+        scheduleRenewal(RENEW_RETRY);
+    });
+}
+
+let frameRequested = false;
+
+// Executado no máximo uma vez por frame: uma leitura de largura e, se o modo
+// mudou, uma única chamada updateSettings
+function runScheduledUpdate() {
+    frameRequested = false;
+    powerBIStats.frames++;
+    const mobile = reportElement.offsetWidth <= MOBILE_BREAKPOINT;
+    if (!embeddedReport || mobile === isMobile) {
+        return;
+    }
+    isMobile = mobile;
+    powerBIStats.updates++;
+    console.log('[Power BI] Trocando layout para', mobile ? 'MOBILE' : 'DESKTOP');
+    embeddedReport.updateSettings({ layoutType: layoutFor(mobile) });
+}
+
+function scheduleUpdate() {
+    powerBIStats.events++;
+    if (frameRequested) {
+        return;
+    }
+    frameRequested = true;
+    window.requestAnimationFrame(runScheduledUpdate);
+}
+
+let resizeObserver = window.ResizeObserver ? new ResizeObserver(scheduleUpdate) : null;
+
+function resumeUpdates() {
+    window.addEventListener('resize', scheduleUpdate);
+    window.addEventListener('orientationchange', scheduleUpdate);
+    if (resizeObserver) {
+        resizeObserver.observe(reportElement);
+    }
+    scheduleUpdate();
+    // O timer de renovação pode ter atrasado com a aba oculta
+    if (renewTimer && Date.now() >= renewDue) {
+        scheduleRenewal(0);
+    }
+}
+
+function pauseUpdates() {
+    window.removeEventListener('resize', scheduleUpdate);
+    window.removeEventListener('orientationchange', scheduleUpdate);
+    if (resizeObserver) {
+        resizeObserver.disconnect();
+    }
+}
+
+function initTokenEmbed() {
+    embedReport();
+    resumeUpdates();
+    if (expiration) {
+        scheduleRenewal(expiration - Date.now() - RENEW_AHEAD);
+    }
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initTokenEmbed);
+} else {
+    initTokenEmbed();
+}
+
+// Pausa com a aba oculta, descarga por inatividade e recarga agendada (visibility.js);
+// a recarga usa report.refresh(), que atualiza os dados sem recarregar o relatório
+if (window.powerBIVisibility) {
+    window.powerBIVisibility(tokenConfig, {
+        pause: pauseUpdates,
+        resume: resumeUpdates,
+        unload: function() {
+            if (embeddedReport) {
+                powerBIStats.unloads++;
+                window.powerbi.reset(reportElement);
+                embeddedReport = null;
+            }
+        },
+        restore: embedReport,
+        refresh: function() {
+            if (embeddedReport) {
+                powerBIStats.refreshes++;
+                embeddedReport.refresh().catch(function() {
+                    // refresh() exige permissão no dataset: recarrega o relatório
+                    embeddedReport.reload();
+                });
+            }
+        }
+    });
+}
@@ -0,0 +1,89 @@
+// Visibilidade da página e recarga agendada, comum ao painel (embed.js) e ao mural
+// (wall.js), que chamam window.powerBIVisibility(opções, handlers) ao iniciar.
+//
+// - Aba oculta: handlers.pause() (o script solta listeners e observers) e a recarga
+//   agendada fica parada; ao voltar, handlers.resume().
+// - opções.idleUnload (s): oculta por esse tempo, handlers.unload() descarrega os
+//   iframes (libera CPU/memória do Power BI); ao voltar, handlers.restore().
+// - opções.refreshInterval (s): handlers.refresh() recarrega só os iframes, sem
+//   recarregar a página; opções.refreshJitter (s) espalha o instante entre telas.
+// Fica dentro de uma função para não colidir com os nomes globais dos scripts.
+window.powerBIVisibility = (function() {
+    // Menor intervalo aceito entre recargas (ms)
+    const MIN_REFRESH_DELAY = 1000;
+
+    return function setupVisibility(options, handlers) {
+        const idleUnloadMs = (options.idleUnload || 0) * 1000;
+        const refreshMs = (options.refreshInterval || 0) * 1000;
+        const jitterMs = (options.refreshJitter || 0) * 1000;
+        let refreshTimer = null;
+        let unloadTimer = null;
+        let unloaded = false;
+        let lastRefresh = Date.now();
+
+        // Intervalo com variação aleatória de +/- jitter
+        function jittered(ms) {
+            return Math.max(MIN_REFRESH_DELAY, ms + (Math.random() * 2 - 1) * jitterMs);
+        }
+
+        function armRefresh(delay) {
+            clearTimeout(refreshTimer);
+            refreshTimer = setTimeout(runRefresh, delay);
+        }
+
+        function runRefresh() {
+            refreshTimer = null;
+            lastRefresh = Date.now();
+            console.log('[Power BI] Recarga agendada dos relatórios');
+            handlers.refresh();
+            armRefresh(jittered(refreshMs));
+        }
+
+        function onHidden() {
+            clearTimeout(refreshTimer);
+            refreshTimer = null;
+            handlers.pause();
+            console.log('[Power BI] Página oculta: atualizações pausadas');
+            if (idleUnloadMs) {
+                unloadTimer = setTimeout(function() {
+                    unloadTimer = null;
+                    unloaded = true;
+                    console.log('[Power BI] Página oculta há', idleUnloadMs / 1000, 's: descarregando relatórios');
+                    handlers.unload();
+                }, idleUnloadMs);
+            }
+        }
+
+        function onVisible() {
+            clearTimeout(unloadTimer);
+            unloadTimer = null;
+            if (unloaded) {
+                unloaded = false;
+                lastRefresh = Date.now();
+                console.log('[Power BI] Página visível: recarregando relatórios descarregados');
+                handlers.restore();
+            }
+            handlers.resume();
+            if (refreshMs) {
+                // Recarga vencida enquanto oculta: executa logo (dentro do jitter)
+                const remaining = refreshMs - (Date.now() - lastRefresh);
+                armRefresh(remaining > 0 ? remaining : Math.random() * jitterMs);
+            }
+        }
+
+        document.addEventListener('visibilitychange', function() {
+            if (document.visibilityState === 'hidden') {
+                onHidden();
+            } else {
+                onVisible();
+            }
+        });
+
+        if (document.visibilityState === 'hidden') {
+            // Aberta em segundo plano (ex.: nova aba): já começa pausada
+            onHidden();
+        } else if (refreshMs) {
+            armRefresh(jittered(refreshMs));
+        }
+    };
+})();
@@ -0,0 +1,261 @@
+// Script do modo mural (?wall=<id>): vários relatórios em uma grade, com uma única
+// instância do script para todos os painéis.
+// - Fila de carregamento: no máximo config.concurrency iframes carregando ao mesmo
+//   tempo; painéis visíveis na tela entram primeiro, na ordem da grade.
+// - Agendador único: resize, orientação e um único ResizeObserver (observando todos
+//   os painéis) são agrupados em um callback por frame, com uma fase de leitura das
+//   larguras e uma fase de escrita.
+// As mesmas regras de build do embed.js valem aqui (veja embed/build.py).
+
+// Configuração injetada pelo app (window.POWERBI_WALL)
+const wallConfig = window.POWERBI_WALL || {};
+const wallTiles = wallConfig.tiles || [];
+const concurrency = Math.max(1, wallConfig.concurrency || 2);
+
+// Vaga na fila liberada mesmo se o evento load nunca chegar (ms)
+const LOAD_TIMEOUT = 30000;
+
+// Painel com até 768px de largura usa a variante mobile da URL (se houver)
+const MOBILE_BREAKPOINT = 768;
+
+// Contadores do script (inspecione window.__powerbiStats no console):
+// - events: gatilhos recebidos; frames: callbacks de requestAnimationFrame executados
+// - updates: painéis que mudaram de modo mobile/desktop; loads: iframes carregados
+// - refreshes / unloads: recargas agendadas e descargas por inatividade (visibility.js)
+const powerBIStats = window.__powerbiStats = { events: 0, frames: 0, updates: 0, loads: 0, refreshes: 0, unloads: 0 };
+
+// Estado de cada painel: 'pending' (na fila), 'loading', 'loaded' ou 'unloaded'
+const wallState = wallTiles.map(function(tile, index) {
+    const element = document.querySelector('[data-tile="' + index + '"]');
+    return {
+        tile: tile,
+        element: element,
+        iframe: element.querySelector('iframe'),
+        placeholder: element.querySelector('.powerbi-placeholder'),
+        visible: false,
+        status: 'pending',
+        isMobile: null,
+        url: null
+    };
+});
+let loadingCount = 0;
+// Fila parada enquanto a aba está oculta
+let queuePaused = false;
+
+// URL do painel para o modo atual (variantes opcionais mobileUrl/desktopUrl)
+function tileUrl(entry) {
+    return (entry.isMobile ? entry.tile.mobileUrl : entry.tile.desktopUrl) || entry.tile.url;
+}
+
+// Próximo painel da fila: o primeiro visível; sem nenhum visível, o primeiro da grade
+function nextPendingTile() {
+    let fallback = null;
+    for (let i = 0; i < wallState.length; i++) {
+        const entry = wallState[i];
+        if (entry.status !== 'pending') {
+            continue;
+        }
+        if (entry.visible) {
+            return entry;
+        }
+        if (!fallback) {
+            fallback = entry;
+        }
+    }
+    return fallback;
+}
+
+function pumpQueue() {
+    while (!queuePaused && loadingCount < concurrency) {
+        const entry = nextPendingTile();
+        if (!entry) {
+            return;
+        }
+        startLoad(entry);
+    }
+}
+
+function startLoad(entry) {
+    entry.status = 'loading';
+    loadingCount++;
+    if (entry.isMobile === null) {
+        entry.isMobile = entry.element.offsetWidth <= MOBILE_BREAKPOINT;
+    }
+    if (entry.placeholder) {
+        entry.placeholder.textContent = 'Carregando relatório...';
+    }
+
+    let finished = false;
+    let timer = null;
+    const finish = function() {
+        if (finished) {
+            return;
+        }
+        finished = true;
+        clearTimeout(timer);
+        entry.status = 'loaded';
+        loadingCount--;
+        powerBIStats.loads++;
+        if (entry.placeholder) {
+            entry.placeholder.remove();
+            entry.placeholder = null;
+        }
+        console.log('[Power BI] Painel carregado:', entry.tile.id);
+        // O modo pode ter mudado enquanto o painel carregava
+        scheduleUpdate();
+        pumpQueue();
+    };
+    timer = setTimeout(finish, LOAD_TIMEOUT);
+    entry.iframe.addEventListener('load', finish, { once: true });
+
+    entry.url = tileUrl(entry);
+    console.log('[Power BI] Carregando painel:', entry.tile.id, '(' + loadingCount + '/' + concurrency + ')');
+    entry.iframe.removeAttribute('data-src');
+    entry.iframe.src = entry.url;
+}
+
+let frameRequested = false;
+
+// Executado no máximo uma vez por frame para todos os painéis
+function runScheduledUpdate() {
+    frameRequested = false;
+    powerBIStats.frames++;
+
+    // --- Fase de leitura ---
+    const widths = wallState.map(function(entry) {
+        return entry.element.offsetWidth;
+    });
+
+    // --- Fase de escrita ---
+    wallState.forEach(function(entry, index) {
+        const isMobile = widths[index] <= MOBILE_BREAKPOINT;
+        if (isMobile === entry.isMobile) {
+            return;
+        }
+        entry.isMobile = isMobile;
+        powerBIStats.updates++;
+        // Painéis na fila usam o modo novo quando forem carregados; os carregados só
+        // trocam de URL se houver variantes diferentes para os dois modos
+        if (entry.status === 'loaded') {
+            const url = tileUrl(entry);
+            if (url !== entry.url) {
+                console.log('[Power BI] Trocando URL do painel', entry.tile.id, 'para o modo', isMobile ? 'MOBILE' : 'DESKTOP');
+                entry.url = url;
+                entry.iframe.src = url;
+            }
+        }
+    });
+}
+
+// Agendador único: todos os gatilhos passam por aqui e são agrupados no próximo frame
+function scheduleUpdate() {
+    powerBIStats.events++;
+    if (frameRequested) {
+        return;
+    }
+    frameRequested = true;
+    window.requestAnimationFrame(runScheduledUpdate);
+}
+
+function initWall() {
+    console.log('[Power BI] Mural com', wallState.length, 'painéis, até', concurrency, 'carregando ao mesmo tempo');
+    if (window.IntersectionObserver) {
+        // A primeira notificação chega para todos os painéis: só então a fila começa,
+        // já sabendo quais estão visíveis
+        const observer = new IntersectionObserver(function(entries) {
+            entries.forEach(function(item) {
+                const entry = wallState[Number(item.target.getAttribute('data-tile'))];
+                entry.visible = item.isIntersecting;
+            });
+            pumpQueue();
+        });
+        wallState.forEach(function(entry) {
+            observer.observe(entry.element);
+        });
+    } else {
+        wallState.forEach(function(entry) {
+            entry.visible = true;
+        });
+        pumpQueue();
+    }
+    scheduleUpdate();
+}
+
+if (document.readyState === 'loading') {
+    document.addEventListener('DOMContentLoaded', initWall);
+} else {
+    initWall();
+}
+
+window.addEventListener('resize', scheduleUpdate);
+window.addEventListener('orientationchange', scheduleUpdate);
+
+let resizeObserver = null;
+if (window.ResizeObserver) {
+    resizeObserver = new ResizeObserver(scheduleUpdate);
+    wallState.forEach(function(entry) {
+        resizeObserver.observe(entry.element);
+    });
+}
+
+// Aba oculta: para a fila e solta os listeners e o observer (nenhum trabalho em segundo plano)
+function pauseUpdates() {
+    queuePaused = true;
+    window.removeEventListener('resize', scheduleUpdate);
+    window.removeEventListener('orientationchange', scheduleUpdate);
+    if (resizeObserver) {
+        resizeObserver.disconnect();
+    }
+}
+
+// Aba visível de novo: religa tudo e confere os tamanhos
+function resumeUpdates() {
+    window.addEventListener('resize', scheduleUpdate);
+    window.addEventListener('orientationchange', scheduleUpdate);
+    if (resizeObserver) {
+        wallState.forEach(function(entry) {
+            resizeObserver.observe(entry.element);
+        });
+    }
+    scheduleUpdate();
+    queuePaused = false;
+    pumpQueue();
+}
+
+// Aba oculta há muito tempo: troca os relatórios carregados por uma página vazia
+function unloadTiles() {
+    wallState.forEach(function(entry) {
+        if (entry.status === 'loaded') {
+            entry.status = 'unloaded';
+            powerBIStats.unloads++;
+            entry.iframe.src = 'about:blank';
+        }
+    });
+}
+
+// Recarrega os painéis pela fila (mesmo limite de carregamentos simultâneos);
+// o conteúdo anterior continua visível até a vez de cada painel
+function requeueTiles(status) {
+    wallState.forEach(function(entry) {
+        if (entry.status === status) {
+            entry.status = 'pending';
+        }
+    });
+    pumpQueue();
+}
+
+// Pausa com a aba oculta, descarga por inatividade e recarga agendada (visibility.js)
+if (window.powerBIVisibility) {
+    window.powerBIVisibility(wallConfig, {
+        pause: pauseUpdates,
+        resume: resumeUpdates,
+        unload: unloadTiles,
+        restore: function() {
+            requeueTiles('unloaded');
+        },
+        refresh: function() {
+            powerBIStats.refreshes++;
+            requeueTiles('loaded');
+        }
+    });
+}
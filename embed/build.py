@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Build dos assets do painel (CSS/JS) para os modos "debug" e "production".
+
+- "debug": os arquivos de ``assets/`` são enviados como estão, com todos os logs.
+- "production": o script perde os logs de diagnóstico e ambos são minificados
+  (sem comentários, indentação e linhas em branco), diminuindo o payload e
+  evitando a formatação de strings de log a cada evento em aparelhos lentos.
+
+Regras para o script (``assets/embed.js``) continuar compatível com o build:
+
+- cada ``console.log(...)`` deve começar a linha e terminar com ``);`` no fim
+  de uma linha (a chamada pode ocupar várias), sem outra instrução junto, e não
+  pode ser o corpo de um ``if``/``else`` sem chaves;
+- trechos maiores só de diagnóstico ficam entre ``// #if DEBUG`` e ``// #endif``;
+- literais de expressão regular (``/.../``) são reconhecidos pelo caractere
+  anterior (após ``(``, ``,``, ``=``, operadores, ``return`` etc.); depois de um
+  valor, ``/`` é sempre divisão.
+"""
+
+import re
+from functools import lru_cache
+
+# Modos de build aceitos (veja settings.BUILD_MODES)
+BUILDS = ("debug", "production")
+
+_DEBUG_BLOCK_RE = re.compile(r"^[ \t]*// #if DEBUG[ \t]*\n.*?^[ \t]*// #endif[ \t]*\n", re.MULTILINE | re.DOTALL)
+_CONSOLE_LOG_RE = re.compile(r"^[ \t]*console\.log\(", re.MULTILINE)
+
+# Depois destes caracteres (ou palavras) uma "/" abre uma expressão regular, e não uma divisão
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+_REGEX_KEYWORDS = ("return", "typeof", "instanceof", "in", "of", "new", "delete", "void", "throw", "case", "do", "else", "yield", "await")
+
+
+def _skip_string(source, i):
+    # Índice logo após a string (ou template) que começa em source[i]
+    quote = source[i]
+    i += 1
+    while i < len(source) and source[i] != quote:
+        i += 2 if source[i] == "\\" else 1
+    return i + 1
+
+
+def _call_end(source, i):
+    # Índice logo após o ")" que fecha o "(" em source[i - 1]; None se não fechar
+    depth = 1
+    while i < len(source):
+        char = source[i]
+        if char in "'\"`":
+            i = _skip_string(source, i)
+            continue
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return None
+
+
+def strip_debug(js):
+    """
+    Remove os blocos ``#if DEBUG`` e as chamadas de ``console.log`` (de uma ou
+    várias linhas); uma chamada seguida de outra instrução na mesma linha fica.
+    """
+    js = _DEBUG_BLOCK_RE.sub("", js)
+    out = []
+    position = 0
+    for match in _CONSOLE_LOG_RE.finditer(js):
+        if match.start() < position:
+            continue
+        end = _call_end(js, match.end())
+        if end is None:
+            break
+        rest = re.match(r"[ \t]*;[ \t]*(?:\n|$)", js[end:])
+        if rest is None:
+            continue
+        out.append(js[position:match.start()])
+        position = end + rest.end()
+    out.append(js[position:])
+    return "".join(out)
+
+
+def _starts_regex(out):
+    # Uma "/" abre uma expressão regular se o que veio antes não é um valor
+    text = "".join(out[-20:]).rstrip()
+    if not text or text[-1] in _REGEX_PRECEDERS:
+        return True
+    word = re.search(r"[A-Za-z_$][\w$]*$", text)
+    return word is not None and word.group() in _REGEX_KEYWORDS
+
+
+def _regex_end(source, i):
+    # Índice logo após a "/" que fecha a expressão regular aberta em source[i]
+    in_class = False
+    i += 1
+    while i < len(source) and source[i] != "\n":
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            return i + 1
+        i += 1
+    return i
+
+
+def strip_comments(source, line_comments=True):
+    """
+    Remove comentários ``/* */`` (e ``//``, se ``line_comments``) fora de strings.
+
+    Com ``line_comments`` (JavaScript) também preserva literais de expressão
+    regular, que podem conter ``//`` ou ``/*``.
+    """
+    out = []
+    i = 0
+    length = len(source)
+    quote = None
+    while i < length:
+        char = source[i]
+        if quote:
+            out.append(char)
+            if char == "\\" and i + 1 < length:
+                out.append(source[i + 1])
+                i += 2
+                continue
+            if char == quote:
+                quote = None
+            i += 1
+        elif char in "'\"`":
+            quote = char
+            out.append(char)
+            i += 1
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            i = length if end == -1 else end + 2
+        elif line_comments and source.startswith("//", i):
+            end = source.find("\n", i)
+            i = length if end == -1 else end
+        elif line_comments and char == "/" and _starts_regex(out):
+            end = _regex_end(source, i)
+            out.append(source[i:end])
+            i = end
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def collapse_whitespace(source):
+    """
+    Remove indentação, espaços finais e linhas em branco (mantém as quebras de
+    linha, então a inserção automática de ponto e vírgula do JS não muda).
+    """
+    lines = (line.strip() for line in source.splitlines())
+    return "\n".join(line for line in lines if line) + "\n"
+
+
+def minify_js(js):
+    return collapse_whitespace(strip_comments(strip_debug(js)))
+
+
+def minify_css(css):
+    return collapse_whitespace(strip_comments(css, line_comments=False))
+
+
+def minify_html(markup):
+    """
+    Minifica o HTML gerado pelo app: remove comentários e indentação.
+    """
+    markup = re.sub(r"<!--.*?-->", "", markup, flags=re.DOTALL)
+    return collapse_whitespace(markup)
+
+
+@lru_cache(maxsize=None)
+def build_asset(name, source, build="debug"):
+    """
+    Retorna o conteúdo de ``name`` (.js/.css) para o modo de build (com cache).
+    """
+    if build not in BUILDS:
+        raise ValueError("Build inválido: {!r} (use um de {})".format(build, ", ".join(BUILDS)))
+    if build == "debug":
+        return source
+    if name.endswith(".js"):
+        return minify_js(source)
+    if name.endswith(".css"):
+        return minify_css(source)
+    return source
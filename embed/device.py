@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Detecção do tipo de dispositivo no servidor, a partir dos cabeçalhos HTTP.
+
+Permite enviar o iframe já com a largura certa (mobile 767px ou desktop 100%)
+no HTML inicial, em vez de o navegador renderizar o layout desktop e só depois
+o script trocar para mobile. O script do cliente continua cuidando de mudanças
+posteriores (zoom, rotação, redimensionamento).
+
+O resultado é um dos layouts de ``render.LAYOUTS``: "mobile", "desktop" ou
+"auto" (quando não dá para decidir, ex.: tablets e robôs).
+"""
+
+import math
+import re
+from functools import lru_cache
+
+# Quantidade de User-Agents distintos mantidos no cache de classificação
+UA_CACHE_SIZE = 2048
+
+# Mesmo breakpoint do script do cliente: <= 768px é mobile
+MOBILE_BREAKPOINT = 768
+
+# Tablets têm larguras dos dois lados do breakpoint: o cliente decide
+_TABLET_RE = re.compile(r"iPad|Tablet|Kindle|Silk|PlayBook|Android(?!.*Mobile)", re.IGNORECASE)
+_MOBILE_RE = re.compile(r"Mobi|iPhone|iPod|Windows Phone|BlackBerry|BB10|Opera Mini|IEMobile", re.IGNORECASE)
+_DESKTOP_RE = re.compile(r"Windows NT|Macintosh|X11|CrOS", re.IGNORECASE)
+
+
+@lru_cache(maxsize=UA_CACHE_SIZE)
+def classify_user_agent(user_agent):
+    """
+    Classifica um User-Agent em "mobile", "desktop" ou "auto" (com cache).
+    """
+    if not user_agent:
+        return "auto"
+    if _TABLET_RE.search(user_agent):
+        return "auto"
+    if _MOBILE_RE.search(user_agent):
+        return "mobile"
+    if _DESKTOP_RE.search(user_agent):
+        return "desktop"
+    return "auto"
+
+
+def _viewport_hint(headers):
+    """
+    Largura da viewport informada por Client Hints (se o navegador enviou).
+
+    Valores que não são um número finito e positivo (o cabeçalho vem do
+    cliente: "inf", "1e400", "-1") são ignorados.
+    """
+    value = headers.get("Sec-CH-Viewport-Width") or headers.get("Viewport-Width")
+    if not value:
+        return None
+    try:
+        width = float(value)
+    except ValueError:
+        return None
+    if not math.isfinite(width) or width <= 0:
+        return None
+    return int(width)
+
+
+def classify_headers(headers):
+    """
+    Escolhe o layout inicial a partir dos cabeçalhos da requisição.
+
+    Ordem de prioridade: largura da viewport (Client Hint), ``Sec-CH-UA-Mobile``
+    e, por último, o User-Agent.
+    """
+    width = _viewport_hint(headers)
+    if width:
+        return "mobile" if width <= MOBILE_BREAKPOINT else "desktop"
+
+    ch_mobile = headers.get("Sec-CH-UA-Mobile")
+    if ch_mobile == "?1":
+        return "mobile"
+
+    layout = classify_user_agent(headers.get("User-Agent", ""))
+    if ch_mobile == "?0" and layout == "mobile":
+        # Client Hint diz que não é celular (ex.: modo desktop do navegador)
+        return "auto"
+    return layout
+
+
+def cache_stats():
+    """
+    Retorna os contadores do cache de classificação por User-Agent.
+    """
+    info = classify_user_agent.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "maxsize": info.maxsize}
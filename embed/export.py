@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+Exportação estática: gera um site HTML com os relatórios do registro.
+
+Painéis somente leitura não precisam do runtime do Streamlit: cada visitante do
+``app.py`` mantém uma sessão Python e um websocket abertos, enquanto as páginas
+geradas aqui são arquivos comuns, servidos por qualquer servidor estático ou CDN.
+
+As páginas usam as mesmas fontes do ``app.py``: o registro de relatórios
+(``reports.toml``), o CSS e o script do painel (``embed/assets/``) e as
+configurações ``POWERBI_*``. O modelo da página é ``templates/index.html``.
+
+Uso::
+
+    python -m embed.export --out dist
+
+Estrutura gerada::
+
+    dist/
+    ├── index.html            # relatório padrão
+    ├── <id>/index.html       # um diretório por relatório
+    └── assets/               # embed.<hash>.css e embed.<hash>.js (cache longo)
+
+Sem o servidor não há detecção de dispositivo pelos cabeçalhos: o layout é
+sempre decidido pelo script no navegador ("auto").
+
+Com ``--pwa`` (ou ``POWERBI_PWA=1``) o site ganha ``manifest.webmanifest``,
+``icon.svg`` e um service worker (``sw.js``, a partir de ``assets/sw.js``) que
+guarda o shell em cache: na segunda visita a página abre do cache e só o iframe
+do Power BI vai à rede. O cache é versionado pelo hash do conteúdo exportado.
+"""
+
+import argparse
+import html
+import json
+import re
+import sys
+from dataclasses import replace
+from pathlib import Path
+
+from embed import filters, render, static_assets
+from embed.build import build_asset
+from embed.registry import RegistryError, load_registry
+from embed.settings import BUILD_MODES, get_settings
+
+# Raiz do repositório (onde ficam templates/ e reports.toml)
+ROOT = Path(__file__).resolve().parent.parent
+
+# Modelo HTML das páginas exportadas
+TEMPLATE_PATH = ROOT / "templates" / "index.html"
+
+# Pasta de saída padrão
+DEFAULT_OUTPUT_DIR = ROOT / "dist"
+
+# Subpasta dos assets versionados dentro do site
+ASSETS_DIRNAME = "assets"
+
+# Ids de relatório viram nomes de diretório: só letras, números, "-" e "_"
+_REPORT_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+# Marcadores {{ nome }} do modelo
+_PLACEHOLDER = re.compile(r"\{\{\s*(\w+)\s*\}\}")
+
+# Modo PWA: arquivos na raiz do site (o service worker só controla o próprio diretório e abaixo)
+MANIFEST_NAME = "manifest.webmanifest"
+ICON_NAME = "icon.svg"
+SERVICE_WORKER_NAME = "sw.js"
+
+# Cor da barra do navegador/tela de abertura (mesmo verde do indicador desktop)
+THEME_COLOR = "#4caf50"
+BACKGROUND_COLOR = "#f0f0f0"
+
+# Manifest, cor do tema e registro do service worker, inseridos no <head> das páginas
+_PWA_HEAD = """<link rel="manifest" href="{prefix}{manifest}">
+    <link rel="icon" href="{prefix}{icon}" type="image/svg+xml">
+    <meta name="theme-color" content="{theme_color}">
+    <script>
+        if ('serviceWorker' in navigator) {{
+            window.addEventListener('load', function() {{
+                navigator.serviceWorker.register('{prefix}{service_worker}');
+            }});
+        }}
+    </script>"""
+
+
+def fill_template(template, values):
+    """
+    Substitui os marcadores ``{{ nome }}`` do modelo pelos valores informados.
+    """
+    def substitute(match):
+        name = match.group(1)
+        if name not in values:
+            raise KeyError("Marcador sem valor no modelo: {}".format(name))
+        return str(values[name])
+    return _PLACEHOLDER.sub(substitute, template)
+
+
+def _nav(registry, current, prefix):
+    """
+    Links para os demais relatórios (vazio quando só há um).
+    """
+    if len(registry.reports) < 2:
+        return ""
+    links = []
+    for report in registry.reports:
+        if report.id == current:
+            continue
+        links.append('<a href="{}{}/">{}</a>'.format(prefix, report.id, html.escape(report.title)))
+    return '<nav class="report-nav">{}</nav>'.format(" · ".join(links))
+
+
+def _pwa_head(prefix):
+    return _PWA_HEAD.format(
+        prefix=prefix,
+        manifest=MANIFEST_NAME,
+        icon=ICON_NAME,
+        theme_color=THEME_COLOR,
+        service_worker=SERVICE_WORKER_NAME,
+    )
+
+
+def render_page(template, registry, report, settings, prefix, output_dir):
+    """
+    Monta o HTML de uma página; ``prefix`` é o caminho relativo até a raiz do site.
+    """
+    target = static_assets.Target(output_dir / ASSETS_DIRNAME, prefix + ASSETS_DIRNAME + "/")
+    # Só os filtros, a página e o indicador do registro (sem parâmetros da URL do site)
+    embed = render.embed_html(
+        filters.apply_to_url(report.url, report.deep_link),
+        height=report.height,
+        asset_mode="static",
+        reload_policy=settings.reload_policy,
+        cache_buster=settings.cache_buster,
+        loading=settings.loading,
+        mobile_url=filters.apply_to_url(report.mobile_url, report.deep_link),
+        desktop_url=filters.apply_to_url(report.desktop_url, report.deep_link),
+        aspect_ratio=report.aspect_ratio,
+        # Sem o sidecar, os beacons só podem ir para um coletor com URL pública
+        telemetry_url=settings.telemetry_url if settings.telemetry else None,
+        build=settings.build,
+        static_target=target,
+        idle_unload=settings.idle_unload,
+        refresh_interval=settings.refresh_interval,
+        refresh_jitter=settings.refresh_jitter,
+    )
+    return fill_template(template, {
+        "page_title": html.escape(report.title),
+        "title": html.escape(report.title),
+        "resource_hints": render.resource_hints(),
+        "pwa": _pwa_head(prefix) if settings.pwa else "",
+        "nav": _nav(registry, report.id, prefix),
+        "height": report.height,
+        "embed": embed,
+    })
+
+
+def _write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Grava em arquivo temporário e renomeia para nunca servir página incompleta
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(content, encoding="utf-8")
+    tmp.replace(path)
+
+
+def write_pwa(output_dir, registry, build="debug"):
+    """
+    Grava manifest, ícone e service worker; o precache cobre as páginas e os
+    assets já exportados em ``output_dir``.
+    """
+    default = registry.get()
+    manifest = {
+        "name": default.title,
+        "short_name": "Power BI",
+        "start_url": "./",
+        "scope": "./",
+        "display": "standalone",
+        "background_color": BACKGROUND_COLOR,
+        "theme_color": THEME_COLOR,
+        "icons": [{"src": ICON_NAME, "sizes": "any", "type": "image/svg+xml", "purpose": "any"}],
+    }
+    _write(output_dir / MANIFEST_NAME, json.dumps(manifest, ensure_ascii=False, indent=2) + "\n")
+    _write(output_dir / ICON_NAME, render.asset_source(ICON_NAME))
+
+    # Shell: páginas (pelas URLs de diretório), assets versionados, manifest e ícone
+    files = {"./": output_dir / "index.html"}
+    for report in registry.reports:
+        files[report.id + "/"] = output_dir / report.id / "index.html"
+    for path in sorted((output_dir / ASSETS_DIRNAME).iterdir()):
+        files[ASSETS_DIRNAME + "/" + path.name] = path
+    files[MANIFEST_NAME] = output_dir / MANIFEST_NAME
+    files[ICON_NAME] = output_dir / ICON_NAME
+
+    # A versão muda quando qualquer arquivo do shell muda, o que também muda os
+    # bytes do sw.js e faz o navegador instalar o novo service worker
+    version = static_assets.fingerprint("\n".join(
+        url + "\n" + path.read_text(encoding="utf-8") for url, path in files.items()
+    ))
+    config = json.dumps({"version": version, "precache": list(files)}, sort_keys=True)
+    script = build_asset(SERVICE_WORKER_NAME, render.asset_source(SERVICE_WORKER_NAME), build)
+    _write(output_dir / SERVICE_WORKER_NAME, "self.POWERBI_SW = {};\n{}".format(config, script))
+    return version
+
+
+def export_site(output_dir=DEFAULT_OUTPUT_DIR, settings=None, template_path=TEMPLATE_PATH):
+    """
+    Gera o site estático em ``output_dir`` e retorna a lista de páginas gravadas
+    (e o ``sw.js``, no modo PWA).
+    """
+    settings = settings or get_settings()
+    output_dir = Path(output_dir).resolve()
+    registry = load_registry(settings.registry_path)
+    template = Path(template_path).read_text(encoding="utf-8")
+
+    for report in registry.reports:
+        if not _REPORT_ID.match(report.id):
+            raise RegistryError("Id de relatório inválido para exportação: {!r} (use letras, números, - ou _)".format(report.id))
+
+    written = []
+    # Página inicial com o relatório padrão
+    default = registry.get()
+    path = output_dir / "index.html"
+    _write(path, render_page(template, registry, default, settings, "", output_dir))
+    written.append(path)
+    # Uma página por relatório em <id>/index.html
+    for report in registry.reports:
+        path = output_dir / report.id / "index.html"
+        _write(path, render_page(template, registry, report, settings, "../", output_dir))
+        written.append(path)
+    if settings.pwa:
+        write_pwa(output_dir, registry, settings.build)
+        written.append(output_dir / SERVICE_WORKER_NAME)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m embed.export", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--out", type=Path, default=DEFAULT_OUTPUT_DIR, help="pasta de saída (padrão: dist/)")
+    parser.add_argument("--build", choices=BUILD_MODES, help="modo de build (padrão: POWERBI_BUILD)")
+    parser.add_argument("--pwa", action="store_true", help="gera manifest e service worker (padrão: POWERBI_PWA)")
+    args = parser.parse_args(argv)
+
+    settings = get_settings()
+    if args.build:
+        settings = replace(settings, build=args.build)
+    if args.pwa:
+        settings = replace(settings, pwa=True)
+    try:
+        written = export_site(args.out, settings)
+    except RegistryError as exc:
+        print("Erro no registro: {}".format(exc), file=sys.stderr)
+        return 1
+    for path in written:
+        print(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
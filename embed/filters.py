@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+"""
+Filtros, página e indicador aplicados já na abertura do relatório (deep links).
+
+Sem isso o Power BI carrega a visão padrão e, quando o usuário clica nas
+segmentações, consulta tudo de novo com os filtros. Aqui os filtros vêm do
+registro (``filters``, ``page``, ``bookmark`` em ``reports.toml``) e da URL da
+aplicação (``?filter=...&page=...&bookmark=...``) e entram na configuração
+inicial, então a primeira consulta do relatório já é a filtrada:
+
+- no iframe (URL publicada), como parâmetros ``filter``, ``pageName`` e
+  ``bookmarkGuid`` da URL do Power BI;
+- no modo de token, como filtros da biblioteca powerbi-client (``filters``,
+  ``pageName`` e ``bookmark`` da configuração do ``powerbi.embed``).
+
+Os filtros usam a sintaxe de filtros de URL do Power BI::
+
+    Loja/Regiao eq 'Sul'
+    Loja/Regiao in ('Sul', 'Sudeste') and Vendas/Ano ge 2023
+
+Nomes de tabela e coluna com espaço usam o escape do Power BI (``_x0020_``).
+Cada texto é validado e convertido uma vez por processo (cache por texto).
+"""
+
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from urllib.parse import quote, urlencode, urlsplit, urlunsplit
+
+# Limites contra URLs abusivas
+MAX_FILTERS = 10
+MAX_VALUES = 100
+MAX_FILTER_LENGTH = 2000
+
+# Operadores aceitos e o equivalente nos filtros avançados da powerbi-client
+OPERATORS = {
+    "eq": "Is",
+    "ne": "IsNot",
+    "gt": "GreaterThan",
+    "ge": "GreaterThanOrEqual",
+    "lt": "LessThan",
+    "le": "LessThanOrEqual",
+}
+
+# Esquemas dos filtros da powerbi-client (models.FilterType: Advanced = 0, Basic = 1)
+BASIC_SCHEMA = "http://powerbi.com/product/schema#basic"
+ADVANCED_SCHEMA = "http://powerbi.com/product/schema#advanced"
+
+_NAME = r"[A-Za-z_][A-Za-z0-9_]*"
+_VALUE = r"'(?:[^']|'')*'|-?\d+(?:\.\d+)?|true|false"
+_CONDITION_RE = re.compile(
+    r"\s*(?P<table>{name})/(?P<column>{name})\s+(?:"
+    r"(?P<op>eq|ne|gt|ge|lt|le)\s+(?P<value>{value})"
+    r"|in\s*\((?P<values>\s*(?:{value})(?:\s*,\s*(?:{value}))*)\s*\))\s*".format(name=_NAME, value=_VALUE),
+    re.IGNORECASE,
+)
+_VALUE_RE = re.compile(_VALUE, re.IGNORECASE)
+_AND_RE = re.compile(r"and\s", re.IGNORECASE)
+
+# Nomes de página (ReportSection...) e de indicador (Bookmark...) do Power BI
+_PAGE_RE = re.compile(r"^[A-Za-z0-9_]{1,100}$")
+_BOOKMARK_RE = re.compile(r"^[A-Za-z0-9_-]{1,100}$")
+
+
+class FilterError(ValueError):
+    """
+    Filtro, página ou indicador inválido.
+    """
+
+
+@dataclass(frozen=True)
+class Filter:
+    """
+    Condição sobre uma coluna: ``operator`` é uma chave de ``OPERATORS`` ou "in".
+    """
+    table: str
+    column: str
+    operator: str
+    values: tuple
+
+
+@dataclass(frozen=True)
+class DeepLink:
+    """
+    Estado inicial do relatório: filtros, página (``pageName``) e indicador.
+    """
+    filters: tuple = ()
+    page: str = None
+    bookmark: str = None
+
+
+def _parse_value(text):
+    if text.startswith("'"):
+        return text[1:-1].replace("''", "'")
+    lowered = text.lower()
+    if lowered in ("true", "false"):
+        return lowered == "true"
+    return float(text) if "." in text else int(text)
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return "'{}'".format(value.replace("'", "''"))
+    return str(value)
+
+
+@lru_cache(maxsize=256)
+def parse_filter(text):
+    """
+    Converte um texto de filtro (condições unidas por ``and``) em uma tupla de ``Filter``.
+    """
+    if not isinstance(text, str) or not text.strip():
+        raise FilterError("Filtro vazio")
+    if len(text) > MAX_FILTER_LENGTH:
+        raise FilterError("Filtro com mais de {} caracteres".format(MAX_FILTER_LENGTH))
+    filters = []
+    position = 0
+    while True:
+        match = _CONDITION_RE.match(text, position)
+        if not match:
+            raise FilterError("Filtro inválido: {!r} (use, por exemplo, Tabela/Coluna eq 'valor')".format(text))
+        if match.group("op"):
+            operator = match.group("op").lower()
+            values = (_parse_value(match.group("value")),)
+        else:
+            operator = "in"
+            values = tuple(_parse_value(item) for item in _VALUE_RE.findall(match.group("values")))
+            if len(values) > MAX_VALUES:
+                raise FilterError("Filtro com mais de {} valores".format(MAX_VALUES))
+        filters.append(Filter(match.group("table"), match.group("column"), operator, values))
+        position = match.end()
+        if position == len(text):
+            break
+        separator = _AND_RE.match(text, position)
+        if not separator:
+            raise FilterError("Filtro inválido: {!r} (condições são unidas por 'and')".format(text))
+        position = separator.end()
+    if len(filters) > MAX_FILTERS:
+        raise FilterError("Mais de {} condições de filtro".format(MAX_FILTERS))
+    return tuple(filters)
+
+
+def check_page(page):
+    """
+    Valida o nome interno de uma página (ex.: ``ReportSection2``).
+    """
+    if page is None:
+        return None
+    if not isinstance(page, str) or not _PAGE_RE.match(page):
+        raise FilterError("Página inválida: {!r} (use o nome interno, ex.: ReportSection2)".format(page))
+    return page
+
+
+def check_bookmark(bookmark):
+    """
+    Valida o nome de um indicador (ex.: ``Bookmark1a2b3c``).
+    """
+    if bookmark is None:
+        return None
+    if not isinstance(bookmark, str) or not _BOOKMARK_RE.match(bookmark):
+        raise FilterError("Indicador inválido: {!r}".format(bookmark))
+    return bookmark
+
+
+@lru_cache(maxsize=256)
+def resolve(defaults, filter_texts=(), page=None, bookmark=None):
+    """
+    Combina o ``DeepLink`` do registro (``defaults``) com os parâmetros da URL.
+
+    Os filtros da URL valem depois dos do registro e substituem os que usam a
+    mesma coluna; ``page`` e ``bookmark`` da URL substituem os do registro.
+    """
+    by_target = {}
+    for item in defaults.filters:
+        by_target[(item.table, item.column)] = item
+    extra = {}
+    for text in filter_texts:
+        for item in parse_filter(text):
+            by_target.pop((item.table, item.column), None)
+            extra[(item.table, item.column)] = item
+    filters = tuple(by_target.values()) + tuple(extra.values())
+    if len(filters) > MAX_FILTERS:
+        raise FilterError("Mais de {} condições de filtro".format(MAX_FILTERS))
+    return DeepLink(
+        filters=filters,
+        page=check_page(page) or defaults.page,
+        bookmark=check_bookmark(bookmark) or defaults.bookmark,
+    )
+
+
+def url_filter(filters):
+    """
+    Texto do parâmetro ``filter`` da URL do Power BI para ``filters``.
+    """
+    conditions = []
+    for item in filters:
+        target = "{}/{}".format(item.table, item.column)
+        if item.operator == "in":
+            values = ", ".join(_format_value(value) for value in item.values)
+            conditions.append("{} in ({})".format(target, values))
+        else:
+            conditions.append("{} {} {}".format(target, item.operator, _format_value(item.values[0])))
+    return " and ".join(conditions)
+
+
+@lru_cache(maxsize=256)
+def apply_to_url(url, link):
+    """
+    Acrescenta filtros, página e indicador de ``link`` à URL do relatório.
+
+    Parâmetros ``filter``/``pageName``/``bookmarkGuid`` já presentes na URL são substituídos.
+    """
+    if url is None or link == DeepLink():
+        return url
+    params = {}
+    if link.filters:
+        params["filter"] = url_filter(link.filters)
+    if link.page:
+        params["pageName"] = link.page
+    if link.bookmark:
+        params["bookmarkGuid"] = link.bookmark
+    parts = urlsplit(url)
+    # Os demais parâmetros são mantidos como estão (ex.: o r= do publish-to-web)
+    query = [item for item in parts.query.split("&") if item and item.split("=", 1)[0] not in params]
+    query.append(urlencode(params, safe="/'(),", quote_via=quote))
+    return urlunsplit(parts._replace(query="&".join(query)))
+
+
+def client_filters(filters):
+    """
+    Filtros no formato da powerbi-client (``models.IBasicFilter``/``IAdvancedFilter``).
+    """
+    models = []
+    for item in filters:
+        target = {"table": item.table, "column": item.column}
+        if item.operator in ("in", "eq"):
+            models.append({
+                "$schema": BASIC_SCHEMA,
+                "target": target,
+                "operator": "In",
+                "values": list(item.values),
+                "filterType": 1,
+            })
+        else:
+            models.append({
+                "$schema": ADVANCED_SCHEMA,
+                "target": target,
+                "logicalOperator": "And",
+                "conditions": [{"operator": OPERATORS[item.operator], "value": item.values[0]}],
+                "filterType": 0,
+            })
+    return models
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+"""
+Inicia vários processos do Streamlit atrás de uma única porta.
+
+Um ``streamlit run app.py`` é um único processo Python: todas as sessões
+disputam o mesmo GIL e o uso de CPU para em um núcleo. Este launcher sobe N
+workers (``streamlit run app.py`` em portas internas) e um proxy reverso local,
+em ``asyncio``, na porta pública:
+
+- roteamento fixo por cliente (hash do IP, por rendezvous hashing): a página e
+  o websocket ``/_stcore/stream`` de um navegador vão sempre para o mesmo
+  worker, onde está a sessão dele; se um worker cai, só os clientes dele mudam.
+  Clientes atrás do mesmo NAT (uma rede corporativa, por exemplo) têm o mesmo
+  IP e caem todos no mesmo worker: a sessão continua correta, mas a carga não
+  se divide entre eles. Atrás de um balanceador ou proxy reverso todos os
+  clientes chegariam com o IP dele; nesse caso use ``--trust-forwarded`` para
+  rotear pelo último endereço de ``X-Forwarded-For`` (só quando a porta do
+  launcher não é acessível diretamente, já que o cabeçalho pode ser forjado);
+- ``/_launcher/health``: o proxy está no ar (sempre 200);
+- ``/_launcher/ready``: 200 se algum worker responde ao ``/_stcore/health`` do
+  Streamlit, 503 caso contrário, com o estado de cada worker em JSON;
+- workers que terminam são reiniciados, com espera crescente entre tentativas.
+
+O proxy só lê o cabeçalho da primeira requisição de cada conexão para escolher
+o worker (conexões que não o enviam em ``HEADER_TIMEOUT`` segundos são
+encerradas); depois os bytes são repassados sem alteração nos dois sentidos (o
+upgrade para websocket passa direto).
+
+Uso::
+
+    python -m embed.launcher --workers 4 --port 8501
+    python -m embed.launcher --trust-forwarded   # atrás de um proxy reverso
+
+O sidecar (telemetria, ``POWERBI_TELEMETRY``) abre a porta dele em um único
+worker (o primeiro que conseguir); os beacons e a página de administração
+refletem só esse processo. As métricas (``POWERBI_METRICS``) são por processo,
+então cada worker serve o próprio ``/metrics`` em ``--metrics-port`` + índice
+do worker (``POWERBI_METRICS_PORT``); o Prometheus coleta todos e soma.
+O launcher define ``POWERBI_SIDECAR_SECRET`` (se ainda não estiver definida)
+para todos os workers: o ticket de renovação de token emitido por um worker é
+validado pelo sidecar de outro.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import secrets
+import signal
+import sys
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Raiz do repositório (onde ficam app.py e .streamlit/config.toml)
+ROOT = Path(__file__).resolve().parent.parent
+APP_PATH = ROOT / "app.py"
+
+# Caminhos atendidos pelo próprio proxy
+HEALTH_PATH = "/_launcher/health"
+READY_PATH = "/_launcher/ready"
+
+# Endpoint de saúde do Streamlit em cada worker
+WORKER_HEALTH_PATH = "/_stcore/health"
+
+# Intervalo entre verificações de saúde dos workers (segundos)
+HEALTH_INTERVAL = 2.0
+
+# Espera antes de reiniciar um worker que terminou: dobra a cada falha seguida até o máximo
+RESTART_DELAY = 1.0
+MAX_RESTART_DELAY = 30.0
+
+# Um worker que ficou no ar por este tempo volta a reiniciar com a espera mínima
+STABLE_AFTER = 60.0
+
+# Tamanho máximo do cabeçalho HTTP lido para rotear (bytes) e tamanho dos blocos repassados
+MAX_HEADER_SIZE = 64 * 1024
+CHUNK_SIZE = 64 * 1024
+
+# Tempo máximo (segundos) para o cliente enviar o cabeçalho da primeira requisição
+HEADER_TIMEOUT = 10.0
+
+
+class Worker:
+    """
+    Um processo ``streamlit run`` em uma porta interna.
+    """
+
+    def __init__(self, index, port, host="127.0.0.1", metrics_port=None):
+        self.index = index
+        self.port = port
+        self.host = host
+        self.metrics_port = metrics_port
+        self.process = None
+        self.healthy = False
+        self.restarts = 0
+        self.started_at = None
+
+    def command(self):
+        return [
+            sys.executable, "-m", "streamlit", "run", str(APP_PATH),
+            "--server.port", str(self.port),
+            "--server.address", self.host,
+            "--server.headless", "true",
+        ]
+
+    def environment(self):
+        env = dict(os.environ)
+        if self.metrics_port:
+            env["POWERBI_METRICS_PORT"] = str(self.metrics_port)
+        return env
+
+    def status(self):
+        return {
+            "worker": self.index,
+            "port": self.port,
+            "pid": self.process.pid if self.process else None,
+            "healthy": self.healthy,
+            "restarts": self.restarts,
+            "metrics_port": self.metrics_port,
+        }
+
+
+def pick_worker(workers, client_key):
+    """
+    Escolhe o worker de um cliente entre os saudáveis (rendezvous hashing).
+
+    Cada cliente fica sempre com o mesmo worker enquanto ele estiver saudável;
+    quando um worker sai, só os clientes dele são redistribuídos.
+    """
+    candidates = [worker for worker in workers if worker.healthy]
+    if not candidates:
+        return None
+
+    def score(worker):
+        key = "{}|{}".format(client_key, worker.index).encode("utf-8")
+        return hashlib.blake2b(key, digest_size=8).digest()
+
+    return max(candidates, key=score)
+
+
+def client_key(head, peer, trust_forwarded=False):
+    """
+    Chave de roteamento de uma conexão: o IP do cliente.
+
+    Com ``trust_forwarded`` usa o último endereço de ``X-Forwarded-For`` (o que
+    o proxy da frente viu), se o cabeçalho existir.
+    """
+    if trust_forwarded:
+        forwarded = None
+        for line in head.split(b"\r\n")[1:]:
+            name, sep, value = line.partition(b":")
+            if sep and name.strip().lower() == b"x-forwarded-for":
+                forwarded = value
+        if forwarded is not None:
+            address = forwarded.decode("latin-1").split(",")[-1].strip()
+            if address:
+                return address
+    return peer[0] if peer else ""
+
+
+async def check_worker(worker, timeout=2.0):
+    """
+    Retorna ``True`` se o worker responde 200 em ``/_stcore/health``.
+    """
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(worker.host, worker.port), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return False
+    try:
+        writer.write("GET {} HTTP/1.0\r\nHost: {}\r\n\r\n".format(WORKER_HEALTH_PATH, worker.host).encode("ascii"))
+        await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        return status_line.split(b" ")[1:2] == [b"200"]
+    except (OSError, asyncio.TimeoutError, IndexError):
+        return False
+    finally:
+        writer.close()
+
+
+class Launcher:
+    """
+    Supervisor dos workers e proxy reverso na porta pública.
+    """
+
+    def __init__(self, workers, host="0.0.0.0", port=8501, trust_forwarded=False):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.trust_forwarded = trust_forwarded
+        self._stopping = asyncio.Event()
+
+    # --- Workers ---
+
+    async def supervise(self, worker):
+        """
+        Mantém o worker rodando, reiniciando-o quando o processo termina.
+        """
+        delay = RESTART_DELAY
+        while not self._stopping.is_set():
+            worker.process = await asyncio.create_subprocess_exec(*worker.command(), cwd=str(ROOT), env=worker.environment())
+            worker.started_at = time.monotonic()
+            logger.info("Worker %s iniciado na porta %s (pid %s)", worker.index, worker.port, worker.process.pid)
+            code = await worker.process.wait()
+            worker.healthy = False
+            if self._stopping.is_set():
+                return
+            if time.monotonic() - worker.started_at >= STABLE_AFTER:
+                delay = RESTART_DELAY
+            logger.warning("Worker %s terminou com código %s; reiniciando em %.0fs", worker.index, code, delay)
+            worker.restarts += 1
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, MAX_RESTART_DELAY)
+
+    async def monitor(self):
+        """
+        Atualiza periodicamente o estado de saúde dos workers.
+        """
+        while not self._stopping.is_set():
+            results = await asyncio.gather(*(check_worker(worker) for worker in self.workers))
+            for worker, healthy in zip(self.workers, results):
+                if healthy != worker.healthy:
+                    logger.info("Worker %s %s", worker.index, "pronto" if healthy else "indisponível")
+                worker.healthy = healthy
+            try:
+                await asyncio.wait_for(self._stopping.wait(), HEALTH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    # --- Proxy ---
+
+    async def _respond(self, writer, status, reason, data):
+        body = json.dumps(data).encode("utf-8")
+        head = (
+            "HTTP/1.1 {} {}\r\n"
+            "Content-Type: application/json\r\n"
+            "Content-Length: {}\r\n"
+            "Cache-Control: no-store\r\n"
+            "Connection: close\r\n\r\n"
+        ).format(status, reason, len(body))
+        writer.write(head.encode("ascii") + body)
+        await writer.drain()
+
+    async def handle_client(self, reader, writer):
+        upstream_writer = None
+        try:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), HEADER_TIMEOUT)
+            except asyncio.TimeoutError:
+                await self._respond(writer, 408, "Request Timeout", {"error": "header timeout"})
+                return
+            except asyncio.LimitOverrunError:
+                await self._respond(writer, 431, "Request Header Fields Too Large", {"error": "header too large"})
+                return
+            except asyncio.IncompleteReadError:
+                return
+
+            request_line = head.split(b"\r\n", 1)[0].decode("latin-1")
+            parts = request_line.split(" ")
+            path = parts[1].split("?", 1)[0] if len(parts) > 1 else ""
+
+            if path == HEALTH_PATH:
+                await self._respond(writer, 200, "OK", {"status": "ok"})
+                return
+            statuses = [worker.status() for worker in self.workers]
+            if path == READY_PATH:
+                ready = any(worker.healthy for worker in self.workers)
+                await self._respond(writer, 200 if ready else 503, "OK" if ready else "Service Unavailable",
+                                    {"ready": ready, "workers": statuses})
+                return
+
+            key = client_key(head, writer.get_extra_info("peername"), self.trust_forwarded)
+            worker = pick_worker(self.workers, key)
+            if worker is None:
+                await self._respond(writer, 503, "Service Unavailable", {"ready": False, "workers": statuses})
+                return
+
+            try:
+                upstream_reader, upstream_writer = await asyncio.open_connection(worker.host, worker.port)
+            except OSError:
+                worker.healthy = False
+                await self._respond(writer, 502, "Bad Gateway", {"error": "worker unavailable"})
+                return
+            upstream_writer.write(head)
+            await asyncio.gather(
+                _pipe(reader, upstream_writer),
+                _pipe(upstream_reader, writer),
+            )
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            if upstream_writer is not None:
+                upstream_writer.close()
+            writer.close()
+
+    # --- Ciclo de vida ---
+
+    def stop(self):
+        self._stopping.set()
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, self.stop)
+            except (NotImplementedError, RuntimeError):
+                # Windows: sem handlers de sinal no loop; Ctrl+C interrompe o processo
+                pass
+
+        tasks = [asyncio.ensure_future(self.supervise(worker)) for worker in self.workers]
+        tasks.append(asyncio.ensure_future(self.monitor()))
+        server = await asyncio.start_server(self.handle_client, self.host, self.port, limit=MAX_HEADER_SIZE)
+        logger.info("Proxy ouvindo em %s:%s com %s workers", self.host, self.port, len(self.workers))
+        try:
+            await self._stopping.wait()
+        finally:
+            server.close()
+            await server.wait_closed()
+            for worker in self.workers:
+                if worker.process and worker.process.returncode is None:
+                    worker.process.terminate()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for worker in self.workers:
+                if worker.process and worker.process.returncode is None:
+                    await worker.process.wait()
+
+
+async def _pipe(reader, writer):
+    """
+    Copia bytes de ``reader`` para ``writer`` até o fim da conexão.
+    """
+    try:
+        while True:
+            data = await reader.read(CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+            await writer.drain()
+    except (ConnectionError, OSError):
+        pass
+    finally:
+        # Propaga o fim da conexão (half-close) para o outro lado
+        try:
+            if writer.can_write_eof():
+                writer.write_eof()
+        except (ConnectionError, OSError):
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m embed.launcher", description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="quantidade de processos do Streamlit (padrão: núcleos da CPU)")
+    parser.add_argument("--host", default="0.0.0.0", help="interface do proxy (padrão: 0.0.0.0)")
+    parser.add_argument("--port", type=int, default=8501, help="porta pública do proxy (padrão: 8501)")
+    parser.add_argument("--worker-port", type=int, default=8600,
+                        help="porta do primeiro worker; os demais usam as seguintes (padrão: 8600)")
+    parser.add_argument("--metrics-port", type=int, default=8700,
+                        help="porta do /metrics do primeiro worker, com POWERBI_METRICS=1; "
+                             "os demais usam as seguintes (padrão: 8700)")
+    parser.add_argument("--trust-forwarded", action="store_true",
+                        help="roteia pelo X-Forwarded-For (só atrás de um proxy reverso confiável)")
+    args = parser.parse_args(argv)
+    if args.workers < 1:
+        parser.error("--workers deve ser pelo menos 1")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    # Chave comum dos tickets de renovação de token (veja embed/tokens.py)
+    os.environ.setdefault("POWERBI_SIDECAR_SECRET", secrets.token_urlsafe(32))
+    workers = [Worker(index, args.worker_port + index, metrics_port=args.metrics_port + index)
+               for index in range(args.workers)]
+    asyncio.run(Launcher(workers, args.host, args.port, args.trust_forwarded).run())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
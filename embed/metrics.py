@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentação do servidor: tempos de cada rerun, sessões e reenvios do HTML.
+
+O Streamlit reexecuta o ``app.py`` a cada interação; este módulo mede quanto
+tempo cada etapa do ``main()`` leva (histogramas por etapa), conta sessões
+novas e ativas e quantas vezes o HTML do componente é reenviado ao navegador
+(e quantos bytes), e expõe tudo em ``GET /metrics`` no sidecar HTTP, no formato
+de texto do Prometheus.
+
+Desativado (padrão, ``POWERBI_METRICS=0``), ``stage()`` e ``rerun()`` retornam
+um mesmo objeto que não faz nada e as demais funções retornam logo na primeira
+linha: o custo por rerun é uma verificação de ``None``.
+
+Uso no ``app.py``::
+
+    with metrics.rerun(st.session_state):
+        with metrics.stage("registry"):
+            ...
+"""
+
+import bisect
+import threading
+import time
+import uuid
+from contextlib import nullcontext
+
+from embed import render, sidecar
+
+# Limites (segundos) dos buckets dos histogramas de tempo
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Sessão sem rerun há mais que isto deixa de contar como ativa (segundos)
+ACTIVE_WINDOW = 300
+
+# Chaves usadas no st.session_state
+_SESSION_KEY = "_powerbi_metrics_session"
+_LAST_HTML_KEY = "_powerbi_metrics_last_html"
+
+# Contexto vazio devolvido quando as métricas estão desativadas
+_NOOP = nullcontext()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Histogram:
+    """
+    Histograma cumulativo com buckets fixos (formato do Prometheus).
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsStore:
+    """
+    Contadores e histogramas do processo, compartilhados por todas as sessões.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {(nome, (("rótulo", "valor"), ...)): valor ou Histogram}
+        self._counters = {}
+        self._histograms = {}
+        # {id da sessão: instante do último rerun}
+        self._sessions = {}
+        # {nome: função}, veja add_collector
+        self._collectors = {}
+        self.help = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def touch_session(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._sessions[session_id] = now
+
+    def active_sessions(self):
+        limit = time.monotonic() - ACTIVE_WINDOW
+        with self._lock:
+            for session_id in [key for key, seen in self._sessions.items() if seen < limit]:
+                del self._sessions[session_id]
+            return len(self._sessions)
+
+    def add_collector(self, name, collector):
+        """
+        Registra (ou substitui) uma função chamada a cada leitura de ``/metrics``,
+        que retorna ``(métrica, tipo, ajuda, [(rótulos, valor), ...])`` para
+        valores mantidos em outros módulos (por exemplo, os caches).
+        """
+        self._collectors[name] = collector
+
+    def exposition(self):
+        """
+        Todas as métricas no formato de texto do Prometheus.
+        """
+        lines = []
+        families = {}
+        with self._lock:
+            for (name, labels), value in sorted(self._counters.items()):
+                families.setdefault(name, ("counter", []))[1].append((dict(labels), value))
+            histograms = sorted((key, list(histogram.cumulative()), histogram.sum, histogram.count)
+                                for key, histogram in self._histograms.items())
+        families["powerbi_sessions_active"] = ("gauge", [({}, self.active_sessions())])
+        for collector in list(self._collectors.values()):
+            for name, kind, help_text, samples in collector():
+                self.help.setdefault(name, help_text)
+                families[name] = (kind, samples)
+
+        for name, (kind, samples) in sorted(families.items()):
+            _header(lines, name, kind, self.help.get(name))
+            for labels, value in samples:
+                lines.append("{}{} {}".format(name, _labels(labels), _number(value)))
+
+        current = None
+        for (name, labels), buckets, total, count in histograms:
+            if name != current:
+                _header(lines, name, "histogram", self.help.get(name))
+                current = name
+            labels = dict(labels)
+            for bound, cumulative in buckets:
+                le = "+Inf" if bound == float("inf") else _number(bound)
+                lines.append("{}_bucket{} {}".format(name, _labels(dict(labels, le=le)), cumulative))
+            lines.append("{}_sum{} {}".format(name, _labels(labels), _number(total)))
+            lines.append("{}_count{} {}".format(name, _labels(labels), count))
+        return "\n".join(lines) + "\n"
+
+
+def _header(lines, name, kind, help_text):
+    if help_text:
+        lines.append("# HELP {} {}".format(name, help_text))
+    lines.append("# TYPE {} {}".format(name, kind))
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in sorted(labels.items()):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append('{}="{}"'.format(key, escaped))
+    return "{" + ",".join(pairs) + "}"
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class _StageTimer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        # Também mede etapas interrompidas por st.stop()/st.rerun() (exceções do Streamlit)
+        STORE.observe("powerbi_stage_seconds", time.perf_counter() - self.start, stage=self.name)
+        return False
+
+
+class _RerunTimer(_StageTimer):
+    __slots__ = ("session_state",)
+
+    def __init__(self, session_state):
+        _StageTimer.__init__(self, "rerun")
+        self.session_state = session_state
+
+    def __enter__(self):
+        session_id = self.session_state.get(_SESSION_KEY)
+        if session_id is None:
+            session_id = self.session_state[_SESSION_KEY] = uuid.uuid4().hex
+            STORE.inc("powerbi_sessions_total")
+        STORE.touch_session(session_id)
+        STORE.inc("powerbi_reruns_total")
+        return _StageTimer.__enter__(self)
+
+    def __exit__(self, *exc_info):
+        STORE.observe("powerbi_rerun_seconds", time.perf_counter() - self.start)
+        return False
+
+
+# Armazenamento do processo; None enquanto as métricas estão desativadas
+STORE = None
+_lock = threading.Lock()
+
+
+def _render_cache_collector():
+    hits, misses, sizes = [], [], []
+    for name, info in render.render_stats().items():
+        labels = {"cache": name}
+        hits.append((labels, info["hits"]))
+        misses.append((labels, info["misses"]))
+        sizes.append((labels, info["size"]))
+    return (
+        ("powerbi_render_cache_hits_total", "counter", "Acertos do cache de renderização", hits),
+        ("powerbi_render_cache_misses_total", "counter", "Falhas do cache de renderização", misses),
+        ("powerbi_render_cache_entries", "gauge", "Entradas no cache de renderização", sizes),
+    )
+
+
+def enable():
+    """
+    Ativa as métricas no processo (idempotente) e retorna o armazenamento.
+    """
+    global STORE
+    if STORE is None:
+        with _lock:
+            if STORE is None:
+                store = MetricsStore()
+                store.help.update({
+                    "powerbi_reruns_total": "Reruns do app.py",
+                    "powerbi_sessions_total": "Sessões novas (primeiro rerun de cada sessão)",
+                    "powerbi_sessions_active": "Sessões com rerun nos últimos {} s".format(ACTIVE_WINDOW),
+                    "powerbi_rerun_seconds": "Duração de um rerun completo do main()",
+                    "powerbi_stage_seconds": "Duração de cada etapa do main()",
+                    "powerbi_component_sends_total": "HTML do componente enviado ao navegador (repeat: igual ao rerun anterior da sessão)",
+                    "powerbi_component_bytes_total": "Bytes de HTML do componente enviados ao navegador",
+                })
+                store.add_collector("render", _render_cache_collector)
+                STORE = store
+    return STORE
+
+
+def rerun(session_state):
+    """
+    Contexto que mede um rerun inteiro e registra a sessão.
+    """
+    if STORE is None:
+        return _NOOP
+    return _RerunTimer(session_state)
+
+
+def stage(name):
+    """
+    Contexto que mede uma etapa do rerun (``powerbi_stage_seconds{stage=name}``).
+    """
+    if STORE is None:
+        return _NOOP
+    return _StageTimer(name)
+
+
+def component_sent(kind, markup, session_state):
+    """
+    Conta um envio do HTML do componente (``kind``: embed, token ou wall).
+
+    O Streamlit reenvia o HTML a cada rerun; ``repeat="true"`` indica que era
+    o mesmo HTML do rerun anterior da sessão.
+    """
+    if STORE is None:
+        return
+    digest = hash(markup)
+    repeat = session_state.get(_LAST_HTML_KEY) == digest
+    session_state[_LAST_HTML_KEY] = digest
+    STORE.inc("powerbi_component_sends_total", kind=kind, repeat="true" if repeat else "false")
+    STORE.inc("powerbi_component_bytes_total", len(markup.encode("utf-8")), kind=kind)
+
+
+def add_collector(name, collector):
+    """
+    Registra um coletor extra (veja ``MetricsStore.add_collector``), se ativo.
+    """
+    if STORE is not None:
+        STORE.add_collector(name, collector)
+
+
+def handle_metrics(request):
+    """
+    Endpoint ``GET /metrics`` do sidecar.
+    """
+    return 200, CONTENT_TYPE, STORE.exposition().encode("utf-8")
+
+
+def start_endpoint(host, port):
+    """
+    Ativa as métricas, registra ``GET /metrics`` e garante o sidecar rodando.
+    """
+    enable()
+    sidecar.route("GET", "/metrics", handle_metrics)
+    return sidecar.start(host, port)
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de relatórios Power BI servidos pela aplicação.
+
+Os relatórios ficam em um arquivo TOML (por padrão ``reports.toml``, ao lado do
+``app.py``) e são escolhidos pela URL com ``?report=<id>``. Assim um único
+processo Streamlit serve todos os relatórios, em vez de uma cópia do ``app.py``
+por relatório.
+
+Tabelas ``[walls.<id>]`` agrupam vários relatórios em uma grade (modo mural,
+``?wall=<id>``), para telas de operação que mostram vários painéis ao mesmo tempo.
+
+O arquivo é lido uma vez e mantido em memória; a cada acesso só é feito um
+``stat`` e ele é relido apenas quando a data de modificação muda.
+"""
+
+import math
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from embed.filters import DeepLink, FilterError, check_bookmark, check_page, parse_filter
+
+try:
+    import tomllib
+except ImportError:  # Python < 3.11
+    import tomli as tomllib
+
+# Arquivo de registro padrão (mesmo diretório do app.py)
+DEFAULT_REGISTRY_PATH = Path(__file__).resolve().parent.parent / "reports.toml"
+
+# Altura padrão (em px) do componente que contém o iframe
+DEFAULT_HEIGHT = 650
+
+# Padrões do modo mural: colunas da grade e altura (em px) de cada painel
+DEFAULT_WALL_COLUMNS = 2
+DEFAULT_TILE_HEIGHT = 420
+
+
+class RegistryError(ValueError):
+    """
+    Arquivo de registro ausente, inválido ou relatório inexistente.
+    """
+
+
+@dataclass(frozen=True)
+class Report:
+    """
+    Um relatório do registro.
+
+    ``url`` é a URL de incorporação usada no carregamento inicial;
+    ``mobile_url``/``desktop_url`` são variantes opcionais trocadas pelo script
+    ao cruzar o breakpoint. ``aspect_ratio`` (largura / altura) mantém a
+    proporção do iframe; ``None`` ocupa toda a altura do componente.
+
+    ``workspace_id``/``report_id`` identificam o relatório no serviço do Power BI
+    e são usados no modo de token de incorporação (veja ``embed/tokens.py``);
+    com ``roles`` o token leva a identidade do usuário (segurança em nível de linha).
+
+    ``deep_link`` guarda os filtros, a página e o indicador aplicados já na
+    abertura (veja ``embed/filters.py``).
+    """
+    id: str
+    title: str
+    url: str
+    mobile_url: str = None
+    desktop_url: str = None
+    aspect_ratio: float = None
+    height: int = DEFAULT_HEIGHT
+    workspace_id: str = None
+    report_id: str = None
+    roles: tuple = ()
+    deep_link: DeepLink = DeepLink()
+
+
+@dataclass(frozen=True)
+class Wall:
+    """
+    Mural: vários relatórios do registro exibidos em uma grade.
+
+    ``reports`` guarda os ``Report`` na ordem de exibição (e de carregamento).
+    """
+    id: str
+    title: str
+    reports: tuple
+    columns: int = DEFAULT_WALL_COLUMNS
+    tile_height: int = DEFAULT_TILE_HEIGHT
+
+
+@dataclass(frozen=True)
+class Registry:
+    """
+    Conjunto de relatórios (e murais) lido do arquivo TOML.
+    """
+    default: str
+    reports: tuple
+    walls: tuple = ()
+
+    def ids(self):
+        return tuple(report.id for report in self.reports)
+
+    def get_wall(self, wall_id):
+        """
+        Retorna o mural ``wall_id``.
+        """
+        for wall in self.walls:
+            if wall.id == wall_id:
+                return wall
+        available = ", ".join(wall.id for wall in self.walls) or "nenhum"
+        raise RegistryError("Mural desconhecido: {!r} (disponíveis: {})".format(wall_id, available))
+
+    def get(self, report_id=None):
+        """
+        Retorna o relatório ``report_id`` (ou o padrão, se ``None``).
+        """
+        report_id = report_id or self.default
+        for report in self.reports:
+            if report.id == report_id:
+                return report
+        raise RegistryError("Relatório desconhecido: {!r} (disponíveis: {})".format(report_id, ", ".join(self.ids())))
+
+
+def parse_aspect_ratio(value):
+    """
+    Converte "16:9", "4/3" ou um número em largura / altura.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        ratio = float(value)
+    else:
+        text = str(value).replace("/", ":")
+        width, sep, height = text.partition(":")
+        try:
+            ratio = float(width) / float(height) if sep else float(width)
+        except (ValueError, ZeroDivisionError):
+            raise RegistryError("aspect_ratio inválido: {!r} (use por exemplo \"16:9\")".format(value))
+    # nan/inf (válidos em TOML) iriam parar na variável CSS --pbi-aspect
+    if not math.isfinite(ratio) or ratio <= 0:
+        raise RegistryError("aspect_ratio deve ser um número positivo: {!r}".format(value))
+    return round(ratio, 4)
+
+
+def _check_url(report_id, key, value):
+    if value is None:
+        return None
+    if not isinstance(value, str) or not value.startswith("https://"):
+        raise RegistryError("reports.{}.{} deve ser uma URL https://".format(report_id, key))
+    return value
+
+
+def _parse_deep_link(report_id, data):
+    filters = data.get("filters", [])
+    if isinstance(filters, str):
+        filters = [filters]
+    if not isinstance(filters, list) or not all(isinstance(text, str) for text in filters):
+        raise RegistryError("reports.{}.filters deve ser um texto ou uma lista de textos".format(report_id))
+    try:
+        parsed = tuple(item for text in filters for item in parse_filter(text))
+        return DeepLink(parsed, check_page(data.get("page")), check_bookmark(data.get("bookmark")))
+    except FilterError as exc:
+        raise RegistryError("reports.{}: {}".format(report_id, exc))
+
+
+def _parse_report(report_id, data):
+    if not isinstance(data, dict):
+        raise RegistryError("reports.{} deve ser uma tabela TOML".format(report_id))
+    mobile_url = _check_url(report_id, "mobile_url", data.get("mobile_url"))
+    desktop_url = _check_url(report_id, "desktop_url", data.get("desktop_url"))
+    url = _check_url(report_id, "url", data.get("url")) or desktop_url or mobile_url
+    if not url:
+        raise RegistryError("reports.{} precisa de url (ou mobile_url/desktop_url)".format(report_id))
+    height = _positive_int("reports.{}.height".format(report_id), data.get("height", DEFAULT_HEIGHT))
+    for key in ("workspace_id", "report_id"):
+        if key in data and not isinstance(data[key], str):
+            raise RegistryError("reports.{}.{} deve ser um texto (GUID do Power BI)".format(report_id, key))
+    roles = data.get("roles", [])
+    if not isinstance(roles, list) or not all(isinstance(role, str) for role in roles):
+        raise RegistryError("reports.{}.roles deve ser uma lista de nomes de função".format(report_id))
+    return Report(
+        id=report_id,
+        title=str(data.get("title", report_id)),
+        url=url,
+        mobile_url=mobile_url,
+        desktop_url=desktop_url,
+        aspect_ratio=parse_aspect_ratio(data.get("aspect_ratio")),
+        height=height,
+        workspace_id=data.get("workspace_id"),
+        report_id=data.get("report_id"),
+        roles=tuple(roles),
+        deep_link=_parse_deep_link(report_id, data),
+    )
+
+
+def _positive_int(key, value):
+    if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+        raise RegistryError("{} deve ser um inteiro positivo".format(key))
+    return value
+
+
+def _parse_wall(wall_id, data, registry):
+    if not isinstance(data, dict):
+        raise RegistryError("walls.{} deve ser uma tabela TOML".format(wall_id))
+    report_ids = data.get("reports")
+    if not isinstance(report_ids, list) or not report_ids:
+        raise RegistryError("walls.{}.reports deve ser uma lista de ids de relatório".format(wall_id))
+    return Wall(
+        id=wall_id,
+        title=str(data.get("title", wall_id)),
+        reports=tuple(registry.get(str(report_id)) for report_id in report_ids),
+        columns=_positive_int("walls.{}.columns".format(wall_id), data.get("columns", DEFAULT_WALL_COLUMNS)),
+        tile_height=_positive_int("walls.{}.tile_height".format(wall_id), data.get("tile_height", DEFAULT_TILE_HEIGHT)),
+    )
+
+
+def parse_registry(data):
+    """
+    Valida o conteúdo (já decodificado) do TOML e monta o ``Registry``.
+    """
+    tables = data.get("reports")
+    if not isinstance(tables, dict) or not tables:
+        raise RegistryError("O registro precisa de ao menos uma tabela [reports.<id>]")
+    reports = tuple(_parse_report(report_id, table) for report_id, table in tables.items())
+    default = data.get("default", reports[0].id)
+    registry = Registry(default=default, reports=reports)
+    registry.get(default)  # valida o relatório padrão
+
+    tables = data.get("walls", {})
+    if not isinstance(tables, dict):
+        raise RegistryError("walls deve conter tabelas [walls.<id>]")
+    if tables:
+        walls = tuple(_parse_wall(wall_id, table, registry) for wall_id, table in tables.items())
+        registry = Registry(default=default, reports=reports, walls=walls)
+    return registry
+
+
+# Cache do registro por caminho: {caminho: (mtime_ns, Registry)}
+_cache = {}
+_lock = threading.Lock()
+
+
+def load_registry(path=DEFAULT_REGISTRY_PATH):
+    """
+    Retorna o registro do arquivo ``path``, relendo-o só quando o mtime muda.
+    """
+    path = os.fspath(path)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError as exc:
+        raise RegistryError("Não foi possível ler o registro {}: {}".format(path, exc))
+
+    cached = _cache.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, "rb") as fp:
+                data = tomllib.load(fp)
+        except (OSError, tomllib.TOMLDecodeError) as exc:
+            raise RegistryError("Registro inválido {}: {}".format(path, exc))
+        registry = parse_registry(data)
+        _cache[path] = (mtime, registry)
+        return registry
@@ -0,0 +1,446 @@
+# -*- coding: utf-8 -*-
+"""
+Geração (com cache) do HTML/CSS de incorporação do Power BI.
+
+O Streamlit reexecuta o script ``app.py`` inteiro a cada interação, então tudo
+que é definido nele é recriado a cada rerun. Este módulo é importado uma única
+vez por processo: o CSS da página e o HTML do iframe + script são montados uma
+vez por combinação de parâmetros e os mesmos bytes são reaproveitados por todas
+as sessões.
+
+O CSS (``assets/page.css``) e o script (``assets/embed.js``) podem ser entregues
+de duas formas (veja ``settings.ASSET_MODES``):
+
+- "inline": embutidos no HTML enviado a cada sessão;
+- "static": publicados em ``static/`` com hash no nome e referenciados por URL,
+  para que o navegador os mantenha em cache entre visitas.
+"""
+
+import html
+import json
+from functools import lru_cache
+from pathlib import Path
+
+from embed import filters, static_assets, tokens
+from embed.build import build_asset, minify_html
+
+# Pasta com os fontes do CSS e do script do painel
+ASSETS_DIR = Path(__file__).resolve().parent / "assets"
+
+# Textos de ajuda em markdown (carregados sob demanda, veja help_markdown)
+HELP_DIR = Path(__file__).resolve().parent / "help"
+
+# Layouts iniciais aceitos por ``embed_html``:
+# - "auto": o script do cliente decide (comportamento original)
+# - "mobile": o iframe já nasce com 767px (Power BI renderiza o layout mobile)
+# - "desktop": o iframe já nasce com 100% da largura
+LAYOUTS = ("auto", "mobile", "desktop")
+
+# Classe inicial do .powerbi-container para cada layout (veja assets/embed.css)
+_LAYOUT_CLASSES = {
+    "auto": "",
+    "mobile": " pbi-mobile",
+    "desktop": " pbi-desktop",
+}
+
+# Quantidade máxima de variações de parâmetros mantidas em memória
+EMBED_CACHE_SIZE = 64
+
+# Origens contatadas pelo Power BI ao abrir um relatório; a página pede ao
+# navegador para resolver DNS e abrir conexão antes de o iframe começar a carregar
+PRECONNECT_ORIGINS = (
+    "https://app.powerbi.com",
+    "https://content.powerbi.com",
+    "https://login.microsoftonline.com",
+)
+
+# Atributos do iframe para cada estratégia de carregamento (veja settings.LOADING_STRATEGIES).
+# Nas estratégias adiadas o src fica em data-src e o script o atribui depois.
+_SRC_ATTRIBUTES = {
+    "eager": 'src="{url}"',
+    "lazy": 'src="{url}" loading="lazy"',
+    "visible": 'data-src="{url}"',
+    "interaction": 'data-src="{url}"',
+}
+
+# Placeholder exibido enquanto o iframe não carregou (estratégias adiadas)
+_PLACEHOLDERS = {
+    "visible": '<div class="powerbi-placeholder">Carregando relatório...</div>',
+    "interaction": '<div class="powerbi-placeholder powerbi-placeholder-click">Clique para carregar o relatório</div>',
+}
+
+# HTML com container, wrapper e iframe - usando iframe simples que funciona melhor com autoAuth.
+# O CSS do componente e o script de redimensionamento entram inline ou como arquivos estáticos.
+_EMBED_TEMPLATE = """
+    {styles}
+    <div class="powerbi-container{layout_class}"{container_style}>
+        <div class="powerbi-embed-wrapper">
+            {placeholder}
+            <iframe 
+                id="powerbi-iframe" 
+                title="Power BI Report"
+                width="100%" 
+                height="{height}" 
+                {src_attribute}
+                frameborder="0" 
+                allowFullScreen="true"
+                allow="fullscreen; clipboard-read; clipboard-write; autoplay; camera; microphone; payment"
+                {debug_attributes}
+            ></iframe>
+        </div>
+    </div>
+    {scripts}
+    """
+
+
+# Modo mural: grade com um painel por relatório e um único script para todos
+_WALL_TEMPLATE = """
+    {styles}
+    <div class="powerbi-wall" style="--wall-columns: {columns}; --wall-tile-height: {tile_height}px">
+        {tiles}
+    </div>
+    {scripts}
+    """
+
+_WALL_TILE_TEMPLATE = """<div class="wall-tile" data-tile="{index}">
+            <div class="wall-tile-title">{title}</div>
+            <div class="wall-tile-frame">
+                <div class="powerbi-placeholder">Aguardando...</div>
+                <iframe title="{title}" data-src="{url}" frameborder="0" allowFullScreen="true"
+                    allow="fullscreen; clipboard-read; clipboard-write; autoplay; camera; microphone; payment"></iframe>
+            </div>
+        </div>"""
+
+# Modo de token: o relatório é incorporado pela biblioteca powerbi-client em um div
+# (veja assets/token.js), sem iframe próprio nem URL com autoAuth
+_TOKEN_TEMPLATE = """
+    {styles}
+    <div class="powerbi-container pbi-desktop">
+        <div id="powerbi-report" class="powerbi-token-report" style="height: {height}px"></div>
+    </div>
+    {scripts}
+    """
+
+# Biblioteca oficial do Power BI para incorporação com token (versão fixa)
+POWERBI_CLIENT_URL = "https://cdn.jsdelivr.net/npm/powerbi-client@2.23.1/dist/powerbi.min.js"
+
+# Medidas do mural em px (veja assets/wall.css): título de cada painel,
+# espaço entre painéis e margem vertical da grade
+WALL_TITLE_HEIGHT = 28
+WALL_GAP = 10
+WALL_PADDING = 10
+
+
+# Atributos de log do iframe, presentes só no build "debug"
+_DEBUG_ATTRIBUTES = (
+    'onload="console.log(\'[Power BI] Iframe carregado\');"\n'
+    '                onerror="console.error(\'[Power BI] Erro ao carregar iframe\');"'
+)
+
+
+@lru_cache(maxsize=None)
+def asset_source(name):
+    """
+    Lê o conteúdo de um arquivo de ``assets/`` (uma vez por processo).
+    """
+    return (ASSETS_DIR / name).read_text(encoding="utf-8")
+
+
+@lru_cache(maxsize=None)
+def help_markdown(name):
+    """
+    Lê ``help/<name>.md`` (uma vez por processo, só quando o painel é aberto).
+    """
+    return (HELP_DIR / "{}.md".format(name)).read_text(encoding="utf-8")
+
+
+def built_asset(name, build="debug"):
+    """
+    Conteúdo de ``assets/<name>`` no modo de build (veja ``embed/build.py``).
+    """
+    return build_asset(name, asset_source(name), build)
+
+
+def _check_asset_mode(asset_mode):
+    if asset_mode not in ("inline", "static"):
+        raise ValueError("Modo de assets inválido: {!r} (use 'inline' ou 'static')".format(asset_mode))
+
+
+def _script_config(config):
+    """
+    Serializa a configuração do script como JSON seguro dentro de <script>.
+    """
+    payload = json.dumps(config, ensure_ascii=False, sort_keys=True)
+    return payload.replace("</", "<\\/")
+
+
+def _visibility_config(idle_unload, refresh_interval, refresh_jitter):
+    """
+    Parâmetros de ``assets/visibility.js`` (só os ativos) para a configuração do script.
+    """
+    config = {}
+    if idle_unload:
+        config["idleUnload"] = int(idle_unload)
+    if refresh_interval:
+        config["refreshInterval"] = int(refresh_interval)
+        config["refreshJitter"] = int(refresh_jitter)
+    return config
+
+
+@lru_cache(maxsize=1)
+def resource_hints():
+    """
+    Retorna as tags <link> de preconnect/dns-prefetch para as origens do Power BI.
+
+    Devem ser emitidas no início da página, antes do componente com o iframe.
+    """
+    links = []
+    for origin in PRECONNECT_ORIGINS:
+        links.append('<link rel="preconnect" href="{}">'.format(origin))
+        links.append('<link rel="dns-prefetch" href="{}">'.format(origin))
+    return "\n".join(links)
+
+
+@lru_cache(maxsize=4)
+def page_css(asset_mode="inline", build="debug"):
+    """
+    Retorna o CSS da página (montado uma única vez por processo e modo).
+
+    No modo "inline" é um bloco <style>; no modo "static" é apenas um <link>
+    para o arquivo versionado em ``static/``. No ``build`` "production" o CSS
+    sai minificado.
+    """
+    _check_asset_mode(asset_mode)
+    css = built_asset("page.css", build)
+    if asset_mode == "static":
+        href = static_assets.publish("page.css", css)
+        return '<link rel="stylesheet" href="{}">'.format(href)
+    return "\n    <style>\n{}    </style>\n".format(css)
+
+
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def embed_html(url, layout="auto", height=650, asset_mode="inline",
+               reload_policy="recreate", cache_buster=False, loading="eager",
+               mobile_url=None, desktop_url=None, aspect_ratio=None,
+               telemetry_url=None, telemetry_port=None, build="debug",
+               static_target=static_assets.STREAMLIT_TARGET,
+               idle_unload=0, refresh_interval=0, refresh_jitter=0, initial_url=None):
+    """
+    Retorna o HTML (iframe + script de redimensionamento) para o painel.
+
+    O resultado fica em cache pela combinação de argumentos, então sessões
+    diferentes recebem exatamente a mesma string. ``reload_policy``,
+    ``cache_buster`` e ``loading`` são repassados ao script (veja
+    ``embed/settings.py``); ``mobile_url``, ``desktop_url`` e ``aspect_ratio``
+    vêm do registro de relatórios (veja ``embed/registry.py``). Com
+    ``telemetry_url`` (ou ``telemetry_port``, no mesmo host da página) o script
+    envia os tempos de carregamento ao coletor (veja ``embed/telemetry.py``).
+    No ``build`` "production" o HTML, o CSS e o script saem minificados e sem logs.
+    No modo "static" os assets vão para ``static_target`` (padrão: ``static/``
+    do Streamlit; a exportação estática usa a pasta do site gerado).
+    ``idle_unload``, ``refresh_interval`` e ``refresh_jitter`` (segundos, 0 =
+    desativado) controlam a descarga com a aba oculta e a recarga agendada do
+    iframe (veja ``assets/visibility.js``). ``initial_url`` é a URL carregada
+    primeiro (ex.: ``mobile_url`` detectada no servidor); ``url`` continua sendo
+    a base usada pelo script quando falta a variante de um dos modos.
+    """
+    if layout not in _LAYOUT_CLASSES:
+        raise ValueError("Layout inválido: {!r} (use um de {})".format(layout, ", ".join(LAYOUTS)))
+    _check_asset_mode(asset_mode)
+    if loading not in _SRC_ATTRIBUTES:
+        raise ValueError("Estratégia de carregamento inválida: {!r}".format(loading))
+
+    # Parâmetros lidos pelo script (window.POWERBI_EMBED)
+    config = {
+        "url": url,
+        "layout": layout,
+        "reloadPolicy": reload_policy,
+        "cacheBuster": bool(cache_buster),
+        "loading": loading,
+    }
+    if initial_url and initial_url != url:
+        config["initialUrl"] = initial_url
+    if mobile_url:
+        config["mobileUrl"] = mobile_url
+    if desktop_url:
+        config["desktopUrl"] = desktop_url
+    if telemetry_url:
+        config["telemetryUrl"] = telemetry_url
+    elif telemetry_port:
+        config["telemetryPort"] = int(telemetry_port)
+    config.update(_visibility_config(idle_unload, refresh_interval, refresh_jitter))
+    scripts = ["<script>window.POWERBI_EMBED = {};</script>".format(_script_config(config))]
+
+    css = built_asset("embed.css", build)
+    js = built_asset("visibility.js", build) + built_asset("embed.js", build)
+    if asset_mode == "static":
+        styles = '<link rel="stylesheet" href="{}">'.format(static_assets.publish("embed.css", css, static_target))
+        scripts.append('<script src="{}"></script>'.format(static_assets.publish("embed.js", js, static_target)))
+    else:
+        styles = "<style>\n{}</style>".format(css)
+        scripts.append("<script>\n{}</script>".format(js))
+
+    markup = _EMBED_TEMPLATE.format(
+        debug_attributes=_DEBUG_ATTRIBUTES if build == "debug" else "",
+        src_attribute=_SRC_ATTRIBUTES[loading].format(url=html.escape(initial_url or url, quote=True)),
+        placeholder=_PLACEHOLDERS.get(loading, ""),
+        height=int(height),
+        layout_class=_LAYOUT_CLASSES[layout] + (" pbi-aspect" if aspect_ratio else ""),
+        container_style=' style="--pbi-aspect: {}"'.format(aspect_ratio) if aspect_ratio else "",
+        styles=styles,
+        scripts="\n    ".join(scripts),
+    )
+    if build == "production":
+        markup = minify_html(markup)
+    return markup
+
+
+def wall_height(count, columns, tile_height):
+    """
+    Altura (em px) do componente do mural com ``count`` painéis.
+    """
+    rows = -(-count // columns)
+    return WALL_PADDING + rows * (tile_height + WALL_TITLE_HEIGHT) + (rows - 1) * WALL_GAP
+
+
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def wall_html(wall, columns=None, concurrency=2, asset_mode="inline", build="debug",
+              idle_unload=0, refresh_interval=0, refresh_jitter=0):
+    """
+    Retorna o HTML do mural (``registry.Wall``): um painel por relatório e um
+    único script que carrega os iframes por uma fila limitada a ``concurrency``
+    carregamentos simultâneos (visíveis primeiro) e reage a redimensionamentos
+    com um só agendador para todos os painéis.
+
+    ``columns`` substitui as colunas do mural (por exemplo, 1 em celulares).
+    Os filtros, a página e o indicador do registro de cada relatório entram na
+    URL do painel (veja ``embed/filters.py``).
+    A descarga e a recarga agendada funcionam como em ``embed_html``, passando
+    os painéis pela mesma fila.
+    """
+    _check_asset_mode(asset_mode)
+    config = {
+        "concurrency": int(concurrency),
+        "tiles": [],
+    }
+    config.update(_visibility_config(idle_unload, refresh_interval, refresh_jitter))
+    tiles = []
+    for index, report in enumerate(wall.reports):
+        # Filtros, página e indicador do registro já na URL de cada painel
+        url = filters.apply_to_url(report.url, report.deep_link)
+        tile = {"id": report.id, "url": url}
+        if report.mobile_url:
+            tile["mobileUrl"] = filters.apply_to_url(report.mobile_url, report.deep_link)
+        if report.desktop_url:
+            tile["desktopUrl"] = filters.apply_to_url(report.desktop_url, report.deep_link)
+        config["tiles"].append(tile)
+        tiles.append(_WALL_TILE_TEMPLATE.format(
+            index=index,
+            title=html.escape(report.title, quote=True),
+            url=html.escape(url, quote=True),
+        ))
+    scripts = ["<script>window.POWERBI_WALL = {};</script>".format(_script_config(config))]
+
+    # O placeholder com animação vem do embed.css; a grade, do wall.css
+    css = built_asset("embed.css", build) + built_asset("wall.css", build)
+    js = built_asset("visibility.js", build) + built_asset("wall.js", build)
+    if asset_mode == "static":
+        styles = '<link rel="stylesheet" href="{}">'.format(static_assets.publish("wall.css", css))
+        scripts.append('<script src="{}"></script>'.format(static_assets.publish("wall.js", js)))
+    else:
+        styles = "<style>\n{}</style>".format(css)
+        scripts.append("<script>\n{}</script>".format(js))
+
+    markup = _WALL_TEMPLATE.format(
+        styles=styles,
+        columns=int(columns or wall.columns),
+        tile_height=int(wall.tile_height),
+        tiles="\n        ".join(tiles),
+        scripts="\n    ".join(scripts),
+    )
+    if build == "production":
+        markup = minify_html(markup)
+    return markup
+
+
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def token_embed_html(report, token, height=650, asset_mode="inline", build="debug",
+                     renew_port=None, idle_unload=0, refresh_interval=0, refresh_jitter=0,
+                     deep_link=None, renew_ahead=tokens.REFRESH_AHEAD, renew_url=None):
+    """
+    Retorna o HTML do modo de token: o relatório (``registry.Report``) aberto
+    pela biblioteca powerbi-client com ``token`` (``tokens.EmbedToken``).
+
+    O token é o mesmo para todas as sessões até ser renovado no servidor, então
+    o cache também vale aqui. Com ``renew_url`` (ou ``renew_port``, no mesmo host
+    da página) o script busca um token novo no sidecar ``renew_ahead`` segundos
+    antes de o atual expirar (a janela de renovação do ``TokenService``), com o
+    ticket de renovação da sessão. A descarga e
+    a recarga agendada funcionam como em ``embed_html``. ``deep_link``
+    (``filters.DeepLink``, padrão: o do registro) entra na configuração inicial
+    do ``powerbi.embed``, para a primeira consulta já sair filtrada.
+    """
+    _check_asset_mode(asset_mode)
+    config = {
+        "report": report.id,
+        "reportId": report.report_id,
+        "embedUrl": token.embed_url,
+        "accessToken": token.token,
+        "expiration": int(token.expires_at * 1000),
+    }
+    link = deep_link or report.deep_link
+    if link.filters:
+        config["filters"] = filters.client_filters(link.filters)
+    if link.page:
+        config["pageName"] = link.page
+    if link.bookmark:
+        config["bookmark"] = link.bookmark
+    if renew_url:
+        config["renewUrl"] = renew_url
+    elif renew_port:
+        config["renewPort"] = int(renew_port)
+    if renew_url or renew_port:
+        # O ticket é por sessão: o HTML em cache leva um marcador, trocado pelo
+        # app com tokens.with_renew_ticket
+        config["renewTicket"] = tokens.RENEW_TICKET_MARKER
+        config["renewAhead"] = int(renew_ahead * 1000)
+    config.update(_visibility_config(idle_unload, refresh_interval, refresh_jitter))
+    scripts = [
+        "<script>window.POWERBI_TOKEN = {};</script>".format(_script_config(config)),
+        '<script src="{}"></script>'.format(POWERBI_CLIENT_URL),
+    ]
+
+    css = built_asset("embed.css", build)
+    js = built_asset("visibility.js", build) + built_asset("token.js", build)
+    if asset_mode == "static":
+        styles = '<link rel="stylesheet" href="{}">'.format(static_assets.publish("embed.css", css))
+        scripts.append('<script src="{}"></script>'.format(static_assets.publish("token.js", js)))
+    else:
+        styles = "<style>\n{}</style>".format(css)
+        scripts.append("<script>\n{}</script>".format(js))
+
+    markup = _TOKEN_TEMPLATE.format(
+        styles=styles,
+        height=int(height),
+        scripts="\n    ".join(scripts),
+    )
+    if build == "production":
+        markup = minify_html(markup)
+    return markup
+
+
+def render_stats():
+    """
+    Retorna os contadores de acerto/falha do cache de renderização.
+    """
+    stats = {}
+    for name, func in (("page_css", page_css), ("embed_html", embed_html), ("wall_html", wall_html),
+                       ("token_embed_html", token_embed_html)):
+        info = func.cache_info()
+        stats[name] = {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "maxsize": info.maxsize,
+        }
+    return stats
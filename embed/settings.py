@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Configurações da aplicação lidas de variáveis de ambiente.
+
+Todas as opções têm valores padrão que reproduzem o comportamento original, de
+modo que ``streamlit run app.py`` continua funcionando sem nenhuma variável
+definida. As variáveis são lidas uma única vez por processo.
+"""
+
+import os
+from dataclasses import dataclass, field
+from functools import lru_cache
+
+from embed.registry import DEFAULT_REGISTRY_PATH
+
+# Modos de entrega do CSS/JS do painel:
+# - "inline": CSS e script vão embutidos no HTML de cada sessão (padrão)
+# - "static": CSS e script são servidos como arquivos estáticos com hash no nome
+ASSET_MODES = ("inline", "static")
+
+# Política do script ao cruzar o breakpoint mobile/desktop:
+# - "recreate": recria o iframe quando ele está largo demais para o layout mobile (padrão)
+# - "in-place": mantém o iframe vivo e apenas redimensiona via CSS; só troca o
+#   src quando a URL do novo modo é diferente (variantes mobile/desktop)
+RELOAD_POLICIES = ("recreate", "in-place")
+
+# Estratégias de carregamento do iframe do Power BI:
+# - "eager": src atribuído imediatamente (padrão)
+# - "lazy": src imediato com loading="lazy" (o navegador adia se estiver fora da tela)
+# - "visible": placeholder e src atribuído quando o painel entra na tela
+# - "interaction": placeholder e src atribuído na primeira interação do usuário
+LOADING_STRATEGIES = ("eager", "lazy", "visible", "interaction")
+
+# Modos de build do CSS/script do painel (veja embed/build.py):
+# - "debug": arquivos como estão, com todos os logs no console (padrão)
+# - "production": minificados e sem logs de diagnóstico
+BUILD_MODES = ("debug", "production")
+
+# Origem dos tokens de incorporação (veja embed/tokens.py):
+# - "off": iframe com a URL do registro (publish-to-web / autoAuth), padrão
+# - "azure": service principal no Azure AD + API REST do Power BI (GenerateToken)
+# - "http": serviço próprio que devolve tokens (POWERBI_TOKEN_URL)
+# - "mock": tokens falsos gerados no processo, para testes sem Azure
+TOKEN_PROVIDERS = ("off", "azure", "http", "mock")
+
+# Valores aceitos como verdadeiro/falso nas variáveis booleanas
+_TRUE = ("1", "true", "yes", "on", "sim")
+_FALSE = ("0", "false", "no", "off", "nao", "não", "")
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Opções de execução da aplicação.
+    """
+    asset_mode: str = "inline"
+    reload_policy: str = "recreate"
+    cache_buster: bool = False
+    loading: str = "eager"
+    registry_path: str = str(DEFAULT_REGISTRY_PATH)
+    device_detection: bool = True
+    telemetry: bool = False
+    telemetry_url: str = ""
+    sidecar_host: str = "0.0.0.0"
+    sidecar_port: int = 8502
+    sidecar_secret: str = field(default="", repr=False)
+    admin_token: str = ""
+    build: str = "debug"
+    pwa: bool = False
+    wall_concurrency: int = 2
+    idle_unload: int = 0
+    refresh_interval: int = 0
+    refresh_jitter: int = 30
+    token_provider: str = "off"
+    token_url: str = ""
+    tenant_id: str = ""
+    client_id: str = ""
+    client_secret: str = field(default="", repr=False)
+    token_refresh_ahead: int = 300
+    token_renew_url: str = ""
+    metrics: bool = False
+    metrics_port: int = None
+
+
+def _choice(name, default, choices):
+    """
+    Lê uma variável de ambiente restrita a um conjunto de valores.
+    """
+    value = os.environ.get(name, default).strip().lower()
+    if value not in choices:
+        raise ValueError("{}={!r} inválido (use um de {})".format(name, value, ", ".join(choices)))
+    return value
+
+
+def _flag(name, default=False):
+    """
+    Lê uma variável de ambiente booleana.
+    """
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    value = value.strip().lower()
+    if value in _TRUE:
+        return True
+    if value in _FALSE:
+        return False
+    raise ValueError("{}={!r} inválido (use 1/0, true/false)".format(name, value))
+
+
+def _int(name, default):
+    """
+    Lê uma variável de ambiente inteira.
+    """
+    value = os.environ.get(name, "").strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError("{}={!r} inválido (use um número inteiro)".format(name, value))
+
+
+@lru_cache(maxsize=1)
+def get_settings():
+    """
+    Retorna as configurações do processo (lidas uma única vez).
+    """
+    return Settings(
+        asset_mode=_choice("POWERBI_ASSET_MODE", "inline", ASSET_MODES),
+        reload_policy=_choice("POWERBI_RELOAD_POLICY", "recreate", RELOAD_POLICIES),
+        cache_buster=_flag("POWERBI_CACHE_BUSTER"),
+        loading=_choice("POWERBI_LOADING", "eager", LOADING_STRATEGIES),
+        registry_path=os.environ.get("POWERBI_REGISTRY", str(DEFAULT_REGISTRY_PATH)),
+        device_detection=_flag("POWERBI_DEVICE_DETECTION", default=True),
+        telemetry=_flag("POWERBI_TELEMETRY"),
+        telemetry_url=os.environ.get("POWERBI_TELEMETRY_URL", ""),
+        sidecar_host=os.environ.get("POWERBI_SIDECAR_HOST", "0.0.0.0"),
+        sidecar_port=_int("POWERBI_SIDECAR_PORT", 8502),
+        sidecar_secret=os.environ.get("POWERBI_SIDECAR_SECRET", ""),
+        admin_token=os.environ.get("POWERBI_ADMIN_TOKEN", ""),
+        build=_choice("POWERBI_BUILD", "debug", BUILD_MODES),
+        pwa=_flag("POWERBI_PWA"),
+        wall_concurrency=max(1, _int("POWERBI_WALL_CONCURRENCY", 2)),
+        idle_unload=max(0, _int("POWERBI_IDLE_UNLOAD", 0)),
+        refresh_interval=max(0, _int("POWERBI_REFRESH_INTERVAL", 0)),
+        refresh_jitter=max(0, _int("POWERBI_REFRESH_JITTER", 30)),
+        token_provider=_choice("POWERBI_TOKEN_PROVIDER", "off", TOKEN_PROVIDERS),
+        token_url=os.environ.get("POWERBI_TOKEN_URL", ""),
+        tenant_id=os.environ.get("POWERBI_TENANT_ID", ""),
+        client_id=os.environ.get("POWERBI_CLIENT_ID", ""),
+        client_secret=os.environ.get("POWERBI_CLIENT_SECRET", ""),
+        token_refresh_ahead=max(0, _int("POWERBI_TOKEN_REFRESH_AHEAD", 300)),
+        token_renew_url=os.environ.get("POWERBI_TOKEN_RENEW_URL", ""),
+        metrics=_flag("POWERBI_METRICS"),
+        metrics_port=_int("POWERBI_METRICS_PORT", None),
+    )
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor HTTP auxiliar (sidecar) para endpoints que o Streamlit não oferece.
+
+O Streamlit não permite registrar rotas HTTP próprias no servidor dele, então
+endpoints como o coletor de telemetria rodam em um ``ThreadingHTTPServer`` da
+biblioteca padrão, em uma thread daemon, iniciado uma única vez por processo.
+
+Cada módulo registra suas rotas com ``route(method, path, handler)``. O handler
+recebe um ``Request`` e retorna ``(status, content_type, corpo_em_bytes)``, ou
+``(status, content_type, corpo_em_bytes, cabeçalhos)`` para cabeçalhos extras.
+"""
+
+import json
+import logging
+import threading
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# Tamanho máximo aceito no corpo de uma requisição (bytes)
+MAX_BODY_SIZE = 64 * 1024
+
+# Tempo máximo (segundos) sem receber dados de um cliente antes de fechar a conexão
+REQUEST_TIMEOUT = 10
+
+# Rotas registradas: {(método, caminho): (handler, cors)}
+_routes = {}
+
+# Servidores já iniciados neste processo: {(host, porta): servidor ou None}
+_servers = {}
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class Request:
+    """
+    Requisição recebida pelo sidecar.
+    """
+    method: str
+    path: str
+    query: dict
+    headers: dict
+    body: bytes
+
+    def header(self, name):
+        """
+        Valor de um cabeçalho (sem diferenciar maiúsculas), ou ``None``.
+        """
+        name = name.lower()
+        for key, value in self.headers.items():
+            if key.lower() == name:
+                return value
+        return None
+
+
+def route(method, path, handler, cors=True):
+    """
+    Registra (ou substitui) o handler de ``method path``.
+
+    Com ``cors=False`` a resposta não leva ``Access-Control-Allow-Origin: *``;
+    o handler decide quais origens liberar (nos cabeçalhos extras).
+    """
+    _routes[(method.upper(), path)] = (handler, cors)
+
+
+def json_response(data, status=200, headers=None):
+    """
+    Monta a resposta de um handler com corpo JSON.
+    """
+    body = json.dumps(data).encode("utf-8")
+    if headers:
+        return status, "application/json; charset=utf-8", body, headers
+    return status, "application/json; charset=utf-8", body
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "PowerBIEmbedSidecar/1.0"
+    # Aplicado ao socket: um cliente lento não prende a thread indefinidamente
+    timeout = REQUEST_TIMEOUT
+
+    def _send(self, status, content_type=None, body=b"", headers=None, cors=True):
+        self.send_response(status)
+        if cors:
+            # Beacons vêm da página do Streamlit (outra porta = outra origem)
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Access-Control-Allow-Methods", "GET, POST, OPTIONS")
+            self.send_header("Access-Control-Allow-Headers", "Content-Type, Authorization")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Cache-Control", "no-store")
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body and self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _dispatch(self):
+        parts = urlsplit(self.path)
+        entry = _routes.get((self.command, parts.path))
+        if entry is None:
+            self._send(404, "text/plain; charset=utf-8", b"not found")
+            return
+        handler, cors = entry
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send(400, "text/plain; charset=utf-8", b"invalid content-length")
+            return
+        if length > MAX_BODY_SIZE:
+            self._send(413, "text/plain; charset=utf-8", b"payload too large")
+            return
+        body = self.rfile.read(length) if length else b""
+
+        request = Request(
+            method=self.command,
+            path=parts.path,
+            query={key: values[-1] for key, values in parse_qs(parts.query).items()},
+            headers={key: value for key, value in self.headers.items()},
+            body=body,
+        )
+        try:
+            response = handler(request)
+        except Exception:
+            logger.exception("Erro no endpoint %s %s", self.command, parts.path)
+            self._send(500, "text/plain; charset=utf-8", b"internal error", cors=cors)
+            return
+        self._send(*response, cors=cors)
+
+    def do_GET(self):
+        self._dispatch()
+
+    def do_POST(self):
+        self._dispatch()
+
+    def do_OPTIONS(self):
+        # Preflight: sem o curinga nas rotas que controlam a própria origem
+        path = urlsplit(self.path).path
+        cors = all(entry[1] for key, entry in _routes.items() if key[1] == path)
+        self._send(204, cors=cors)
+
+    def log_message(self, format, *args):
+        # Evita uma linha de log por beacon no stderr
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+
+def start(host, port):
+    """
+    Inicia o sidecar em ``host:port`` (uma única vez por processo).
+
+    Retorna o servidor, ou ``None`` se a porta não estiver disponível (por
+    exemplo, outro processo já está servindo nela).
+    """
+    key = (host, port)
+    if key in _servers:
+        return _servers[key]
+    with _lock:
+        if key in _servers:
+            return _servers[key]
+        try:
+            server = ThreadingHTTPServer(key, _Handler)
+        except OSError as exc:
+            logger.warning("Sidecar não iniciado em %s:%s: %s", host, port, exc)
+            server = None
+        else:
+            server.daemon_threads = True
+            thread = threading.Thread(target=server.serve_forever, name="powerbi-sidecar", daemon=True)
+            thread.start()
+            logger.info("Sidecar HTTP ouvindo em %s:%s", host, server.server_address[1])
+        _servers[key] = server
+        return server
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Publicação dos arquivos CSS/JS do painel como assets estáticos versionados.
+
+O Streamlit serve o conteúdo da pasta ``static/`` (ao lado do ``app.py``) em
+``app/static/`` quando ``server.enableStaticServing`` está ativo. Cada arquivo é
+copiado com um hash do conteúdo no nome (ex.: ``embed.3f2a9c1b0d4e.js``), então a
+URL muda sempre que o conteúdo muda e o navegador/CDN pode guardar a versão
+anterior em cache indefinidamente.
+
+A exportação estática (``embed/export.py``) usa o mesmo mecanismo com outro
+destino (``Target``): a pasta de assets do site gerado.
+"""
+
+import hashlib
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+# Pasta servida pelo Streamlit (mesmo diretório do app.py)
+STATIC_DIR = Path(__file__).resolve().parent.parent / "static"
+
+# Prefixo público dos arquivos servidos pelo Streamlit
+STATIC_URL_PREFIX = "app/static/"
+
+# Quantidade de caracteres do hash SHA-256 usada no nome do arquivo
+HASH_LENGTH = 12
+
+
+@dataclass(frozen=True)
+class Target:
+    """
+    Onde os assets versionados são gravados e por qual URL são referenciados.
+    """
+    directory: Path
+    url_prefix: str
+
+
+# Destino padrão: pasta static/ servida pelo Streamlit
+STREAMLIT_TARGET = Target(STATIC_DIR, STATIC_URL_PREFIX)
+
+
+def fingerprint(content):
+    """
+    Retorna o hash (truncado) do conteúdo usado no nome do arquivo.
+    """
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def fingerprinted_name(name, content):
+    """
+    Monta o nome versionado: ``embed.js`` -> ``embed.<hash>.js``.
+    """
+    stem, _, suffix = name.rpartition(".")
+    return "{}.{}.{}".format(stem, fingerprint(content), suffix)
+
+
+@lru_cache(maxsize=None)
+def publish(name, content, target=STREAMLIT_TARGET):
+    """
+    Grava o asset versionado em ``target`` (padrão: ``static/``) e retorna a URL
+    pública dele.
+
+    Executado uma vez por (nome, conteúdo, destino) em cada processo. Versões
+    antigas do mesmo arquivo são removidas para não acumular lixo na pasta.
+    """
+    directory = target.directory
+    directory.mkdir(parents=True, exist_ok=True)
+    filename = fingerprinted_name(name, content)
+    path = directory / filename
+
+    if not path.exists():
+        # Grava em arquivo temporário e renomeia para nunca servir arquivo incompleto
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(content, encoding="utf-8")
+        tmp.replace(path)
+
+    stem, _, suffix = name.rpartition(".")
+    stale = re.compile(r"^{}\.[0-9a-f]{{{}}}\.{}$".format(re.escape(stem), HASH_LENGTH, re.escape(suffix)))
+    for old in directory.iterdir():
+        if old.name != filename and stale.match(old.name):
+            try:
+                old.unlink()
+            except OSError:
+                # Outro processo pode ter removido o arquivo ao mesmo tempo
+                pass
+
+    return target.url_prefix + filename
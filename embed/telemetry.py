@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Coletor de telemetria de carregamento do painel (tempos medidos no navegador).
+
+O script do painel (``assets/embed.js``) mede os tempos de navegação da página,
+a latência até o ``onload`` do iframe do Power BI, quantas vezes o iframe foi
+recriado e quantos eventos de redimensionamento chegaram, e envia os valores em
+lotes com ``navigator.sendBeacon`` para ``POST /beacon`` no sidecar HTTP.
+
+As amostras ficam em memória (janela das últimas ``MAX_SAMPLES`` por métrica e
+classe de dispositivo) e são resumidas em p50/p95/p99 na página de admin.
+"""
+
+import json
+import math
+import threading
+from collections import deque
+
+from embed import device, sidecar
+
+# Métricas aceitas nos beacons (nome -> descrição exibida no admin)
+METRICS = {
+    "ttfb_ms": "Tempo até o primeiro byte da página",
+    "dom_content_loaded_ms": "DOMContentLoaded da página",
+    "page_load_ms": "Evento load da página",
+    "iframe_load_ms": "Atribuição do src até o onload do iframe",
+    "iframe_recreations": "Recriações do iframe na visita",
+    "resize_events": "Eventos de redimensionamento na visita",
+}
+
+# Amostras mantidas por (classe de dispositivo, métrica)
+MAX_SAMPLES = 1000
+
+# Eventos aceitos em um único beacon
+MAX_EVENTS_PER_BEACON = 100
+
+# Maiores valores aceitos: tempos (métricas "_ms") e contadores da visita;
+# acima disso a amostra é descartada (relógio errado ou beacon forjado)
+MAX_TIME_MS = 10 * 60 * 1000
+MAX_COUNT = 100000
+
+# Percentis exibidos no resumo
+PERCENTILES = (50, 95, 99)
+
+
+def percentile(sorted_values, pct):
+    """
+    Percentil pelo método do posto mais próximo (lista já ordenada).
+    """
+    if not sorted_values:
+        return None
+    rank = max(1, -(-pct * len(sorted_values) // 100))
+    return sorted_values[int(rank) - 1]
+
+
+class TelemetryStore:
+    """
+    Amostras de telemetria em memória, compartilhadas por todas as sessões.
+    """
+
+    def __init__(self, max_samples=MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._beacons = 0
+        self._lock = threading.Lock()
+
+    def record(self, device_class, metric, value):
+        """
+        Registra uma amostra; métricas desconhecidas são ignoradas.
+        """
+        if metric not in METRICS:
+            return False
+        with self._lock:
+            key = (device_class, metric)
+            if key not in self._samples:
+                self._samples[key] = deque(maxlen=self.max_samples)
+            self._samples[key].append(float(value))
+        return True
+
+    def record_beacon(self, device_class, payload):
+        """
+        Registra os eventos de um beacon ``{"events": [{"metric", "value"}, ...]}``.
+
+        Retorna a quantidade de eventos aceitos.
+        """
+        events = payload.get("events") if isinstance(payload, dict) else None
+        if not isinstance(events, list):
+            raise ValueError("beacon sem lista 'events'")
+        accepted = 0
+        for event in events[:MAX_EVENTS_PER_BEACON]:
+            if not isinstance(event, dict):
+                continue
+            value = event.get("value")
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            # O json do Python aceita NaN e Infinity, que estragariam os percentis
+            if not math.isfinite(value) or value < 0:
+                continue
+            metric = event.get("metric")
+            if value > (MAX_TIME_MS if str(metric).endswith("_ms") else MAX_COUNT):
+                continue
+            if self.record(device_class, metric, value):
+                accepted += 1
+        with self._lock:
+            self._beacons += 1
+        return accepted
+
+    def summary(self):
+        """
+        Retorna uma linha por (dispositivo, métrica) com contagem e percentis.
+        """
+        with self._lock:
+            snapshot = {key: sorted(values) for key, values in self._samples.items()}
+        rows = []
+        for (device_class, metric), values in sorted(snapshot.items()):
+            row = {"dispositivo": device_class, "métrica": metric, "amostras": len(values)}
+            for pct in PERCENTILES:
+                row["p{}".format(pct)] = round(percentile(values, pct), 1)
+            rows.append(row)
+        return rows
+
+    @property
+    def beacons(self):
+        return self._beacons
+
+    def clear(self):
+        with self._lock:
+            self._samples.clear()
+            self._beacons = 0
+
+
+# Armazenamento único do processo (compartilhado entre sessões e o sidecar)
+STORE = TelemetryStore()
+
+
+def device_class(headers):
+    """
+    Classe de dispositivo de um beacon, pelo User-Agent da requisição.
+    """
+    layout = device.classify_user_agent(headers.get("User-Agent", ""))
+    return "outro" if layout == "auto" else layout
+
+
+def handle_beacon(request):
+    """
+    Endpoint ``POST /beacon`` do sidecar.
+
+    ``sendBeacon`` envia o JSON como ``text/plain`` para não exigir preflight CORS.
+    """
+    try:
+        payload = json.loads(request.body.decode("utf-8"))
+        accepted = STORE.record_beacon(device_class(request.headers), payload)
+    except (UnicodeDecodeError, ValueError) as exc:
+        return 400, "text/plain; charset=utf-8", str(exc).encode("utf-8")
+    return sidecar.json_response({"accepted": accepted})
+
+
+def start_collector(host, port):
+    """
+    Registra o endpoint de beacons e garante o sidecar rodando.
+    """
+    sidecar.route("POST", "/beacon", handle_beacon)
+    return sidecar.start(host, port)
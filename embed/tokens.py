@@ -0,0 +1,519 @@
+# -*- coding: utf-8 -*-
+"""
+Tokens de incorporação do Power BI obtidos no servidor, com cache em memória.
+
+No modo padrão o iframe abre a URL publicada (publish-to-web / ``autoAuth``) e
+cada visitante passa pela cadeia de redirecionamentos de login antes de o
+relatório começar a carregar. No modo de token (``POWERBI_TOKEN_PROVIDER``) o
+servidor gera um token de incorporação e o navegador abre o relatório direto com
+ele, pela biblioteca ``powerbi-client`` (veja ``assets/token.js``).
+
+Os tokens ficam em cache por (relatório, identidade) e são compartilhados por
+todas as sessões do processo. Uma thread em segundo plano renova os tokens antes
+de expirarem (``refresh_ahead`` segundos antes), então as sessões quase nunca
+esperam pela API; tokens sem uso por ``IDLE_EVICT`` segundos são descartados.
+
+Fontes de token (``fetcher``): qualquer chamável ``fetch(report, identity)`` que
+retorne um ``EmbedToken``:
+
+- ``AzureTokenFetcher``: service principal no Azure AD + ``GenerateToken`` da API
+  REST do Power BI;
+- ``HttpTokenFetcher``: um serviço próprio que devolve ``{"token", "embedUrl",
+  "expiration"}``; o endpoint falso ``POST /mock/embed-token`` do sidecar
+  segue esse formato;
+- ``MockTokenFetcher`` (``POWERBI_TOKEN_PROVIDER=mock``): tokens falsos gerados
+  no próprio processo, para testes sem Azure.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from functools import lru_cache
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from embed import sidecar
+
+logger = logging.getLogger(__name__)
+
+# Endpoints do Azure AD e da API REST do Power BI
+AUTHORITY_URL = "https://login.microsoftonline.com/{tenant}/oauth2/v2.0/token"
+POWERBI_SCOPE = "https://analysis.windows.net/powerbi/api/.default"
+POWERBI_API_URL = "https://api.powerbi.com/v1.0/myorg"
+
+# Segundos antes da expiração em que o token é renovado em segundo plano
+REFRESH_AHEAD = 300
+
+# Token com menos validade que isto não é entregue (é buscado de novo na hora)
+MIN_VALIDITY = 60
+
+# Intervalo da thread de renovação e tempo sem uso até descartar um token (segundos)
+REFRESH_CHECK_INTERVAL = 30
+IDLE_EVICT = 3600
+
+# Tempo limite das chamadas HTTP (segundos)
+HTTP_TIMEOUT = 15
+
+# Validade dos tokens do endpoint falso (segundos)
+MOCK_TOKEN_LIFETIME = 3600
+
+# Validade do ticket de renovação entregue a cada sessão (segundos); uma página
+# aberta por mais tempo que isso precisa ser recarregada para renovar o token
+TICKET_LIFETIME = 12 * 3600
+
+# Marcador trocado pelo ticket da sessão no HTML em cache (veja with_renew_ticket)
+RENEW_TICKET_MARKER = "__POWERBI_RENEW_TICKET__"
+
+# Chave dos tickets quando POWERBI_SIDECAR_SECRET não está definida (vale só
+# neste processo; o launcher define uma chave comum a todos os workers)
+_PROCESS_SECRET = secrets.token_bytes(32)
+
+
+class TokenError(RuntimeError):
+    """
+    Falha ao obter um token de incorporação.
+    """
+
+
+@dataclass(frozen=True)
+class EmbedToken:
+    """
+    Token de incorporação de um relatório; ``expires_at`` em segundos (epoch).
+    """
+    token: str
+    embed_url: str
+    expires_at: float
+
+
+def parse_expiration(value):
+    """
+    Converte a expiração da API ("2024-01-01T12:00:00Z") em segundos (epoch).
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    try:
+        parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        raise TokenError("Expiração inválida no token: {!r}".format(value))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _request_json(url, data=None, headers=None, form=False):
+    """
+    Faz uma requisição HTTP e retorna o corpo JSON (POST quando há ``data``).
+    """
+    headers = dict(headers or {})
+    body = None
+    if data is not None:
+        if form:
+            body = urlencode(data).encode("utf-8")
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        else:
+            body = json.dumps(data).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+    request = Request(url, data=body, headers=headers, method="POST" if body is not None else "GET")
+    try:
+        with urlopen(request, timeout=HTTP_TIMEOUT) as response:
+            return json.loads(response.read().decode("utf-8"))
+    except HTTPError as exc:
+        detail = exc.read().decode("utf-8", "replace")[:300]
+        raise TokenError("HTTP {} em {}: {}".format(exc.code, url.split("?")[0], detail))
+    except (URLError, OSError, ValueError) as exc:
+        raise TokenError("Falha ao chamar {}: {}".format(url.split("?")[0], exc))
+
+
+class HttpTokenFetcher:
+    """
+    Busca tokens em um serviço próprio (``POST url``).
+
+    Envia ``{"report", "workspace_id", "report_id", "identity", "roles"}`` e
+    espera ``{"token", "embedUrl", "expiration"}``.
+    """
+
+    def __init__(self, url):
+        self.url = url
+
+    def __call__(self, report, identity=None):
+        data = _request_json(self.url, {
+            "report": report.id,
+            "workspace_id": report.workspace_id,
+            "report_id": report.report_id,
+            "identity": identity,
+            "roles": list(report.roles),
+        })
+        try:
+            return EmbedToken(data["token"], data["embedUrl"], parse_expiration(data["expiration"]))
+        except (KeyError, TypeError):
+            raise TokenError("Resposta sem token/embedUrl/expiration de {}".format(self.url))
+
+
+class AzureTokenFetcher:
+    """
+    Gera tokens com um service principal (client credentials) no Azure AD.
+
+    O token de acesso do Azure AD e os metadados dos relatórios (``embedUrl``,
+    ``datasetId``) também ficam em cache.
+    """
+
+    def __init__(self, tenant_id, client_id, client_secret, api_url=POWERBI_API_URL):
+        if not (tenant_id and client_id and client_secret):
+            raise TokenError("Defina POWERBI_TENANT_ID, POWERBI_CLIENT_ID e POWERBI_CLIENT_SECRET")
+        self.tenant_id = tenant_id
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = api_url.rstrip("/")
+        self._lock = threading.Lock()
+        self._access_token = None
+        self._access_expires_at = 0
+        self._reports = {}
+
+    def access_token(self):
+        """
+        Token do Azure AD para a API do Power BI (renovado perto de expirar).
+        """
+        with self._lock:
+            if self._access_token and self._access_expires_at - time.time() > MIN_VALIDITY:
+                return self._access_token
+            data = _request_json(AUTHORITY_URL.format(tenant=self.tenant_id), {
+                "grant_type": "client_credentials",
+                "client_id": self.client_id,
+                "client_secret": self.client_secret,
+                "scope": POWERBI_SCOPE,
+            }, form=True)
+            try:
+                self._access_token = data["access_token"]
+                self._access_expires_at = time.time() + int(data.get("expires_in", 3600))
+            except (KeyError, TypeError, ValueError):
+                raise TokenError("Resposta do Azure AD sem access_token")
+            return self._access_token
+
+    def _report_metadata(self, report, headers):
+        key = (report.workspace_id, report.report_id)
+        if key not in self._reports:
+            self._reports[key] = _request_json("{}/groups/{}/reports/{}".format(self.api_url, *key), headers=headers)
+        return self._reports[key]
+
+    def __call__(self, report, identity=None):
+        if not (report.workspace_id and report.report_id):
+            raise TokenError("reports.{} precisa de workspace_id e report_id no modo de token".format(report.id))
+        headers = {"Authorization": "Bearer {}".format(self.access_token())}
+        metadata = self._report_metadata(report, headers)
+        body = {"accessLevel": "View"}
+        if report.roles:
+            if not identity:
+                raise TokenError("reports.{} usa roles e exige um usuário identificado".format(report.id))
+            body["identities"] = [{
+                "username": identity,
+                "roles": list(report.roles),
+                "datasets": [metadata.get("datasetId")],
+            }]
+        data = _request_json("{}/groups/{}/reports/{}/GenerateToken".format(
+            self.api_url, report.workspace_id, report.report_id), body, headers=headers)
+        try:
+            return EmbedToken(data["token"], metadata["embedUrl"], parse_expiration(data["expiration"]))
+        except (KeyError, TypeError):
+            raise TokenError("Resposta do GenerateToken sem token/expiration")
+
+
+class TokenService:
+    """
+    Cache de tokens por (relatório, identidade), compartilhado entre sessões,
+    com renovação antecipada em segundo plano.
+    """
+
+    def __init__(self, fetcher, refresh_ahead=REFRESH_AHEAD, clock=time.time):
+        self.fetcher = fetcher
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+        # {(id do relatório, identidade): (EmbedToken, Report, último uso)}
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._refresher = None
+        self.stats = {"hits": 0, "misses": 0, "refreshes": 0, "errors": 0}
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _store(self, key, token, report):
+        with self._lock:
+            self._entries[key] = (token, report, self.clock())
+
+    def _count(self, name):
+        # Vários threads (sessões, sidecar e o renovador) atualizam os contadores
+        with self._lock:
+            self.stats[name] += 1
+
+    @property
+    def renew_window(self):
+        """
+        Segundos antes da expiração em que o navegador pede um token novo (veja
+        ``assets/token.js``); nessa janela o sidecar busca um token na hora, sem
+        esperar a thread de renovação.
+        """
+        return max(self.refresh_ahead, MIN_VALIDITY)
+
+    def get(self, report, identity=None, min_validity=MIN_VALIDITY):
+        """
+        Retorna um token válido para ``report``; só chama a API quando não há
+        token em cache (ou o do cache está para expirar em menos de ``min_validity``).
+        """
+        self._start_refresher()
+        key = (report.id, identity)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0].expires_at - self.clock() > min_validity:
+            self._store(key, entry[0], report)
+            self._count("hits")
+            return entry[0]
+
+        # Uma única busca por chave: as outras sessões esperam e reaproveitam o resultado
+        with self._key_lock(key):
+            entry = self._entries.get(key)
+            if entry is not None and entry[0].expires_at - self.clock() > min_validity:
+                self._count("hits")
+                return entry[0]
+            self._count("misses")
+            try:
+                token = self.fetcher(report, identity)
+            except TokenError:
+                self._count("errors")
+                raise
+            self._store(key, token, report)
+            return token
+
+    def refresh_due(self):
+        """
+        Renova os tokens que expiram em menos de ``refresh_ahead`` segundos e
+        descarta os que não são usados há mais de ``IDLE_EVICT`` segundos.
+        """
+        now = self.clock()
+        with self._lock:
+            entries = list(self._entries.items())
+        for key, (token, report, last_used) in entries:
+            if now - last_used > IDLE_EVICT:
+                with self._lock:
+                    self._entries.pop(key, None)
+                continue
+            if token.expires_at - now > self.refresh_ahead:
+                continue
+            with self._key_lock(key):
+                try:
+                    fresh = self.fetcher(report, key[1])
+                except TokenError as exc:
+                    self._count("errors")
+                    logger.warning("Falha ao renovar o token de %s: %s", key[0], exc)
+                    continue
+                with self._lock:
+                    self._entries[key] = (fresh, report, last_used)
+                    self.stats["refreshes"] += 1
+
+    def _run_refresher(self):
+        while True:
+            time.sleep(REFRESH_CHECK_INTERVAL)
+            try:
+                self.refresh_due()
+            except Exception:
+                logger.exception("Erro na renovação de tokens")
+
+    def _start_refresher(self):
+        if self._refresher is not None:
+            return
+        with self._lock:
+            if self._refresher is None:
+                self._refresher = threading.Thread(target=self._run_refresher, name="powerbi-token-refresh", daemon=True)
+                self._refresher.start()
+
+    def cache_stats(self):
+        """
+        Contadores do cache e quantidade de tokens guardados.
+        """
+        with self._lock:
+            return dict(self.stats, size=len(self._entries))
+
+    def metric_families(self):
+        """
+        Contadores do cache no formato dos coletores de ``embed/metrics.py``.
+        """
+        stats = self.cache_stats()
+        events = [({"event": name}, stats[name]) for name in ("hits", "misses", "refreshes", "errors")]
+        return (
+            ("powerbi_token_cache_events_total", "counter", "Eventos do cache de tokens de incorporação", events),
+            ("powerbi_token_cache_entries", "gauge", "Tokens de incorporação em cache", [({}, stats["size"])]),
+        )
+
+
+def mock_token(report_id, workspace_id=None):
+    """
+    Resposta falsa no formato do ``HttpTokenFetcher`` (token aleatório, 1 hora).
+    """
+    query = urlencode({"reportId": report_id or "mock", "groupId": workspace_id or "mock"})
+    expiration = datetime.fromtimestamp(time.time() + MOCK_TOKEN_LIFETIME, timezone.utc)
+    return {
+        "token": "mock-" + secrets.token_urlsafe(24),
+        "embedUrl": "https://app.powerbi.com/reportEmbed?" + query,
+        "expiration": expiration.strftime("%Y-%m-%dT%H:%M:%SZ"),
+    }
+
+
+class MockTokenFetcher:
+    """
+    Tokens falsos gerados no próprio processo (``POWERBI_TOKEN_PROVIDER=mock``).
+
+    Não depende do sidecar: com o launcher só um worker abre a porta dele, e
+    os demais precisam gerar tokens mesmo assim.
+    """
+
+    def __call__(self, report, identity=None):
+        data = mock_token(report.report_id or report.id, report.workspace_id)
+        return EmbedToken(data["token"], data["embedUrl"], parse_expiration(data["expiration"]))
+
+
+def handle_mock_token(request):
+    """
+    Endpoint falso ``POST /mock/embed-token`` do sidecar, para testar um
+    serviço próprio (provedor "http") sem Azure.
+    """
+    try:
+        payload = json.loads(request.body.decode("utf-8") or "{}")
+    except (UnicodeDecodeError, ValueError) as exc:
+        return 400, "text/plain; charset=utf-8", str(exc).encode("utf-8")
+    return sidecar.json_response(mock_token(payload.get("report_id") or payload.get("report"),
+                                            payload.get("workspace_id")))
+
+
+def _ticket_secret(settings):
+    if settings.sidecar_secret:
+        return settings.sidecar_secret.encode("utf-8")
+    return _PROCESS_SECRET
+
+
+def _sign(secret, body):
+    return hmac.new(secret, body.encode("ascii"), hashlib.sha256).hexdigest()
+
+
+def issue_ticket(settings, report, identity, origin, session_id, now=None):
+    """
+    Ticket de renovação de uma sessão: relatório, identidade, origem da página
+    e validade, assinados com HMAC (``POWERBI_SIDECAR_SECRET``).
+
+    O ticket não fica guardado no servidor, então o sidecar de qualquer worker
+    consegue validá-lo; a identidade vem dele (e não da requisição), o que
+    permite renovar também os relatórios com ``roles``.
+    """
+    payload = {
+        "report": report.id,
+        "identity": identity,
+        "origin": origin,
+        "session": session_id,
+        "expires": int((time.time() if now is None else now) + TICKET_LIFETIME),
+    }
+    raw = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode("utf-8")
+    body = base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+    return "{}.{}".format(body, _sign(_ticket_secret(settings), body))
+
+
+def read_ticket(settings, ticket, now=None):
+    """
+    Valida a assinatura e a validade de um ticket e retorna o conteúdo.
+    """
+    body, _, signature = (ticket or "").partition(".")
+    try:
+        body.encode("ascii")
+    except UnicodeEncodeError:
+        raise TokenError("Ticket de renovação inválido")
+    if not signature or not hmac.compare_digest(signature, _sign(_ticket_secret(settings), body)):
+        raise TokenError("Ticket de renovação inválido")
+    payload = json.loads(base64.urlsafe_b64decode(body + "=" * (-len(body) % 4)))
+    if payload["expires"] < (time.time() if now is None else now):
+        raise TokenError("Ticket de renovação expirado; recarregue a página")
+    return payload
+
+
+def with_renew_ticket(markup, ticket):
+    """
+    Insere o ticket da sessão no HTML do modo de token (que fica em cache sem ele).
+    """
+    return markup.replace(RENEW_TICKET_MARKER, ticket or "")
+
+
+def _renewal_handler(service, settings):
+    # Importado aqui para evitar ciclo: o registro não depende deste módulo
+    from embed.registry import RegistryError, load_registry
+
+    def handle(request):
+        # POST leva o ticket no corpo (text/plain, sem preflight) e sempre tem
+        # Origin, mesmo quando o sidecar é publicado na origem da página
+        ticket = request.query.get("ticket")
+        if request.method == "POST":
+            ticket = request.body.decode("utf-8", "replace").strip()
+        try:
+            ticket = read_ticket(settings, ticket)
+        except TokenError as exc:
+            return sidecar.json_response({"error": str(exc)}, status=403)
+        # Só a página do app (a origem gravada no ticket) pode ler a resposta
+        origin = request.header("Origin")
+        if not origin or origin != ticket["origin"]:
+            return sidecar.json_response({"error": "origem não autorizada"}, status=403)
+        cors = {"Access-Control-Allow-Origin": origin, "Vary": "Origin"}
+        try:
+            report = load_registry(settings.registry_path).get(ticket["report"])
+        except RegistryError as exc:
+            return sidecar.json_response({"error": str(exc)}, status=404, headers=cors)
+        # O navegador pede o token ao entrar na janela de renovação: um token do
+        # cache ainda dentro dela é trocado agora, senão a página pediria de novo
+        # em seguida, até a thread de renovação passar
+        try:
+            token = service.get(report, ticket["identity"], min_validity=service.renew_window)
+        except TokenError as exc:
+            return sidecar.json_response({"error": str(exc)}, status=502, headers=cors)
+        return sidecar.json_response({
+            "token": token.token,
+            "embedUrl": token.embed_url,
+            "expiration": int(token.expires_at * 1000),
+            # Validade restante pelo relógio do servidor (o do navegador pode estar adiantado)
+            "expiresIn": int((token.expires_at - service.clock()) * 1000),
+        }, headers=cors)
+    return handle
+
+
+@lru_cache(maxsize=1)
+def get_service(settings):
+    """
+    Serviço de tokens do processo para as configurações (``None`` no modo "off").
+
+    Registra no sidecar ``POST /embed-token`` (ticket no corpo; também
+    ``GET /embed-token?ticket=<ticket>``), usado pelo navegador para renovar o
+    token de uma página aberta por muito tempo (só com o ticket da sessão e a
+    partir da origem da página, sem CORS aberto), e, no modo "mock", o endpoint
+    falso de tokens.
+    """
+    provider = settings.token_provider
+    if provider == "off":
+        return None
+    if provider == "azure":
+        fetcher = AzureTokenFetcher(settings.tenant_id, settings.client_id, settings.client_secret)
+    elif provider == "mock":
+        sidecar.route("POST", "/mock/embed-token", handle_mock_token)
+        fetcher = MockTokenFetcher()
+    else:
+        if not settings.token_url:
+            raise TokenError("Defina POWERBI_TOKEN_URL para o provedor 'http'")
+        fetcher = HttpTokenFetcher(settings.token_url)
+
+    service = TokenService(fetcher, refresh_ahead=settings.token_refresh_ahead)
+    handler = _renewal_handler(service, settings)
+    sidecar.route("GET", "/embed-token", handler, cors=False)
+    sidecar.route("POST", "/embed-token", handler, cors=False)
+    sidecar.start(settings.sidecar_host, settings.sidecar_port)
+    return service
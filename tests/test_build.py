@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do build de produção dos assets (``embed/build.py``).
+
+Quando o Node.js está instalado, o resultado minificado também é compilado
+com ``new Function(...)`` para garantir que continua sendo JavaScript válido.
+"""
+
+import shutil
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from embed import build
+
+ASSETS = Path(build.__file__).resolve().parent / "assets"
+NODE = shutil.which("node")
+
+needs_node = pytest.mark.skipif(NODE is None, reason="Node.js não instalado")
+
+
+def node_check(js):
+    # Compila (sem executar) o script; devolve a mensagem de erro, se houver
+    result = subprocess.run(
+        [NODE, "-e", "new Function(require('fs').readFileSync(0, 'utf8'))"],
+        input=js, capture_output=True, text=True, timeout=30,
+    )
+    return result.stderr if result.returncode else None
+
+
+def node_eval(js):
+    # Executa o script e devolve o que ele imprimiu
+    result = subprocess.run([NODE, "-e", js], capture_output=True, text=True, timeout=30)
+    assert result.returncode == 0, result.stderr
+    return result.stdout
+
+
+def test_line_comment_markers_inside_strings_and_urls():
+    js = (
+        "const url = 'https://app.powerbi.com/view?r=abc'; // comentário\n"
+        "const other = \"//cdn.exemplo.com/a.js\";\n"
+        "const template = `http://${host}/x`; /* bloco */\n"
+        "const escaped = 'it\\'s // not a comment';\n"
+    )
+    assert build.minify_js(js) == (
+        "const url = 'https://app.powerbi.com/view?r=abc';\n"
+        "const other = \"//cdn.exemplo.com/a.js\";\n"
+        "const template = `http://${host}/x`;\n"
+        "const escaped = 'it\\'s // not a comment';\n"
+    )
+
+
+def test_regex_literals_are_kept():
+    js = (
+        "const slashes = /\\/\\//g; // barras\n"
+        "const star = text.replace(/a*/g, '');\n"
+        "const klass = /[/*]+/.test(value);\n"
+        "function f(x) { return /^https?:\\/\\//.test(x); }\n"
+        "const ratio = width / height / 2; // divisão\n"
+    )
+    assert build.minify_js(js) == (
+        "const slashes = /\\/\\//g;\n"
+        "const star = text.replace(/a*/g, '');\n"
+        "const klass = /[/*]+/.test(value);\n"
+        "function f(x) { return /^https?:\\/\\//.test(x); }\n"
+        "const ratio = width / height / 2;\n"
+    )
+
+
+def test_console_log_single_and_multi_line():
+    js = (
+        "function f(state) {\n"
+        "    console.log('[Power BI] um', state);\n"
+        "    console.log('[Power BI] vários', {\n"
+        "        largura: state.width,\n"
+        "        texto: 'com ) e ; dentro'\n"
+        "    });\n"
+        "    return state;\n"
+        "}\n"
+    )
+    assert build.strip_debug(js) == "function f(state) {\n    return state;\n}\n"
+
+
+def test_console_log_sharing_a_line_is_kept():
+    js = "console.log('a'); counter++;\nconsole.error('b');\n"
+    assert build.strip_debug(js) == js
+
+
+def test_debug_blocks_are_removed():
+    js = "a();\n    // #if DEBUG\n    debugOnly();\n    // #endif\nb();\n"
+    assert build.strip_debug(js) == "a();\nb();\n"
+
+
+def test_minify_css_keeps_urls_and_strings():
+    css = (
+        "/* cabeçalho */\n"
+        ".a {\n"
+        "    background: url(https://cdn.exemplo.com/a.png); /* fundo */\n"
+        "    content: \"/* não é comentário */\";\n"
+        "    font: 12px/1.5 sans-serif;\n"
+        "}\n"
+    )
+    assert build.minify_css(css) == (
+        ".a {\n"
+        "background: url(https://cdn.exemplo.com/a.png);\n"
+        "content: \"/* não é comentário */\";\n"
+        "font: 12px/1.5 sans-serif;\n"
+        "}\n"
+    )
+
+
+def test_build_asset_modes():
+    source = "// comentário\nconsole.log('x');\nrun();\n"
+    assert build.build_asset("a.js", source, "debug") == source
+    assert build.build_asset("a.js", source, "production") == "run();\n"
+    assert build.build_asset("a.txt", source, "production") == source
+    with pytest.raises(ValueError):
+        build.build_asset("a.js", source, "release")
+
+
+@needs_node
+def test_minified_snippets_behave_the_same():
+    js = (
+        "// teste\n"
+        "const url = 'https://exemplo.com/a//b'; /* x */\n"
+        "const re = /\\/\\/+/g;\n"
+        "const half = 10 / 2 / 5;\n"
+        "console.log('removido', {\n"
+        "    a: 1\n"
+        "});\n"
+        "console.info(JSON.stringify([url.replace(re, '/'), half, /[/*]/.test('*')]));\n"
+    )
+    assert node_check(build.minify_js(js)) is None
+    assert node_eval(build.minify_js(js)) == '["https:/exemplo.com/a/b",1,true]\n'
+
+
+@needs_node
+@pytest.mark.parametrize("path", sorted(ASSETS.glob("*.js")), ids=lambda path: path.name)
+def test_minified_assets_are_valid_js(path):
+    minified = build.build_asset(path.name, path.read_text(encoding="utf-8"), "production")
+    assert "console.log" not in minified
+    assert node_check(minified) is None
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da detecção de dispositivo pelos cabeçalhos (``embed/device.py``).
+"""
+
+import pytest
+
+from embed import device
+
+IPHONE = "Mozilla/5.0 (iPhone; CPU iPhone OS 17_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148 Safari/604.1"
+ANDROID_PHONE = "Mozilla/5.0 (Linux; Android 14; Pixel 8) AppleWebKit/537.36 Chrome/120.0 Mobile Safari/537.36"
+ANDROID_TABLET = "Mozilla/5.0 (Linux; Android 13; SM-X700) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"
+IPAD = "Mozilla/5.0 (iPad; CPU OS 16_0 like Mac OS X) AppleWebKit/605.1.15 Mobile/15E148 Safari/604.1"
+WINDOWS = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 Chrome/120.0 Safari/537.36"
+MAC = "Mozilla/5.0 (Macintosh; Intel Mac OS X 14_0) AppleWebKit/605.1.15 Version/17.0 Safari/605.1.15"
+BOT = "curl/8.5.0"
+
+
+@pytest.mark.parametrize("user_agent, layout", [
+    (IPHONE, "mobile"),
+    (ANDROID_PHONE, "mobile"),
+    (ANDROID_TABLET, "auto"),
+    (IPAD, "auto"),
+    (WINDOWS, "desktop"),
+    (MAC, "desktop"),
+    (BOT, "auto"),
+    ("", "auto"),
+])
+def test_user_agent(user_agent, layout):
+    assert device.classify_headers({"User-Agent": user_agent}) == layout
+
+
+def test_viewport_width_has_priority():
+    assert device.classify_headers({"Sec-CH-Viewport-Width": "1280", "Sec-CH-UA-Mobile": "?1", "User-Agent": IPHONE}) == "desktop"
+    assert device.classify_headers({"Sec-CH-Viewport-Width": "390", "User-Agent": WINDOWS}) == "mobile"
+    assert device.classify_headers({"Viewport-Width": "768.9", "User-Agent": WINDOWS}) == "mobile"
+    assert device.classify_headers({"Sec-CH-Viewport-Width": "769", "User-Agent": IPAD}) == "desktop"
+
+
+def test_ua_mobile_hint_over_user_agent():
+    assert device.classify_headers({"Sec-CH-UA-Mobile": "?1", "User-Agent": WINDOWS}) == "mobile"
+    assert device.classify_headers({"Sec-CH-UA-Mobile": "?1", "User-Agent": ANDROID_TABLET}) == "mobile"
+    # Modo desktop do navegador do celular: o cliente decide
+    assert device.classify_headers({"Sec-CH-UA-Mobile": "?0", "User-Agent": ANDROID_PHONE}) == "auto"
+    assert device.classify_headers({"Sec-CH-UA-Mobile": "?0", "User-Agent": WINDOWS}) == "desktop"
+
+
+@pytest.mark.parametrize("value", ["inf", "-inf", "nan", "1e400", "-1", "0", "abc", "", "12px"])
+def test_malformed_viewport_hint_is_ignored(value):
+    assert device.classify_headers({"Sec-CH-Viewport-Width": value, "User-Agent": WINDOWS}) == "desktop"
+    assert device.classify_headers({"Sec-CH-Viewport-Width": value, "User-Agent": IPHONE}) == "mobile"
+
+
+def test_cache_stats():
+    device.classify_user_agent(WINDOWS)
+    device.classify_user_agent(WINDOWS)
+    stats = device.cache_stats()
+    assert stats["hits"] >= 1
+    assert stats["maxsize"] == device.UA_CACHE_SIZE
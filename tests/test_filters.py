@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos filtros, página e indicador de abertura (``embed/filters.py``).
+"""
+
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+from embed import filters
+from embed.filters import DeepLink, Filter, FilterError
+
+
+def test_parse_filter_conditions():
+    parsed = filters.parse_filter("Loja/Regiao in ('Sul', 'Sudeste') and Vendas/Ano ge 2023 and Loja/Ativa EQ true")
+    assert parsed == (
+        Filter("Loja", "Regiao", "in", ("Sul", "Sudeste")),
+        Filter("Vendas", "Ano", "ge", (2023,)),
+        Filter("Loja", "Ativa", "eq", (True,)),
+    )
+
+
+def test_parse_filter_numbers():
+    assert filters.parse_filter("Vendas/Margem lt -0.5") == (Filter("Vendas", "Margem", "lt", (-0.5,)),)
+
+
+@pytest.mark.parametrize("text", [
+    "",
+    "   ",
+    "Loja/Regiao = 'Sul'",
+    "Loja/Regiao eq Sul",
+    "Loja/Regiao eq 'Sul",
+    "Loja Regiao eq 'Sul'",
+    "Loja/Regiao eq 'Sul' or Loja/Regiao eq 'Norte'",
+    "Loja/Regiao eq 'Sul' and",
+    "Loja/Regiao in ()",
+    "Loja/Minha Coluna eq 1",
+    "Loja/Regiao eq 'Sul'; DROP",
+    "x" * (filters.MAX_FILTER_LENGTH + 1),
+])
+def test_parse_filter_rejects_bad_syntax(text):
+    with pytest.raises(FilterError):
+        filters.parse_filter(text)
+
+
+def test_parse_filter_limits():
+    too_many = " and ".join("T/C{} eq 1".format(index) for index in range(filters.MAX_FILTERS + 1))
+    with pytest.raises(FilterError):
+        filters.parse_filter(too_many)
+    values = ", ".join(str(index) for index in range(filters.MAX_VALUES + 1))
+    with pytest.raises(FilterError):
+        filters.parse_filter("T/C in ({})".format(values))
+
+
+def test_quotes_are_unescaped_and_escaped_again():
+    parsed = filters.parse_filter("Loja/Nome eq 'D''Ávila & Cia'")
+    assert parsed[0].values == ("D'Ávila & Cia",)
+    assert filters.url_filter(parsed) == "Loja/Nome eq 'D''Ávila & Cia'"
+
+
+def test_apply_to_url_percent_encodes_values():
+    link = DeepLink(filters=filters.parse_filter("Loja/Nome eq 'D''Ávila & Cia'"))
+    url = filters.apply_to_url("https://app.powerbi.com/reportEmbed?reportId=1", link)
+    query = urlsplit(url).query
+    # O "&" do valor não pode abrir um novo parâmetro
+    assert "%26" in query and "%20" in query
+    assert parse_qs(query)["filter"] == ["Loja/Nome eq 'D''Ávila & Cia'"]
+
+
+def test_url_filter_round_trip():
+    text = "A/B in ('x', 2, 1.5, true) and C/D ge -3"
+    assert filters.url_filter(filters.parse_filter(text)) == text
+
+
+def test_resolve_url_overrides_registry_defaults():
+    defaults = DeepLink(
+        filters=filters.parse_filter("Loja/Regiao eq 'Sul' and Vendas/Ano eq 2023"),
+        page="ReportSection1",
+        bookmark="Bookmark1",
+    )
+    link = filters.resolve(defaults, ("Vendas/Ano eq 2024",), "ReportSection2", "Bookmark2")
+    assert link.filters == (Filter("Loja", "Regiao", "eq", ("Sul",)), Filter("Vendas", "Ano", "eq", (2024,)))
+    assert link.page == "ReportSection2"
+    assert link.bookmark == "Bookmark2"
+
+
+def test_resolve_keeps_defaults_without_url_params():
+    defaults = DeepLink(filters=filters.parse_filter("Loja/Regiao eq 'Sul'"), page="ReportSection1", bookmark="Bookmark1")
+    assert filters.resolve(defaults) == defaults
+
+
+@pytest.mark.parametrize("page, bookmark", [
+    ("Report Section", None),
+    ("ReportSection<script>", None),
+    (None, "Bookmark/../x"),
+    (None, "b" * 101),
+])
+def test_resolve_rejects_bad_page_or_bookmark(page, bookmark):
+    with pytest.raises(FilterError):
+        filters.resolve(DeepLink(), (), page, bookmark)
+
+
+def test_apply_to_url_merges_existing_query():
+    link = DeepLink(filters=filters.parse_filter("Loja/Regiao eq 'Sul'"), page="ReportSection2")
+    url = filters.apply_to_url("https://app.powerbi.com/view?r=abc&pageName=Antiga&x=1", link)
+    parts = urlsplit(url)
+    assert parts.path == "/view"
+    assert url.startswith("https://app.powerbi.com/view?r=abc&x=1&")
+    query = parse_qs(parts.query)
+    assert query["pageName"] == ["ReportSection2"]
+    assert query["filter"] == ["Loja/Regiao eq 'Sul'"]
+    assert query["r"] == ["abc"]
+
+
+def test_apply_to_url_without_query_or_link():
+    assert filters.apply_to_url("https://app.powerbi.com/view", DeepLink(page="P1")) == "https://app.powerbi.com/view?pageName=P1"
+    assert filters.apply_to_url("https://app.powerbi.com/view?r=abc", DeepLink()) == "https://app.powerbi.com/view?r=abc"
+    assert filters.apply_to_url(None, DeepLink(page="P1")) is None
+
+
+def test_client_filters_models():
+    models = filters.client_filters(filters.parse_filter("Loja/Regiao in ('Sul', 'Norte') and Vendas/Ano ge 2023"))
+    assert models[0]["$schema"] == filters.BASIC_SCHEMA
+    assert models[0]["values"] == ["Sul", "Norte"]
+    assert models[1]["$schema"] == filters.ADVANCED_SCHEMA
+    assert models[1]["conditions"] == [{"operator": "GreaterThanOrEqual", "value": 2023}]
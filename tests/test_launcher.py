@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do roteamento e da leitura do cabeçalho no proxy do launcher.
+"""
+
+import asyncio
+
+from embed import launcher
+
+HEAD = b"GET / HTTP/1.1\r\nHost: painel\r\nX-Forwarded-For: 203.0.113.7, 10.0.0.2\r\n\r\n"
+
+
+def make_workers(count=4):
+    workers = [launcher.Worker(index, 9000 + index) for index in range(count)]
+    for worker in workers:
+        worker.healthy = True
+    return workers
+
+
+def test_client_key_uses_peer_by_default():
+    assert launcher.client_key(HEAD, ("192.0.2.1", 50000)) == "192.0.2.1"
+    assert launcher.client_key(HEAD, None) == ""
+
+
+def test_client_key_trusts_last_forwarded_address():
+    assert launcher.client_key(HEAD, ("192.0.2.1", 50000), trust_forwarded=True) == "10.0.0.2"
+    head = b"GET / HTTP/1.1\r\nx-forwarded-for: 198.51.100.4\r\n\r\n"
+    assert launcher.client_key(head, ("192.0.2.1", 50000), trust_forwarded=True) == "198.51.100.4"
+
+
+def test_client_key_without_forwarded_header_falls_back_to_peer():
+    head = b"GET / HTTP/1.1\r\nHost: painel\r\n\r\n"
+    assert launcher.client_key(head, ("192.0.2.1", 50000), trust_forwarded=True) == "192.0.2.1"
+
+
+def test_pick_worker_is_sticky_and_skips_unhealthy():
+    workers = make_workers()
+    chosen = launcher.pick_worker(workers, "192.0.2.1")
+    assert launcher.pick_worker(workers, "192.0.2.1") is chosen
+    others = {key: launcher.pick_worker(workers, key) for key in ("a", "b", "c", "d", "e", "f")}
+    chosen.healthy = False
+    fallback = launcher.pick_worker(workers, "192.0.2.1")
+    assert fallback is not chosen and fallback.healthy
+    # Só os clientes do worker que saiu mudam
+    for key, worker in others.items():
+        if worker is not chosen:
+            assert launcher.pick_worker(workers, key) is worker
+    for worker in workers:
+        worker.healthy = False
+    assert launcher.pick_worker(workers, "192.0.2.1") is None
+
+
+def test_slow_header_is_closed(monkeypatch):
+    monkeypatch.setattr(launcher, "HEADER_TIMEOUT", 0.1)
+
+    async def scenario():
+        proxy = launcher.Launcher(make_workers(), "127.0.0.1", 0)
+        server = await asyncio.start_server(proxy.handle_client, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"GET / HTTP/1.1\r\n")
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    assert asyncio.run(scenario()).startswith(b"HTTP/1.1 408 ")
+
+
+def test_each_worker_gets_its_own_metrics_port(monkeypatch):
+    monkeypatch.setenv("POWERBI_METRICS", "1")
+    monkeypatch.delenv("POWERBI_METRICS_PORT", raising=False)
+    workers = [launcher.Worker(index, 8600 + index, metrics_port=8700 + index) for index in range(3)]
+    ports = [worker.environment()["POWERBI_METRICS_PORT"] for worker in workers]
+    assert ports == ["8700", "8701", "8702"]
+    assert workers[0].environment()["POWERBI_METRICS"] == "1"
+    assert "POWERBI_METRICS_PORT" not in launcher.Worker(0, 8600).environment()
+    assert workers[1].status()["metrics_port"] == 8701
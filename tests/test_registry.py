@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do registro de relatórios (``reports.toml``).
+"""
+
+import os
+
+import pytest
+
+from embed import registry
+from embed.registry import RegistryError
+
+REGISTRY = """
+default = "vendas"
+
+[reports.vendas]
+title = "Vendas"
+url = "https://app.powerbi.com/view?r=vendas"
+aspect_ratio = "16:9"
+height = 700
+filters = "Loja/Regiao eq 'Sul'"
+page = "ReportSection2"
+
+[reports.estoque]
+mobile_url = "https://app.powerbi.com/view?r=estoque-mobile"
+desktop_url = "https://app.powerbi.com/view?r=estoque"
+
+[walls.operacao]
+reports = ["vendas", "estoque"]
+columns = 3
+"""
+
+
+def write(path, text, mtime_ns=None):
+    path.write_text(text, encoding="utf-8")
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+
+@pytest.fixture
+def registry_file(tmp_path):
+    return write(tmp_path / "reports.toml", REGISTRY, 1000000000)
+
+
+def test_load_registry(registry_file):
+    loaded = registry.load_registry(registry_file)
+    vendas = loaded.get("vendas")
+    assert vendas.height == 700
+    assert vendas.aspect_ratio == round(16 / 9, 4)
+    assert vendas.deep_link.page == "ReportSection2"
+    assert len(vendas.deep_link.filters) == 1
+
+    estoque = loaded.get("estoque")
+    assert estoque.url == "https://app.powerbi.com/view?r=estoque"
+    assert estoque.height == registry.DEFAULT_HEIGHT
+    assert loaded.walls[0].columns == 3
+    assert loaded.walls[0].tile_height == registry.DEFAULT_TILE_HEIGHT
+
+
+def test_get_default_and_unknown_ids(registry_file):
+    loaded = registry.load_registry(registry_file)
+    assert loaded.get().id == "vendas"
+    assert loaded.get(None).id == "vendas"
+    with pytest.raises(RegistryError, match="desconhecido"):
+        loaded.get("financeiro")
+
+
+def test_unknown_default_is_rejected(tmp_path):
+    path = write(tmp_path / "reports.toml", REGISTRY.replace('default = "vendas"', 'default = "financeiro"'))
+    with pytest.raises(RegistryError, match="financeiro"):
+        registry.load_registry(path)
+
+
+def test_first_report_is_default_without_default_key(tmp_path):
+    path = write(tmp_path / "reports.toml", REGISTRY.replace('default = "vendas"', ""))
+    assert registry.load_registry(path).default == "vendas"
+
+
+def test_reload_only_when_mtime_changes(registry_file):
+    first = registry.load_registry(registry_file)
+    assert registry.load_registry(registry_file) is first
+
+    # Mesmo mtime: o conteúdo novo não é lido
+    write(registry_file, REGISTRY.replace('title = "Vendas"', 'title = "Vendas 2"'), 1000000000)
+    assert registry.load_registry(registry_file) is first
+
+    os.utime(registry_file, ns=(2000000000, 2000000000))
+    reloaded = registry.load_registry(registry_file)
+    assert reloaded is not first
+    assert reloaded.get("vendas").title == "Vendas 2"
+
+
+def test_invalid_edit_keeps_raising_until_fixed(registry_file):
+    registry.load_registry(registry_file)
+    write(registry_file, "[reports.vendas\n", 2000000000)
+    with pytest.raises(RegistryError, match="inválido"):
+        registry.load_registry(registry_file)
+    write(registry_file, REGISTRY, 3000000000)
+    assert registry.load_registry(registry_file).get().id == "vendas"
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(RegistryError, match="Não foi possível ler"):
+        registry.load_registry(tmp_path / "ausente.toml")
+
+
+@pytest.mark.parametrize("text, message", [
+    ("", "ao menos uma tabela"),
+    ("reports = 1", "ao menos uma tabela"),
+    ('[reports.a]\ntitle = "A"', "precisa de url"),
+    ('[reports.a]\nurl = "http://app.powerbi.com/view"', "https://"),
+    ('reports.a = 1', "tabela TOML"),
+    ('[reports.a]\nurl = "https://x"\naspect_ratio = "16:0"', "aspect_ratio"),
+    ('[reports.a]\nurl = "https://x"\nroles = "Gerente"', "roles"),
+    ('[reports.a]\nurl = "https://x"\nreport_id = 1', "report_id"),
+    ('[reports.a]\nurl = "https://x"\nfilters = "Loja/Regiao = 1"', "Filtro inválido"),
+    ('[reports.a]\nurl = "https://x"\n[walls.w]\nreports = ["b"]', "desconhecido"),
+])
+def test_parse_registry_validation(tmp_path, text, message):
+    path = write(tmp_path / "reports.toml", text)
+    with pytest.raises(RegistryError, match=message):
+        registry.load_registry(path)
+
+
+@pytest.mark.parametrize("ratio", ["nan", "inf", "-inf", "0", "-1.5", '"1e400:1"', '"nan"', '"inf:1"', '"16:0"', '"a:b"', "true"])
+def test_invalid_aspect_ratio(tmp_path, ratio):
+    path = write(tmp_path / "reports.toml", '[reports.a]\nurl = "https://x"\naspect_ratio = {}'.format(ratio))
+    with pytest.raises(RegistryError, match="aspect_ratio"):
+        registry.load_registry(path)
+
+
+@pytest.mark.parametrize("ratio, expected", [('"16:9"', 1.7778), ('"4/3"', 1.3333), ("1.5", 1.5), ("2", 2.0), ('"0.75"', 0.75)])
+def test_aspect_ratio(tmp_path, ratio, expected):
+    path = write(tmp_path / "reports.toml", '[reports.a]\nurl = "https://x"\naspect_ratio = {}'.format(ratio))
+    assert registry.load_registry(path).get().aspect_ratio == expected
+
+
+@pytest.mark.parametrize("height", ["0", "-10", "true", "false", "1.5", '"700"'])
+def test_invalid_height(tmp_path, height):
+    path = write(tmp_path / "reports.toml", '[reports.a]\nurl = "https://x"\nheight = {}'.format(height))
+    with pytest.raises(RegistryError, match="reports.a.height deve ser um inteiro positivo"):
+        registry.load_registry(path)
+
+
+def test_repository_registry_is_valid():
+    assert registry.load_registry().reports
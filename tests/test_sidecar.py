@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do servidor auxiliar (``embed/sidecar.py``) com requisições reais.
+"""
+
+import socket
+
+import pytest
+
+from embed import sidecar
+
+
+@pytest.fixture(scope="module")
+def server():
+    sidecar._Handler.timeout = 0.5
+    sidecar.route("POST", "/_test/echo", lambda request: (200, "text/plain", request.body))
+    instance = sidecar.start("127.0.0.1", 0)
+    yield instance
+    instance.shutdown()
+    instance.server_close()
+    sidecar._servers.pop(("127.0.0.1", 0), None)
+    sidecar._routes.pop(("POST", "/_test/echo"), None)
+    sidecar._Handler.timeout = sidecar.REQUEST_TIMEOUT
+
+
+def exchange(server, data):
+    with socket.create_connection(server.server_address[:2], timeout=5) as conn:
+        conn.sendall(data)
+        chunks = []
+        while True:
+            chunk = conn.recv(4096)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def post(length, body=b""):
+    return "POST /_test/echo HTTP/1.1\r\nHost: x\r\nContent-Length: {}\r\nConnection: close\r\n\r\n".format(length).encode("latin-1") + body
+
+
+def test_post_body(server):
+    response = exchange(server, post(5, b"hello"))
+    assert response.startswith(b"HTTP/1.0 200") and response.endswith(b"hello")
+
+
+@pytest.mark.parametrize("length", ["abc", "-1", "1e3", ""])
+def test_invalid_content_length_is_rejected(server, length):
+    response = exchange(server, post(length))
+    if length == "":
+        assert response.startswith(b"HTTP/1.0 200")
+    else:
+        assert response.startswith(b"HTTP/1.0 400")
+
+
+def test_oversized_body_is_rejected(server):
+    assert exchange(server, post(sidecar.MAX_BODY_SIZE + 1)).startswith(b"HTTP/1.0 413")
+
+
+def test_slow_client_is_disconnected(server):
+    # Corpo prometido e nunca enviado: a conexão é encerrada pelo timeout do handler
+    response = exchange(server, post(10, b"abc"))
+    assert response == b""
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da validação dos beacons de telemetria.
+"""
+
+import json
+
+import pytest
+
+from embed import telemetry
+
+
+@pytest.fixture
+def store():
+    return telemetry.TelemetryStore()
+
+
+def test_record_beacon_accepts_valid_events(store):
+    payload = {"events": [
+        {"metric": "page_load_ms", "value": 1234.5},
+        {"metric": "resize_events", "value": 3},
+        {"metric": "desconhecida", "value": 1},
+    ]}
+    assert store.record_beacon("mobile", payload) == 2
+    rows = {row["métrica"]: row for row in store.summary()}
+    assert rows["page_load_ms"]["p50"] == 1234.5
+    assert store.beacons == 1
+
+
+@pytest.mark.parametrize("value", [
+    float("nan"),
+    float("inf"),
+    float("-inf"),
+    -1,
+    True,
+    "100",
+    None,
+    telemetry.MAX_TIME_MS + 1,
+])
+def test_record_beacon_rejects_invalid_times(store, value):
+    assert store.record_beacon("desktop", {"events": [{"metric": "iframe_load_ms", "value": value}]}) == 0
+    assert store.summary() == []
+
+
+def test_record_beacon_bounds_counts(store):
+    events = [
+        {"metric": "iframe_recreations", "value": telemetry.MAX_COUNT},
+        {"metric": "iframe_recreations", "value": telemetry.MAX_COUNT + 1},
+    ]
+    assert store.record_beacon("desktop", {"events": events}) == 1
+
+
+def test_record_beacon_rejects_nan_from_json(store):
+    # json.loads aceita NaN/Infinity, como chegaria de um beacon forjado
+    payload = json.loads('{"events": [{"metric": "ttfb_ms", "value": NaN}, {"metric": "ttfb_ms", "value": Infinity}]}')
+    assert store.record_beacon("outro", payload) == 0
+
+
+def test_record_beacon_requires_event_list(store):
+    with pytest.raises(ValueError):
+        store.record_beacon("outro", {"events": "x"})
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do cache de tokens (``TokenService``) e dos tickets de renovação.
+"""
+
+import json
+
+import pytest
+
+from embed import sidecar, tokens
+from embed.registry import Report
+from embed.settings import Settings
+
+REPORT = Report(id="vendas", title="Vendas", url="https://app.powerbi.com/view?r=abc", report_id="r1", workspace_id="w1")
+OTHER = Report(id="estoque", title="Estoque", url="https://app.powerbi.com/view?r=def")
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeFetcher:
+    """
+    Devolve tokens numerados que valem ``lifetime`` segundos a partir do relógio.
+    """
+
+    def __init__(self, clock, lifetime=3600):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.calls = []
+        self.error = None
+
+    def __call__(self, report, identity=None):
+        self.calls.append((report.id, identity))
+        if self.error:
+            raise tokens.TokenError(self.error)
+        return tokens.EmbedToken(
+            "token-{}".format(len(self.calls)),
+            "https://app.powerbi.com/reportEmbed?reportId=" + report.id,
+            self.clock() + self.lifetime,
+        )
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def fetcher(clock):
+    return FakeFetcher(clock)
+
+
+@pytest.fixture
+def service(fetcher, clock, monkeypatch):
+    # Sem a thread de renovação: os testes chamam refresh_due() diretamente
+    monkeypatch.setattr(tokens.TokenService, "_start_refresher", lambda self: None)
+    return tokens.TokenService(fetcher, refresh_ahead=300, clock=clock)
+
+
+def test_get_caches_token(service, fetcher):
+    first = service.get(REPORT)
+    assert service.get(REPORT) is first
+    assert fetcher.calls == [("vendas", None)]
+    assert service.cache_stats() == {"hits": 1, "misses": 1, "refreshes": 0, "errors": 0, "size": 1}
+
+
+def test_get_keys_by_report_and_identity(service, fetcher):
+    anonymous = service.get(REPORT)
+    ana = service.get(REPORT, "ana@exemplo.com")
+    bruno = service.get(REPORT, "bruno@exemplo.com")
+    other = service.get(OTHER)
+    assert len({anonymous.token, ana.token, bruno.token, other.token}) == 4
+    assert service.get(REPORT, "ana@exemplo.com") is ana
+    assert fetcher.calls == [
+        ("vendas", None),
+        ("vendas", "ana@exemplo.com"),
+        ("vendas", "bruno@exemplo.com"),
+        ("estoque", None),
+    ]
+
+
+def test_get_fetches_again_near_expiration(service, fetcher, clock):
+    first = service.get(REPORT)
+    clock.now = first.expires_at - tokens.MIN_VALIDITY
+    second = service.get(REPORT)
+    assert second is not first
+    assert len(fetcher.calls) == 2
+
+
+def test_refresh_due_renews_ahead_of_expiration(service, fetcher, clock):
+    first = service.get(REPORT)
+    clock.now = first.expires_at - 301
+    service.refresh_due()
+    assert len(fetcher.calls) == 1
+
+    clock.now = first.expires_at - 299
+    service.refresh_due()
+    assert len(fetcher.calls) == 2
+    renewed = service.get(REPORT)
+    assert renewed is not first
+    assert renewed.expires_at > first.expires_at
+    assert service.cache_stats()["refreshes"] == 1
+    assert len(fetcher.calls) == 2
+
+
+def test_refresh_due_evicts_idle_tokens(service, fetcher, clock):
+    fetcher.lifetime = 10 * tokens.IDLE_EVICT
+    service.get(REPORT)
+    clock.now += tokens.IDLE_EVICT + 1
+    service.refresh_due()
+    assert service.cache_stats()["size"] == 0
+    assert len(fetcher.calls) == 1
+
+
+def test_get_error_is_counted_and_not_cached(service, fetcher):
+    fetcher.error = "HTTP 401"
+    with pytest.raises(tokens.TokenError, match="HTTP 401"):
+        service.get(REPORT)
+    assert service.cache_stats()["errors"] == 1
+    assert service.cache_stats()["size"] == 0
+
+    fetcher.error = None
+    assert service.get(REPORT).token == "token-2"
+
+
+def test_refresh_error_keeps_current_token(service, fetcher, clock):
+    first = service.get(REPORT)
+    clock.now = first.expires_at - 100
+    fetcher.error = "HTTP 500"
+    service.refresh_due()
+    assert service.get(REPORT) is first
+    assert service.cache_stats()["errors"] == 1
+
+
+def test_ticket_round_trip():
+    settings = Settings(sidecar_secret="segredo")
+    ticket = tokens.issue_ticket(settings, REPORT, "ana@exemplo.com", "https://app.exemplo.com", "s1", now=0)
+    payload = tokens.read_ticket(settings, ticket, now=tokens.TICKET_LIFETIME - 1)
+    assert payload["report"] == "vendas"
+    assert payload["identity"] == "ana@exemplo.com"
+    assert payload["origin"] == "https://app.exemplo.com"
+
+
+@pytest.mark.parametrize("change", [
+    lambda ticket: ticket[:-1] + ("0" if ticket[-1] != "0" else "1"),
+    lambda ticket: "x" + ticket,
+    lambda ticket: ticket.partition(".")[0],
+    lambda ticket: "çã." + ticket.partition(".")[2],
+    lambda ticket: "",
+])
+def test_ticket_rejects_tampering(change):
+    settings = Settings(sidecar_secret="segredo")
+    ticket = tokens.issue_ticket(settings, REPORT, None, "https://app.exemplo.com", "s1", now=0)
+    with pytest.raises(tokens.TokenError):
+        tokens.read_ticket(settings, change(ticket), now=0)
+
+
+def test_ticket_rejects_other_secret_and_expired():
+    ticket = tokens.issue_ticket(Settings(sidecar_secret="a"), REPORT, None, "https://app.exemplo.com", "s1", now=0)
+    with pytest.raises(tokens.TokenError):
+        tokens.read_ticket(Settings(sidecar_secret="b"), ticket, now=0)
+    with pytest.raises(tokens.TokenError, match="expirado"):
+        tokens.read_ticket(Settings(sidecar_secret="a"), ticket, now=tokens.TICKET_LIFETIME + 1)
+
+
+def test_get_with_min_validity_fetches_inside_renewal_window(service, fetcher, clock):
+    first = service.get(REPORT)
+    clock.now = first.expires_at - service.renew_window + 1
+    assert service.get(REPORT) is first
+    renewed = service.get(REPORT, min_validity=service.renew_window)
+    assert renewed is not first
+    # Outras páginas na mesma janela reaproveitam o token novo
+    assert service.get(REPORT, min_validity=service.renew_window) is renewed
+    assert len(fetcher.calls) == 2
+
+
+def test_renew_window_is_never_below_min_validity(fetcher, clock):
+    assert tokens.TokenService(fetcher, refresh_ahead=0, clock=clock).renew_window == tokens.MIN_VALIDITY
+    assert tokens.TokenService(fetcher, refresh_ahead=600, clock=clock).renew_window == 600
+
+
+def test_renewal_handler_returns_fresh_token_inside_window(service, fetcher, clock, tmp_path):
+    registry_file = tmp_path / "reports.toml"
+    registry_file.write_text('[reports.vendas]\nurl = "https://app.powerbi.com/view?r=vendas"\n', encoding="utf-8")
+    settings = Settings(sidecar_secret="segredo", registry_path=str(registry_file))
+    origin = "https://app.exemplo.com"
+    ticket = tokens.issue_ticket(settings, REPORT, None, origin, "s1")
+    handle = tokens._renewal_handler(service, settings)
+
+    def renew():
+        request = sidecar.Request("GET", "/embed-token", {"ticket": ticket}, {"Origin": origin}, b"")
+        status, _, body, headers = handle(request)
+        assert status == 200
+        assert headers["Access-Control-Allow-Origin"] == origin
+        return json.loads(body)
+
+    first = service.get(REPORT)
+    data = renew()
+    assert data["token"] == first.token
+    assert data["expiresIn"] == int((first.expires_at - clock.now) * 1000)
+
+    clock.now = first.expires_at - service.renew_window + 1
+    data = renew()
+    assert data["token"] != first.token
+    assert data["expiration"] > int(first.expires_at * 1000)
+    assert renew()["token"] == data["token"]
+
+
+def test_renewal_handler_reads_ticket_from_post_body(service, tmp_path):
+    registry_file = tmp_path / "reports.toml"
+    registry_file.write_text('[reports.vendas]\nurl = "https://app.powerbi.com/view?r=vendas"\n', encoding="utf-8")
+    settings = Settings(sidecar_secret="segredo", registry_path=str(registry_file))
+    origin = "https://app.exemplo.com"
+    ticket = tokens.issue_ticket(settings, REPORT, None, origin, "s1")
+    handle = tokens._renewal_handler(service, settings)
+
+    request = sidecar.Request("POST", "/embed-token", {}, {"Origin": origin}, ticket.encode("ascii"))
+    assert handle(request)[0] == 200
+    # Sem Origin (GET na mesma origem não envia o cabeçalho) a resposta é recusada
+    request = sidecar.Request("GET", "/embed-token", {"ticket": ticket}, {}, b"")
+    assert handle(request)[0] == 403